@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import atexit
 from pathlib import Path  # ← ДОБАВИЛИ
 
 from dotenv import load_dotenv
 from flask import Flask
 
+from app.ai_cache import DECISIONS
 from app.config import make_config_from_env
-from app.web import bp as web_bp
+from app.solved import load_tables
+from app.tuning import load_tuning
+from app.web import bp as web_bp, init_arena_storage, init_speculation
 
 
 def create_app() -> Flask:
@@ -25,6 +29,27 @@ def create_app() -> Flask:
     app.config.from_object(cfg)
 
     app.register_blueprint(web_bp)
+
+    reaper = init_arena_storage(
+        ttl=cfg.ARENA_TTL,
+        max_size=cfg.ARENA_MAX,
+        sweep_interval=cfg.ARENA_SWEEP_INTERVAL,
+        sweep_batch=cfg.ARENA_SWEEP_BATCH,
+        parked_max=cfg.ARENA_PARKED_MAX,
+        store=cfg.ARENA_STORE,
+        store_url=cfg.ARENA_STORE_URL,
+        log_spill_dir=cfg.ARENA_LOG_SPILL_DIR,
+    )
+    app.extensions["arena_reaper"] = reaper
+    DECISIONS.configure(max_size=cfg.AI_DECISION_CACHE_MAX, quantum=cfg.AI_DECISION_CACHE_QUANTUM)
+    speculator = init_speculation(workers=cfg.AI_SPECULATE_WORKERS)
+    if speculator is not None:
+        atexit.register(speculator.close)
+    if cfg.AI_TUNING_FILE:
+        load_tuning(cfg.AI_TUNING_FILE)
+    if cfg.AI_POLICY_TABLES:
+        load_tables(cfg.AI_POLICY_TABLES)
+    atexit.register(reaper.stop)
     return app
 
 
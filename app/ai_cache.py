@@ -0,0 +1,159 @@
+"""
+Общий на воркер кэш решений ИИ.
+
+Тысячи боёв идут на нескольких сборках по умолчанию (/quick-fight — всегда
+interceptor против destroyer), поэтому одни и те же состояния боя повторяются
+из арены в арену. Дорогие политики (expert, mcts) кладут сюда выбранный ход по
+ключу (сборки обеих сторон, правила боя, сложность, квантованное состояние:
+корпус, щит и энергия обеих сторон, перезарядки скиллов ИИ, потрачены ли
+скиллы) — в следующий раз ход достаётся без поиска.
+
+Кэш ограничен по размеру, вытеснение — LRU (OrderedDict, как в ArenaCache).
+Квант 1 — ключ точный; квант q > 1 объединяет значения в корзины по q единиц
+(больше попаданий ценой приблизительного хода). Запасные ходы (поиск не
+уложился в бюджет) не кэшируются. Счётчики попаданий — в /metrics.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import replace
+from typing import TYPE_CHECKING
+
+from app.policy import AIMove
+
+if TYPE_CHECKING:
+    from app.arena import Arena
+
+DecisionKey = tuple[Hashable, ...]
+
+_DEFAULT_MAX_SIZE = 65_536
+# Сколько наборов «сборки + конфиг» помнить по id объектов (копии боёв плодят конфиги).
+_MATCHUPS_MAX = 4096
+
+
+class DecisionCache:
+    """LRU-кэш «состояние боя → ход ИИ», потокобезопасный."""
+
+    def __init__(self, *, max_size: int = _DEFAULT_MAX_SIZE, quantum: int = 1) -> None:
+        self._lock = threading.Lock()
+        self._items: OrderedDict[DecisionKey, AIMove] = OrderedDict()
+        self.max_size = 0
+        self.quantum = 1
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # id объектов сборок и конфига → (сами объекты, номер матчапа); объекты держит
+        # запись, поэтому их id не переиспользуются, пока она жива
+        self._matchups: dict[tuple[int, ...], tuple[tuple[Hashable, ...], int]] = {}
+        # значение матчапа (конфиг без сида и телеметрии) → номер; номера не повторяются
+        self._matchup_ids: dict[tuple[Hashable, ...], int] = {}
+        self._next_matchup = 0
+        self.configure(max_size=max_size, quantum=quantum)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def configure(self, *, max_size: int, quantum: int = 1) -> None:
+        """Меняет размер и квант; записи и счётчики сбрасываются."""
+        if max_size < 0:
+            raise ValueError("max_size должен быть >= 0")
+        if quantum <= 0:
+            raise ValueError("quantum должен быть > 0")
+        with self._lock:
+            self.max_size = max_size
+            self.quantum = quantum
+            self._reset_locked()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset_locked()
+
+    def key(self, arena: Arena) -> DecisionKey:
+        """Ключ решения для хода ИИ в текущем состоянии арены."""
+        p, a = arena.player, arena.ai
+        q = self.quantum
+        cd = arena.cooldowns["ai"]
+        return (
+            self._matchup(arena),
+            arena.ai_difficulty,
+            p.hull // q,
+            p.shield_hp // q,
+            p.energy // q,
+            a.hull // q,
+            a.shield_hp // q,
+            a.energy // q,
+            cd["overcharge"],
+            cd["emp"],
+            p.skill_used,
+            a.skill_used,
+        )
+
+    def _matchup(self, arena: Arena) -> int:
+        """
+        Номер неизменной части ключа: сборки сторон и правила боя. Считается раз на
+        набор объектов, а не на каждый ход: replace() конфига и хэши dataclass-ов
+        стоят дороже, чем экономит попадание.
+        """
+        p, a = arena.player, arena.ai
+        parts = (p.unit_class, p.weapon, p.shield, a.unit_class, a.weapon, a.shield, arena.config)
+        ident = tuple(map(id, parts))
+        entry = self._matchups.get(ident)
+        if entry is not None:
+            return entry[1]
+        # сид и телеметрия на выбор хода не влияют
+        value = (*parts[:6], replace(arena.config, rng_seed=None, telemetry="off"))
+        with self._lock:
+            if len(self._matchups) >= _MATCHUPS_MAX:
+                # номера не переиспользуются: после сброса старые ключи просто не совпадут
+                self._matchups.clear()
+                self._matchup_ids.clear()
+            number = self._matchup_ids.get(value)
+            if number is None:
+                number = self._matchup_ids[value] = self._next_matchup
+                self._next_matchup += 1
+            self._matchups[ident] = (parts, number)
+        return number
+
+    def get(self, key: DecisionKey) -> AIMove | None:
+        with self._lock:
+            move = self._items.get(key)
+            if move is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return move
+
+    def put(self, key: DecisionKey, move: AIMove) -> None:
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._items[key] = move
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def snapshot(self) -> dict[str, float | int]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "quantum": self.quantum,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _reset_locked(self) -> None:
+        self._items.clear()
+        self.hits = self.misses = self.evictions = 0
+
+
+# Один кэш на процесс (воркер gunicorn): его делят все арены воркера.
+DECISIONS = DecisionCache()
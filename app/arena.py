@@ -1,12 +1,25 @@
 from __future__ import annotations
 
+import copy
+import functools
 import os
-import random
-from dataclasses import dataclass
-from typing import ClassVar, Literal
-
-from app.classes import CLASS_REGISTRY, UnitClass, register_unit_class
-from app.skills import create_skill
+import struct
+import threading
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, ClassVar, Concatenate, Literal, ParamSpec, TypeVar, cast
+
+from app.ai_cache import DECISIONS
+from app.classes import CLASS_REGISTRY, UnitClass, get_unit_class, register_unit_class
+from app.equipment import SHIELD_REGISTRY, WEAPON_REGISTRY, get_shield, get_weapon
+from app.expert import engine_for
+from app.journal import AI_MOVES, SKILL_SLUGS, BattleEvent, BattleJournal, EventKind
+from app.policy import THRESHOLD_DIFFICULTIES, AIMove, ThresholdPolicy, compile_policies
+from app.rng import CompactRandom
+from app.skills import CompiledSkill, compile_skills
+from app.solved import BOOK
+from app.telemetry import PASS, SHOT, SNAP, SWAP, BattleLog, Record, render, text
 from app.unit import (
     AIUnit,
     AttackContext,
@@ -15,6 +28,16 @@ from app.unit import (
     RandomSource,
 )
 
+T = TypeVar("T")
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+# Уровень телеметрии: full — лог, снимки [SNAP] и заметки атак; log — только
+# лог для панели; off — ничего (симуляции/боты). На исход боя не влияет.
+TelemetryLevel = Literal["full", "log", "off"]
+TELEMETRY_LEVELS: tuple[TelemetryLevel, ...] = ("full", "log", "off")
+
 
 @dataclass(frozen=True, slots=True)
 class ArenaConfig:
@@ -26,67 +49,276 @@ class ArenaConfig:
     overcharge_damage_mult: float = 1.50
     emp_shield_eff_factor: float = 0.50
     emp_extra_ignore: float = 0.00
+    telemetry: TelemetryLevel = "full"
+    # Пороги ИИ по сложностям easy/normal/hard (см. app.policy).
+    # EMP: насколько «толстый» щит у игрока считаем поводом жать EMP (в очках щита).
+    ai_emp_shield_threshold: tuple[int, ...] = (15, 8, 1)
+    # Overcharge: добивка при низком hull игрока (доля от максимума).
+    ai_overcharge_hull_pct: tuple[float, ...] = (0.25, 0.35, 0.45)
+    # Минимум энергии ИИ для скилла по порогу (не ниже стоимости скилла).
+    ai_emp_min_energy: int = 25
+    ai_overcharge_min_energy: int = 20
 
 
-class Arena:
+# Пороги ИИ из файла тюнинга (app.tuning.load_tuning): значения по умолчанию
+# для арен с конфигом из окружения.
+_AI_TUNING: dict[str, Any] = {}
+
+
+def set_ai_tuning(values: Mapping[str, Any]) -> None:
+    """Задаёт пороги ИИ (поля ai_* ArenaConfig) для config_from_env; {} — сброс."""
+    _AI_TUNING.clear()
+    _AI_TUNING.update(values)
+
+
+def config_from_env() -> ArenaConfig:
     """
-    Singleton арены: хранит состояние боя, применяет результаты атак, ведёт телеметрию.
+    Собирает ArenaConfig из окружения (ARENA_RNG_SEED, AI_SKILL_CHANCE) поверх
+    порогов из set_ai_tuning; явный AI_SKILL_CHANCE важнее файла тюнинга.
     """
+    seed_env = os.getenv("ARENA_RNG_SEED")
+    seed: int | None = int(seed_env) if seed_env and seed_env.isdigit() else None
+
+    default_p = float(_AI_TUNING.get("ai_skill_chance", 0.10))
+    skill_p_env = os.getenv("AI_SKILL_CHANCE")
+    try:
+        skill_p = float(skill_p_env) if skill_p_env is not None else default_p
+    except ValueError:
+        skill_p = default_p
+    if skill_p < 0.0:
+        skill_p = 0.0
+    if skill_p > 1.0:
+        skill_p = 1.0
+
+    telemetry_env = os.getenv("ARENA_TELEMETRY", "full").strip().lower()
+    telemetry: TelemetryLevel = "full"
+    for level in TELEMETRY_LEVELS:
+        if level == telemetry_env:
+            telemetry = level
+
+    return ArenaConfig(
+        energy_regen_per_turn=3,
+        rng_seed=seed,
+        ai_skill_chance=skill_p,
+        overcharge_damage_mult=1.50,
+        emp_shield_eff_factor=0.50,
+        emp_extra_ignore=0.00,
+        telemetry=telemetry,
+        **{k: v for k, v in _AI_TUNING.items() if k != "ai_skill_chance"},
+    )
+
+
+# expert и mcts — поиск (app.expert, app.mcts); остальные — пороговые политики (app.policy).
+AIDifficulty = Literal["easy", "normal", "hard", "expert", "mcts"]
+DIFFICULTIES: tuple[AIDifficulty, ...] = (*THRESHOLD_DIFFICULTIES, "expert", "mcts")
+
+# ====== Бинарный формат боя (Arena.to_bytes / Arena.from_bytes) ======
+#
+# v1, little-endian:
+#   version:B flags:B difficulty:B rng_state:Q
+#   (flags: ход ИИ, skill_used игрока/ИИ, задан seed, биты 4-5 — уровень телеметрии)
+#   player hull/energy/shield_hp:hhh, ai hull/energy/shield_hp:hhh
+#   cooldowns p.over/p.emp/ai.over/ai.emp:bbbb
+#   config: energy_regen:h rng_seed:q ai_skill_chance:d overcharge:d emp_eff:d emp_ignore:d
+# если в flags бит 6 — пороги ИИ отличаются от умолчаний и идут следом:
+#   emp_shield:hhh over_hull_pct:ddd emp_min_energy:h over_min_energy:h
+# затем одним блоком utf-8 строки через NUL: имя и слаги класса/оружия/щита игрока,
+# то же для ИИ, и хвост видимого лога (по строке на элемент).
+# Предметы и классы неизменяемы, поэтому хранятся ссылкой по слагу.
+_CODEC_VERSION = 1
+_CODEC_HEAD = struct.Struct("<BBBQhhhhhhbbbbhqdddd")
+_F_TURN_AI = 1 << 0
+_F_P_SKILL = 1 << 1
+_F_A_SKILL = 1 << 2
+_F_SEED = 1 << 3
+_F_TELEMETRY_SHIFT = 4
+_F_AI_TUNED = 1 << 6
+_CODEC_AI = struct.Struct("<hhhdddhh")
+_SEP = "\0"
+
+
+def _ai_tuning(cfg: ArenaConfig) -> tuple[int | float, ...]:
+    """Пороги ИИ одной строкой (порядок полей _CODEC_AI)."""
+    return (
+        *cfg.ai_emp_shield_threshold,
+        *cfg.ai_overcharge_hull_pct,
+        cfg.ai_emp_min_energy,
+        cfg.ai_overcharge_min_energy,
+    )
+
+
+_DEFAULT_AI_TUNING = _ai_tuning(ArenaConfig())
+
+
+# id(предмета) → (предмет, слаг): обратный поиск по реестру делаем один раз.
+_SLUG_CACHE: dict[int, tuple[object, str]] = {}
+# Поля конфига → ArenaConfig: одинаковые конфиги при загрузке не создаём заново.
+_CONFIG_CACHE: dict[tuple[object, ...], ArenaConfig] = {}
+
+
+def _slug_of(registry: Mapping[str, T], item: T, what: str) -> str:
+    """Слаг предмета по реестру (реестры маленькие, результат кэшируется)."""
+    cached = _SLUG_CACHE.get(id(item))
+    if cached is not None and cached[0] is item:
+        return cached[1]
+    for slug, value in registry.items():
+        if value is item or value == item:
+            _SLUG_CACHE[id(item)] = (item, slug)
+            return slug
+    raise ValueError(f"{what} не зарегистрирован в реестре — сериализовать бой нельзя")
+
+
+# Контекст обычного выстрела: неизменяемый, поэтому один на всех.
+_PLAIN_CTX = AttackContext()
+
+# Настройки поиска expert/mcts, которые можно переопределить на экземпляре арены.
+_SEARCH_KNOBS = (
+    "expert_deadline",
+    "expert_max_depth",
+    "mcts_iterations",
+    "mcts_batch",
+    "mcts_time_budget",
+    "mcts_deterministic",
+)
 
-    _instance: ClassVar[Arena | None] = None
+# На сколько ходов скилл уходит на перезарядку после применения.
+SKILL_COOLDOWN_TURNS = 2
 
-    # Профиль сложности Бота - влияет на пороги применения рещений
-    ai_difficulty: Literal["easy", "normal", "hard"] = "normal"
 
-    def __new__(cls) -> Arena:
-        """
-        Реализация Singleton: создаём один раз, потом всегда возвращаем его.
-        """
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+@dataclass(frozen=True, slots=True)
+class Action:
+    """
+    Решённый ход стороны — вход конвейера Arena._resolve.
+    ctx — контекст выстрела (None — пропуск хода); cooldown — скилл, который
+    уходит на перезарядку; tick — тикают ли КД обеих сторон в конце хода.
+    """
 
-    def __init__(self) -> None:
-        if getattr(self, "_initialized", False):
-            return
+    ctx: AttackContext | None
+    cooldown: str | None = None
+    tick: bool = False
 
-        self._initialized = True
+
+_PASS = Action(None)
+_AI_PASS = Action(None, tick=True)
+_AI_PLAIN = Action(_PLAIN_CTX, tick=True)
+# Метки снимков [SNAP]: после урона/пропуска, после регена, после смены хода.
+_SHOT_SNAPS = ("after-damage", "after-regen", "after-swap")
+_PASS_SNAPS = ("before-pass-regen", "after-pass-regen", "after-pass-swap")
+
+_JOURNAL_EVENTS: dict[str, BattleEvent] = {
+    "attack": BattleEvent("attack"),
+    "pass": BattleEvent("pass"),
+    "ai_turn": BattleEvent("ai_turn"),
+    **{slug: BattleEvent("skill", slug) for slug in SKILL_SLUGS},
+    **{f"ai_move:{move}": BattleEvent("ai_move", move) for move in AI_MOVES},
+}
+
+
+def _journaled(
+    kind: EventKind,
+) -> Callable[[Callable[Concatenate[Arena, P], R]], Callable[Concatenate[Arena, P], R]]:
+    """
+    Пишет вызов в журнал боя, если это действие верхнего уровня.
+    Вложенные вызовы (ход ИИ → attack/pass_turn) не пишутся: при повторе
+    их заново породит внешнее действие.
+    """
+
+    def decorate(fn: Callable[Concatenate[Arena, P], R]) -> Callable[Concatenate[Arena, P], R]:
+        def wrapper(self: Arena, /, *args: P.args, **kwargs: P.kwargs) -> R:
+            journal = self.journal
+            if journal is None or self._in_action:
+                return fn(self, *args, **kwargs)
+            key: str = kind
+            if kind == "skill":
+                key = str(args[0] if args else kwargs.get("slug"))
+            elif kind == "ai_move":
+                key = f"ai_move:{args[0] if args else kwargs.get('move')}"
+            event = _JOURNAL_EVENTS.get(key)
+            if event is None:  # неизвестный скилл — состояние не меняется
+                return fn(self, *args, **kwargs)
+            journal.append(event)
+            self._in_action = True
+            try:
+                return fn(self, *args, **kwargs)
+            finally:
+                self._in_action = False
+                if journal.checkpoint_due():
+                    journal.add_checkpoint(self.to_bytes())
+
+        functools.update_wrapper(wrapper, fn)
+        return wrapper
+
+    return decorate
+
+
+class Arena:
+    """
+    Арена одного боя: хранит состояние, применяет результаты атак, ведёт телеметрию.
+    Каждый бой — отдельный экземпляр, поэтому параллельные бои не делят hull/энергию/лог.
+    """
+
+    # Профиль сложности Бота - влияет на пороги применения рещений
+    ai_difficulty: AIDifficulty = "normal"
+    # Снимок состояния в журнал каждые N событий (0 — только стартовый снимок).
+    checkpoint_every: int = 0
+    # Сколько последних записей телеметрии держим в памяти (см. BattleLog).
+    log_capacity: int = 512
+    # expert: дедлайн поиска на ход (секунды) и предел глубины (полуходы).
+    expert_deadline: float = 0.005
+    expert_max_depth: int = 8
+    # mcts: пакетов доигровок на ход, доигровок в пакете, сколько ждать пул (секунды);
+    # детерминированный режим — ход воспроизводим по rng_seed (для тестов).
+    mcts_iterations: int = 24
+    mcts_batch: int = 32
+    mcts_time_budget: float = 0.05
+    mcts_deterministic: bool = False
+
+    def __init__(self, config: ArenaConfig | None = None) -> None:
+        self._config: ArenaConfig = config if config is not None else config_from_env()
+        # Политики ИИ по сложностям: компилируются один раз на конфиг (app.policy).
+        self._policies: Mapping[str, ThresholdPolicy] = compile_policies(self._config)
         self._player: PlayerUnit | None = None
         self._ai: AIUnit | None = None
         self._turn: Literal["player", "ai"] = "player"
-        self._log: list[str] = []
-        self._rng: RandomSource = random.Random()
+        # Телеметрия — кортежи (см. app.telemetry), строки собираются по запросу.
+        self._log = BattleLog(self.log_capacity)
+        self._rng: RandomSource = CompactRandom(self._config.rng_seed)
         self.cooldowns: dict[str, dict[str, int]] = {
             "player": {"overcharge": 0, "emp": 0},
             "ai": {"overcharge": 0, "emp": 0},
         }
+        # Журнал действий: ведётся с start()/from_bytes(), см. app.journal.
+        self.journal: BattleJournal | None = None
+        self._in_action = False
+        # Лок боя: сериализует ходы одной арены, если два запроса пришли одновременно.
+        self.lock: threading.RLock = threading.RLock()
 
-        seed_env = os.getenv("ARENA_RNG_SEED")
-        seed: int | None = int(seed_env) if seed_env and seed_env.isdigit() else None
+    def __getstate__(self) -> dict[str, object]:
+        state = self.__dict__.copy()
+        state.pop("lock", None)
+        return state
 
-        skill_p_env = os.getenv("AI_SKILL_CHANCE")
-        try:
-            skill_p = float(skill_p_env) if skill_p_env is not None else 0.10
-        except ValueError:
-            skill_p = 0.10
-        if skill_p < 0.0:
-            skill_p = 0.0
-        if skill_p > 1.0:
-            skill_p = 1.0
-
-        self._config: ArenaConfig = ArenaConfig(
-            energy_regen_per_turn=3,
-            rng_seed=seed,
-            ai_skill_chance=skill_p,
-            overcharge_damage_mult=1.50,
-            emp_shield_eff_factor=0.50,
-            emp_extra_ignore=0.00,
-        )
+    def __setstate__(self, state: dict[str, object]) -> None:
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
 
     @property
     def log(self) -> tuple[str, ...]:
+        return tuple(render(r) for r in self._log)
+
+    @property
+    def records(self) -> tuple[Record, ...]:
+        """Сырые записи телеметрии (для выгрузки без форматирования)."""
         return tuple(self._log)
 
+    def spill_log_to(self, path: str | Path | None) -> None:
+        """Вытесняемые из памяти записи лога дописывать в файл боя (None — выключить)."""
+        self._log.flush()
+        self._log.spill_path = Path(path) if path is not None else None
+
+    def flush_log(self) -> None:
+        self._log.flush()
+
     @property
     def turn(self) -> Literal["player", "ai"]:
         """Чей сейчас ход: 'player' или 'ai'."""
@@ -109,12 +341,250 @@ class Arena:
         """True, если оба участника боя назначены."""
         return (self._player is not None) and (self._ai is not None)
 
+    @property
+    def config(self) -> ArenaConfig:
+        return self._config
+
+    @property
+    def rng_state(self) -> int:
+        """Состояние RNG (64 бита); доступно только для CompactRandom."""
+        if not isinstance(self._rng, CompactRandom):
+            raise TypeError("Состояние RNG доступно только для CompactRandom")
+        return self._rng.getstate()
+
+    @classmethod
+    def restore(
+        cls,
+        *,
+        player: PlayerUnit,
+        ai: AIUnit,
+        turn: Literal["player", "ai"],
+        difficulty: AIDifficulty,
+        cooldowns: dict[str, dict[str, int]],
+        rng_state: int,
+        config: ArenaConfig | None = None,
+    ) -> Arena:
+        """
+        Поднимает бой из сохранённого состояния (без start(): RNG и КД не сбрасываются).
+        Лог не сохраняется вместе с состоянием, поэтому восстановленный бой начинает его заново.
+        """
+        arena = cls(config)
+        arena._player = player
+        arena._ai = ai
+        arena.ai_difficulty = difficulty
+        arena._turn = turn
+        for side in ("player", "ai"):
+            arena.cooldowns[side].update(cooldowns[side])
+        rng = CompactRandom(0)
+        rng.setstate(rng_state)
+        arena._rng = rng
+        return arena
+
+    def fork(self) -> Arena:
+        """
+        Лёгкая копия боя без лога и журнала (телеметрия off): ходы в ней идут с теми
+        же бросками генератора и не трогают исходный бой (спекуляции, app.speculation).
+        """
+        clone = Arena.restore(
+            player=copy.copy(self.player),
+            ai=copy.copy(self.ai),
+            turn=self._turn,
+            difficulty=self.ai_difficulty,
+            cooldowns=self.cooldowns,
+            rng_state=self.rng_state,
+            config=replace(self._config, telemetry="off"),
+        )
+        for knob in _SEARCH_KNOBS:
+            setattr(clone, knob, getattr(self, knob))
+        return clone
+
+    def to_bytes(self, *, log_tail: int = 0) -> bytes:
+        """
+        Компактная сериализация боя (см. формат v1 выше).
+        log_tail — сколько последних видимых строк лога приложить (0 — без лога).
+        """
+        p, a = self.player, self.ai
+        cfg = self._config
+        cd_p, cd_a = self.cooldowns["player"], self.cooldowns["ai"]
+        flags = 0
+        if self._turn == "ai":
+            flags |= _F_TURN_AI
+        if p.skill_used:
+            flags |= _F_P_SKILL
+        if a.skill_used:
+            flags |= _F_A_SKILL
+        if cfg.rng_seed is not None:
+            flags |= _F_SEED
+        flags |= TELEMETRY_LEVELS.index(cfg.telemetry) << _F_TELEMETRY_SHIFT
+        ai_tuning = _ai_tuning(cfg)
+        tuned = ai_tuning != _DEFAULT_AI_TUNING
+        if tuned:
+            flags |= _F_AI_TUNED
+
+        head = _CODEC_HEAD.pack(
+            _CODEC_VERSION,
+            flags,
+            DIFFICULTIES.index(self.ai_difficulty),
+            self.rng_state,
+            p.hull,
+            p.energy,
+            p.shield_hp,
+            a.hull,
+            a.energy,
+            a.shield_hp,
+            cd_p["overcharge"],
+            cd_p["emp"],
+            cd_a["overcharge"],
+            cd_a["emp"],
+            cfg.energy_regen_per_turn,
+            cfg.rng_seed or 0,
+            cfg.ai_skill_chance,
+            cfg.overcharge_damage_mult,
+            cfg.emp_shield_eff_factor,
+            cfg.emp_extra_ignore,
+        )
+        if tuned:
+            head += _CODEC_AI.pack(*ai_tuning)
+        strings = [
+            p.name,
+            _slug_of(CLASS_REGISTRY, p.unit_class, "UnitClass"),
+            _slug_of(WEAPON_REGISTRY, p.weapon, "Weapon"),
+            _slug_of(SHIELD_REGISTRY, p.shield, "Shield"),
+            a.name,
+            _slug_of(CLASS_REGISTRY, a.unit_class, "UnitClass"),
+            _slug_of(WEAPON_REGISTRY, a.weapon, "Weapon"),
+            _slug_of(SHIELD_REGISTRY, a.shield, "Shield"),
+        ]
+        if log_tail > 0:
+            strings.extend(self._log.visible_tail(log_tail))
+        text = _SEP.join(strings)
+        if text.count(_SEP) != len(strings) - 1:
+            raise ValueError("Строки боя не должны содержать NUL")
+        return head + text.encode("utf-8")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Arena:
+        """Обратная операция к to_bytes: предметы берутся из реестров по слагам."""
+        if not data or data[0] != _CODEC_VERSION:
+            raise ValueError("Неизвестная версия формата боя")
+        (
+            _version,
+            flags,
+            diff_idx,
+            rng_state,
+            p_hull,
+            p_energy,
+            p_shield,
+            a_hull,
+            a_energy,
+            a_shield,
+            p_cd_over,
+            p_cd_emp,
+            a_cd_over,
+            a_cd_emp,
+            regen,
+            seed,
+            skill_chance,
+            over_mult,
+            emp_eff,
+            emp_ignore,
+        ) = _CODEC_HEAD.unpack_from(data)
+
+        offset = _CODEC_HEAD.size
+        ai_tuning = _DEFAULT_AI_TUNING
+        if flags & _F_AI_TUNED:
+            ai_tuning = _CODEC_AI.unpack_from(data, offset)
+            offset += _CODEC_AI.size
+        strings = data[offset:].decode("utf-8").split(_SEP)
+        p_name, p_cls, p_wpn, p_sh, a_name, a_cls, a_wpn, a_sh = strings[:8]
+
+        rng_seed: int | None = seed if flags & _F_SEED else None
+        telemetry = TELEMETRY_LEVELS[(flags >> _F_TELEMETRY_SHIFT) & 0b11]
+        cfg_key = (
+            regen,
+            rng_seed,
+            skill_chance,
+            over_mult,
+            emp_eff,
+            emp_ignore,
+            telemetry,
+            ai_tuning,
+        )
+        config = _CONFIG_CACHE.get(cfg_key)
+        if config is None:
+            config = ArenaConfig(
+                energy_regen_per_turn=regen,
+                rng_seed=rng_seed,
+                ai_skill_chance=skill_chance,
+                overcharge_damage_mult=over_mult,
+                emp_shield_eff_factor=emp_eff,
+                emp_extra_ignore=emp_ignore,
+                telemetry=telemetry,
+                ai_emp_shield_threshold=tuple(int(x) for x in ai_tuning[0:3]),
+                ai_overcharge_hull_pct=tuple(float(x) for x in ai_tuning[3:6]),
+                ai_emp_min_energy=int(ai_tuning[6]),
+                ai_overcharge_min_energy=int(ai_tuning[7]),
+            )
+            _CONFIG_CACHE[cfg_key] = config
+        arena = cls.restore(
+            player=PlayerUnit(
+                name=p_name,
+                unit_class=get_unit_class(p_cls),
+                weapon=get_weapon(p_wpn),
+                shield=get_shield(p_sh),
+                hull=p_hull,
+                energy=p_energy,
+                shield_hp=p_shield,
+                skill_used=bool(flags & _F_P_SKILL),
+            ),
+            ai=AIUnit(
+                name=a_name,
+                unit_class=get_unit_class(a_cls),
+                weapon=get_weapon(a_wpn),
+                shield=get_shield(a_sh),
+                hull=a_hull,
+                energy=a_energy,
+                shield_hp=a_shield,
+                skill_used=bool(flags & _F_A_SKILL),
+            ),
+            turn="ai" if flags & _F_TURN_AI else "player",
+            difficulty=DIFFICULTIES[diff_idx],
+            cooldowns={
+                "player": {"overcharge": p_cd_over, "emp": p_cd_emp},
+                "ai": {"overcharge": a_cd_over, "emp": a_cd_emp},
+            },
+            rng_state=rng_state,
+            config=config,
+        )
+
+        arena._log.extend(text(line) for line in strings[8:])
+        arena.journal = BattleJournal(data, checkpoint_every=cls.checkpoint_every)
+        return arena
+
+    @classmethod
+    def replay(cls, journal: BattleJournal, *, upto: int | None = None) -> Arena:
+        """
+        Пересобирает бой повтором событий журнала (первых upto, по умолчанию всех).
+        Повтор идёт от ближайшего снимка; RNG восстанавливается из него же,
+        поэтому результат совпадает с исходным боем бит в бит.
+        """
+        n = len(journal) if upto is None else upto
+        if not 0 <= n <= len(journal):
+            raise ValueError(f"upto вне журнала: {n}")
+        start_idx, snapshot = journal.nearest_checkpoint(n)
+        arena = cls.from_bytes(snapshot)
+        arena.journal = None
+        for event in journal.events[start_idx:n]:
+            arena.act(event)
+        arena.journal = journal.prefix(n)
+        return arena
+
     def start(
         self,
         player: PlayerUnit,
         ai: AIUnit,
         *,
-        difficulty: Literal["easy", "normal", "hard"] = "normal",
+        difficulty: AIDifficulty = "normal",
     ) -> None:
         """
         Старт боя:
@@ -127,10 +597,16 @@ class Arena:
         self.ai_difficulty = difficulty
         self._turn = "player"
         self._log.clear()
-        self._rng = random.Random(self._config.rng_seed)
-        self._log.append("Бой начался. Ход игрока.")
+        self._rng = CompactRandom(self._config.rng_seed)
+        self._say("Бой начался. Ход игрока.")
         self.cooldowns["player"].update(overcharge=0, emp=0)
         self.cooldowns["ai"].update(overcharge=0, emp=0)
+        try:
+            base = self.to_bytes(log_tail=1)
+        except ValueError:  # незарегистрированные предметы — журнал не ведём
+            self.journal = None
+        else:
+            self.journal = BattleJournal(base, checkpoint_every=self.checkpoint_every)
 
     @property
     def is_finished(self) -> bool:
@@ -139,214 +615,266 @@ class Arena:
 
     @property
     def ui_log(self) -> tuple[str, ...]:
-        visible: list[str] = []
-        for line in self._log:
-            if line.startswith("[SNAP:"):
-                continue
-            if "реген" in line.lower():  # убираем шум про реген
-                continue
-            visible.append(line)
-        return tuple(visible)
-
+        # снимки и шум про реген не показываем и не форматируем
+        return self._log.visible()
+
+    def ui_tail(self, k: int) -> tuple[str, ...]:
+        """Последние k видимых строк лога (для панели), без обхода всего лога."""
+        return self._log.visible_tail(k)
+
+    def act(self, event: BattleEvent) -> AttackOutcome | None:
+        """Одно действие верхнего уровня (как в журнале): выстрел, пропуск, скилл, ход ИИ."""
+        if event.kind == "attack":
+            return self.attack()
+        if event.kind == "pass":
+            self.pass_turn()
+            return None
+        if event.kind == "ai_turn":
+            return self._ai_policy_turn()
+        if event.kind == "ai_move":
+            return self._ai_move(str(event.skill))
+        return self.attack_with_player_skill(str(event.skill))
+
+    def run(
+        self, events: Iterable[BattleEvent], *, ai_replies: bool = False
+    ) -> list[AttackOutcome | None]:
+        """
+        Разрешает действия по порядку за один вызов (под локом боя) и останавливается,
+        когда бой закончен. ai_replies — после каждого действия ИИ отвечает своими ходами.
+        Возвращает исходы всех разрешённых ходов (None — ход без выстрела).
+        """
+        outcomes: list[AttackOutcome | None] = []
+        with self.lock:
+            for event in events:
+                if self.is_finished:
+                    break
+                outcomes.append(self.act(event))
+                if ai_replies:
+                    outcomes.extend(self.run_ai())
+        return outcomes
+
+    def run_ai(self, max_turns: int = 8) -> list[AttackOutcome | None]:
+        """Ходы ИИ подряд, пока ход не вернётся к игроку или бой не закончится."""
+        outcomes: list[AttackOutcome | None] = []
+        with self.lock:
+            for _ in range(max_turns):
+                if self.is_finished or self._turn != "ai":
+                    break
+                outcomes.append(self._ai_take_turn())
+        return outcomes
+
+    @_journaled("attack")
     def attack(self) -> AttackOutcome:
         """
-        Выполняет выстрел текущего атакующего по защищающемуся:
-        1) считает исход через BaseUnit.basic_attack;
-        2) применяет списание энергии, урон по щиту/корпусу;
-        3) регенит ресурсы конца хода у обеих сторон;
-        4) переключает ход.
+        Выстрел текущего атакующего по защищающемуся (у ИИ — со случайным скиллом).
+        Исход, урон, реген конца хода и смена хода — в общем конвейере _resolve.
         """
         attacker, defender = self._attacker_defender()
-
-        ctx: AttackContext = self._maybe_apply_ai_skill(attacker, defender)
-        outcome: AttackOutcome = attacker.basic_attack(
-            defender,
-            rng=self._rng,
-            ctx=ctx,
-        )
-
-        if outcome.energy_spent > 0:
-            attacker.spend_energy(outcome.energy_spent)
-
-        if outcome.hit:
-            if outcome.shield_absorbed > 0:
-                defender.shield_hp -= outcome.shield_absorbed
-                if defender.shield_hp < 0:
-                    defender.shield_hp = 0
-
-            if outcome.hull_damage > 0:
-                defender.hull -= outcome.hull_damage
-                if defender.hull < 0:
-                    defender.hull = 0
-
-        self._log_outcome(attacker_name=attacker.name, outcome=outcome)
-
-        self._snapshot("after-damage")
-        self._end_of_turn_regen()
-        self._snapshot("after-regen")
-
-        if not self.is_finished:
-            self._swap_turn()
-        self._snapshot("after-swap")
+        outcome = self._resolve(Action(self._maybe_apply_ai_skill(attacker, defender)))
+        assert outcome is not None
         return outcome
 
+    @_journaled("pass")
     def pass_turn(self) -> None:
         """Текущий ход пропускается: копим ресурсы, пишем лог, переключаемся."""
-        self._log.append(f"{self._turn}: пропуск хода.")
-        self._snapshot("before-pass-regen")
-        self._end_of_turn_regen()
-        self._snapshot("after-pass-regen")
-
-        if not self.is_finished:
-            self._swap_turn()
-        self._snapshot("after-pass-swap")
+        self._resolve(_PASS)
 
+    @_journaled("skill")
     def attack_with_player_skill(self, slug: str) -> AttackOutcome | None:
         if self.is_finished or self.turn != "player":
             return None
         if slug not in {"overcharge", "emp"}:
             return None
         if not self._cd_ready("player", slug):
-            self._log.append(f"Скилл {slug} на перезарядке.")
+            self._say(f"Скилл {slug} на перезарядке.")
             return None
 
         attacker, defender = self._attacker_defender()
         ctx = self._apply_player_skill(attacker, defender, slug)
-        outcome = attacker.basic_attack(defender, rng=self._rng, ctx=ctx)
-
-        if outcome.energy_spent > 0:
-            attacker.spend_energy(outcome.energy_spent)
-        if outcome.hit:
-            if outcome.shield_absorbed > 0:
-                defender.shield_hp = max(0, defender.shield_hp - outcome.shield_absorbed)
-            if outcome.hull_damage > 0:
-                defender.hull = max(0, defender.hull - outcome.hull_damage)
-
-        self._log_outcome(attacker_name=attacker.name, outcome=outcome)
-        self._end_of_turn_regen()
-        if not self.is_finished:
-            self._swap_turn()
-
-        self._cd_set("player", slug, 2)
-        self._cd_tick()
-        return outcome
+        return self._resolve(Action(ctx, cooldown=slug, tick=True))
 
     def _snapshot(self, label: str) -> None:
+        if self._config.telemetry != "full":
+            return
         p = self.player
         a = self.ai
         self._log.append(
-            f"[SNAP:{label}] turn={self._turn} | "
-            f"P(hull={p.hull}/{p.hull_max}, sh={p.shield_hp}/{p.shield.capacity}, en={p.energy}/{p.energy_max}) | "
-            f"A(hull={a.hull}/{a.hull_max}, sh={a.shield_hp}/{a.shield.capacity}, en={a.energy}/{a.energy_max})"
+            (
+                SNAP,
+                label,
+                self._turn,
+                p.hull,
+                p.hull_max,
+                p.shield_hp,
+                p.shield.capacity,
+                p.energy,
+                p.energy_max,
+                a.hull,
+                a.hull_max,
+                a.shield_hp,
+                a.shield.capacity,
+                a.energy,
+                a.energy_max,
+            )
         )
 
-    def _ai_take_turn(self) -> None:
+    def _ai_take_turn(self) -> AttackOutcome | None:
+        """
+        Ход ИИ: по политике сложности или, на expert и mcts, выбранный поиском.
+        На hard ход берётся из решённой таблицы матчапа (app.solved), если она загружена.
+        """
         if self.is_finished or self.turn != "ai":
-            return
+            return None
+        if self.ai_difficulty == "hard" and len(BOOK):
+            solved = BOOK.move(self)
+            if solved is not None:
+                return self._ai_move(solved)
+        if self.ai_difficulty in ("expert", "mcts"):
+            return self._ai_move(self._searched_move())
+        return self._ai_policy_turn()
+
+    def _searched_move(self) -> AIMove:
+        """
+        Ход expert/mcts. Уже встречавшееся состояние берётся из общего кэша решений
+        (app.ai_cache); детерминированный mcts зависит от состояния генератора и идёт
+        мимо кэша, запасной ход hard в кэш не попадает.
+        """
+        cacheable = not (self.ai_difficulty == "mcts" and self.mcts_deterministic)
+        key = DECISIONS.key(self) if cacheable else None
+        if key is not None:
+            cached = DECISIONS.get(key)
+            if cached is not None:
+                return cached
+        if self.ai_difficulty == "expert":
+            result = engine_for(self).choose(
+                self, deadline=self.expert_deadline, max_depth=self.expert_max_depth
+            )
+            move, settled = result.move, result.depth > 0
+        else:
+            from app.mcts import search  # NumPy нужен только для mcts
+
+            found = search(
+                self,
+                iterations=self.mcts_iterations,
+                batch=self.mcts_batch,
+                time_budget=self.mcts_time_budget,
+                deterministic=self.mcts_deterministic,
+            )
+            move, settled = found.move, not found.fallback
+        if key is not None and settled:
+            DECISIONS.put(key, move)
+        return move
+
+    @_journaled("ai_turn")
+    def _ai_policy_turn(self) -> AttackOutcome | None:
+        if self.is_finished or self.turn != "ai":
+            return None
+        move = self._policy().choose(self.ai, self.player, self.cooldowns["ai"])
+        return self._resolve(self._ai_action(move, random_skill=True))
+
+    @_journaled("ai_move")
+    def _ai_move(self, move: str) -> AttackOutcome | None:
+        """
+        Заданный ход ИИ (решение поиска). В журнал пишется сам ход, а не
+        «ход ИИ»: глубина поиска зависит от времени, и повтор мог бы разойтись.
+        """
+        if self.is_finished or self.turn != "ai" or move not in AI_MOVES:
+            return None
+        return self._resolve(self._ai_action(cast(AIMove, move), random_skill=False))
 
+    def _ai_action(self, move: AIMove, *, random_skill: bool) -> Action:
+        """
+        Ход ИИ → Action; КД в конце хода ИИ тикают всегда.
+        random_skill — обычный выстрел с шансом случайного скилла (пороговые сложности).
+        """
         ai = self.ai
         p = self.player
+        if move == "pass":
+            return _AI_PASS
+        if move != "attack":
+            ctx = self._activate_skill(ai, p, move, mark_used=False)
+            if ctx is not None:
+                return Action(ctx, cooldown=move, tick=True)
+        if not random_skill:
+            return _AI_PLAIN
+        return Action(self._maybe_apply_ai_skill(ai, p), tick=True)
+
+    def _resolve(self, action: Action) -> AttackOutcome | None:
+        """
+        Конвейер хода, общий для всех действий: выстрел → применение исхода →
+        конец хода (реген обеих сторон, смена хода, перезарядка и тик КД).
+        """
+        side = self._turn
+        outcome: AttackOutcome | None = None
+        if action.ctx is None:
+            if self._config.telemetry != "off":
+                self._log.append((PASS, side))
+            labels = _PASS_SNAPS
+        else:
+            attacker, defender = self._attacker_defender()
+            outcome = attacker.basic_attack(
+                defender, rng=self._rng, ctx=action.ctx, trace=self._config.telemetry == "full"
+            )
+            self._apply_outcome(attacker, defender, outcome)
+            self._log_outcome(attacker_name=attacker.name, outcome=outcome)
+            labels = _SHOT_SNAPS
 
-        # Пороговое значение по сложности
-        # EMP: насколько «толстый» щит у игрока считаем поводом жать EMP (в очках щита)
+        self._snapshot(labels[0])
+        self._end_of_turn_regen()
+        self._snapshot(labels[1])
+        if not self.is_finished:
+            self._swap_turn()
+        self._snapshot(labels[2])
 
-        emp_shield_threshold = {
-            "easy": 15,
-            "normal": 8,
-            "hard": 1,
-        }[self.ai_difficulty]
+        if action.cooldown is not None:
+            self._cd_set(side, action.cooldown, SKILL_COOLDOWN_TURNS)
+        if action.tick:
+            self._cd_tick()
+        return outcome
 
-        # Overcharge: добивка при низком hull игрока.
+    @staticmethod
+    def _apply_outcome(
+        attacker: PlayerUnit | AIUnit, defender: PlayerUnit | AIUnit, outcome: AttackOutcome
+    ) -> None:
+        """Списывает энергию выстрела и наносит урон по щиту/корпусу (не ниже нуля)."""
+        if outcome.energy_spent > 0:
+            attacker.spend_energy(outcome.energy_spent)
+        if outcome.hit:
+            if outcome.shield_absorbed > 0:
+                defender.shield_hp = max(0, defender.shield_hp - outcome.shield_absorbed)
+            if outcome.hull_damage > 0:
+                defender.hull = max(0, defender.hull - outcome.hull_damage)
 
-        over_hull_pct = {
-            "easy": 0.25,
-            "normal": 0.35,
-            "hard": 0.45,
-        }[self.ai_difficulty]
+    def _activate_skill(
+        self,
+        user: PlayerUnit | AIUnit,
+        target: PlayerUnit | AIUnit,
+        slug: str,
+        *,
+        mark_used: bool,
+    ) -> AttackContext | None:
+        """
+        Применяет скилл перед выстрелом: списывает энергию, пишет лог.
+        Возвращает контекст выстрела или None, если скилл не сработал.
+        mark_used — скилл расходует разовый «случайный» скилл стороны (skill_used).
+        """
+        who = user.controller
+        compiled = self._skill(slug)
+        skill = compiled.skill
+        if not skill.can_use(user):
+            self._say(f"{who}: попытка {skill.name}, но недостаточно энергии")
+            return None
 
-        # нет энергии → пасс
-        if not ai.can_fire():
-            self.pass_turn()
-            self._cd_tick()
-            return
+        result = skill.execute(user, target)
+        self._say(f"{who}: использует {result.description}")
+        if not result.success:
+            return None
 
-        # EMP по щиту
-        if p.shield_hp > emp_shield_threshold and self._cd_ready("ai", "emp") and ai.energy >= 25:
-            slug = "emp"
-            skill = create_skill(slug)
-            if skill.can_use(ai):
-                result = skill.execute(ai, p)
-                if result.energy_spent > 0:
-                    ai.spend_energy(result.energy_spent)
-
-                ctx = AttackContext(
-                    damage_multiplier=1.0,
-                    extra_shield_ignore=self._config.emp_extra_ignore,
-                    shield_efficiency_factor=self._config.emp_shield_eff_factor,
-                )
-                outcome = ai.basic_attack(p, rng=self._rng, ctx=ctx)
-
-                if outcome.energy_spent > 0:
-                    ai.spend_energy(outcome.energy_spent)
-                if outcome.hit:
-                    if outcome.shield_absorbed > 0:
-                        p.shield_hp = max(0, p.shield_hp - outcome.shield_absorbed)
-                    if outcome.hull_damage > 0:
-                        p.hull = max(0, p.hull - outcome.hull_damage)
-
-                self._log_outcome(attacker_name=ai.name, outcome=outcome)
-                self._end_of_turn_regen()
-                if not self.is_finished:
-                    self._swap_turn()
-
-                self._cd_set("ai", slug, 2)
-                self._cd_tick()
-                return
-
-        # Overcharge добивающий
-        if (
-            self._cd_ready("ai", "overcharge")
-            and ai.energy >= 20
-            and p.hull <= int(0.35 * p.hull_max)
-        ):
-            if (
-                self._cd_ready("ai", "overcharge")
-                and ai.energy >= 20
-                and p.hull <= int(over_hull_pct * p.hull_max)
-            ):
-                slug = "overcharge"
-                skill = create_skill(slug)
-                if skill.can_use(ai):
-                    result = skill.execute(ai, p)
-                    if result.energy_spent > 0:
-                        ai.spend_energy(result.energy_spent)
-
-                    ctx = AttackContext(
-                        damage_multiplier=self._config.overcharge_damage_mult,
-                        extra_shield_ignore=0.0,
-                        shield_efficiency_factor=1.0,
-                    )
-                    outcome = ai.basic_attack(p, rng=self._rng, ctx=ctx)
-
-                    if outcome.energy_spent > 0:
-                        ai.spend_energy(outcome.energy_spent)
-                    if outcome.hit:
-                        if outcome.shield_absorbed > 0:
-                            p.shield_hp = max(0, p.shield_hp - outcome.shield_absorbed)
-                        if outcome.hull_damage > 0:
-                            p.hull = max(0, p.hull - outcome.hull_damage)
-
-                    self._log_outcome(attacker_name=ai.name, outcome=outcome)
-                    self._end_of_turn_regen()
-                    if not self.is_finished:
-                        self._swap_turn()
-
-                    self._cd_set("ai", slug, 2)
-                    self._cd_tick()
-                    return
-
-        self.attack()
-        self._cd_tick()
+        if result.energy_spent > 0:
+            user.spend_energy(result.energy_spent)
+        if mark_used:
+            user.mark_skill_used()
+        return compiled.context
 
     def _apply_player_skill(
         self,
@@ -356,40 +884,12 @@ class Arena:
     ) -> AttackContext:
         # только игрок и только если ещё не использовал
         if attacker.controller != "player" or attacker.skill_used:
-            return AttackContext()
+            return _PLAIN_CTX
         if slug not in {"overcharge", "emp"}:
-            self._log.append(f"player: неизвестный скилл '{slug}'")
-            return AttackContext()
-
-        skill = create_skill(slug)
-        if not skill.can_use(attacker):
-            self._log.append(f"player: попытка {skill.name}, но нет энергии Оо")
-            return AttackContext()
-
-        result = skill.execute(attacker, defender)
-        if not result.success:
-            self._log.append(f"player: использует {result.description}")
-            return AttackContext()
-
-        if result.energy_spent > 0:
-            attacker.spend_energy(result.energy_spent)
-        attacker.mark_skill_used()
-
-        if slug == "overcharge":
-            ctx = AttackContext(
-                damage_multiplier=self._config.overcharge_damage_mult,
-                extra_shield_ignore=0.0,
-                shield_efficiency_factor=1.0,
-            )
-        else:  # emp
-            ctx = AttackContext(
-                damage_multiplier=1.0,
-                extra_shield_ignore=self._config.emp_extra_ignore,
-                shield_efficiency_factor=self._config.emp_shield_eff_factor,
-            )
-
-        self._log.append(f"player: использует {result.description}")
-        return ctx
+            self._say(f"player: неизвестный скилл '{slug}'")
+            return _PLAIN_CTX
+        ctx = self._activate_skill(attacker, defender, slug, mark_used=True)
+        return _PLAIN_CTX if ctx is None else ctx
 
     def _maybe_apply_ai_skill(
         self,
@@ -398,43 +898,23 @@ class Arena:
     ) -> AttackContext:
         # только бот и только если ещё не использовал скилл
         if attacker.controller != "ai" or attacker.skill_used:
-            return AttackContext()
+            return _PLAIN_CTX
 
         # шанс на скилл
         if self._rng.random() >= self._config.ai_skill_chance:
-            return AttackContext()
+            return _PLAIN_CTX
 
         slug = "overcharge" if self._rng.random() < 0.5 else "emp"
-        skill = create_skill(slug)
-
-        if not skill.can_use(attacker):
-            self._log.append(f"ai: попытка {skill.name}, но недостаточно энергии")
-            return AttackContext()
+        ctx = self._activate_skill(attacker, defender, slug, mark_used=True)
+        return _PLAIN_CTX if ctx is None else ctx
 
-        result = skill.execute(attacker, defender)
-        if not result.success:
-            self._log.append(f"ai: использует {result.description}")
-            return AttackContext()
-
-        if result.energy_spent > 0:
-            attacker.spend_energy(result.energy_spent)
-        attacker.mark_skill_used()
-
-        if slug == "overcharge":
-            ctx = AttackContext(
-                damage_multiplier=self._config.overcharge_damage_mult,
-                extra_shield_ignore=0.0,
-                shield_efficiency_factor=1.0,
-            )
-        else:
-            ctx = AttackContext(
-                damage_multiplier=1.0,
-                extra_shield_ignore=self._config.emp_extra_ignore,
-                shield_efficiency_factor=self._config.emp_shield_eff_factor,
-            )
+    def _policy(self) -> ThresholdPolicy:
+        """Пороговая политика ИИ текущей сложности (expert без поиска ходит как hard)."""
+        return self._policies.get(self.ai_difficulty) or self._policies["hard"]
 
-        self._log.append(f"ai использует {result.description}")
-        return ctx
+    def _skill(self, slug: str) -> CompiledSkill:
+        """Скилл и его контекст выстрела под текущий конфиг (таблица на конфиг)."""
+        return compile_skills(self._config)[slug]
 
     def _attacker_defender(
         self,
@@ -447,7 +927,8 @@ class Arena:
     def _swap_turn(self) -> None:
         """Переключает ход и пишет запись в лог."""
         self._turn = "ai" if self._turn == "player" else "player"
-        self._log.append(f"Теперь ход: {self._turn}")
+        if self._config.telemetry != "off":
+            self._log.append((SWAP, self._turn))
 
     def _end_of_turn_regen(self) -> None:
         regen = self._config.energy_regen_per_turn
@@ -461,30 +942,34 @@ class Arena:
                 unit.hull = 0
 
     def _log_outcome(self, attacker_name: str, outcome: AttackOutcome) -> None:
-        """Добавляет в лог короткое описание результата хода атакующего."""
-        if outcome.energy_spent == 0 and not outcome.hit:
-            self._log.append(f"{attacker_name}: недостаточно энергии для выстрела")
+        """Добавляет в лог короткую запись о результате хода атакующего."""
+        if self._config.telemetry == "off":
             return
-
-        if not outcome.hit:
-            self._log.append(f"{attacker_name}: промах (энергия -{outcome.energy_spent})")
-            return
-
         self._log.append(
-            f"{attacker_name}: попал (энергия -{outcome.energy_spent}), "
-            f"урон до щита {outcome.damage_before_shield}, "
-            f"поглотил щит {outcome.shield_absorbed}, "
-            f"корпусу {outcome.hull_damage}"
+            (
+                SHOT,
+                attacker_name,
+                outcome.hit,
+                outcome.energy_spent,
+                outcome.damage_before_shield,
+                outcome.shield_absorbed,
+                outcome.hull_damage,
+            )
         )
 
+    def _say(self, message: str) -> None:
+        if self._config.telemetry != "off":
+            self._log.append(text(message))
+
     def reset(self) -> None:
         """Сбрасывает текущий бой."""
         self._player = None
         self._ai = None
         self._turn = "player"
         self._log.clear()
-        self._rng = random.Random(self._config.rng_seed)
-        self._log.append("Бой сброшен")
+        self._rng = CompactRandom(self._config.rng_seed)
+        self.journal = None
+        self._say("Бой сброшен")
 
     def _cd_ready(self, side: str, slug: str) -> bool:
         return self.cooldowns.get(side, {}).get(slug, 0) <= 0
@@ -499,6 +984,27 @@ class Arena:
                     self.cooldowns[side][k] = v - 1
 
 
+class SingletonArena(Arena):
+    """
+    Легаси-шим: прежний Singleton (одна арена на процесс).
+    Включается только явно, веб-слой его не использует.
+    """
+
+    _instance: ClassVar[SingletonArena | None] = None
+
+    def __new__(cls, config: ArenaConfig | None = None) -> SingletonArena:
+        """Создаём один раз, потом всегда возвращаем его."""
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self, config: ArenaConfig | None = None) -> None:
+        if getattr(self, "_initialized", False):
+            return
+        super().__init__(config)
+        self._initialized = True
+
+
 def _ensure_sample_classes() -> None:
     if "interceptor" not in CLASS_REGISTRY:
         register_unit_class(
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from time import monotonic
+from typing import Protocol
+
+from app.arena import Arena
+
+# Сколько протухших записей снимаем «попутно» при каждом get/put.
+_SWEEP_PER_CALL = 8
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0  # вытеснены по размеру
+    expirations: int = 0  # удалены по TTL
+
+
+class ArenaCache:
+    """
+    LRU/TTL-кэш арен.
+    OrderedDict держит записи в порядке последнего обращения, поэтому:
+    - touch — move_to_end, O(1);
+    - самые старые всегда в начале: истечение TTL и вытеснение — popitem(last=False), O(1);
+    - протухшие записи снимаются порциями при обычных вызовах (амортизированно).
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float,
+        max_size: int,
+        clock: Callable[[], float] = monotonic,
+        sweep_per_call: int = _SWEEP_PER_CALL,
+    ) -> None:
+        if max_size <= 0:
+            raise ValueError("max_size должен быть > 0")
+        self.ttl = ttl
+        self.max_size = max_size
+        # 0 — не чистить в запросах (этим занимается ArenaReaper).
+        self.sweep_per_call = sweep_per_call
+        self._clock = clock
+        # Куда отдавать вытесненные по размеру арены: (ключ, арена, время обращения).
+        self.on_evict: Callable[[str, Arena, float], None] | None = None
+        self._items: OrderedDict[str, tuple[Arena, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._items
+
+    def now(self) -> float:
+        """Текущее время по часам кэша (для TTL снаружи, см. MemoryArenaStore)."""
+        return self._clock()
+
+    def get(self, key: str) -> Arena | None:
+        """Возвращает арену и продлевает ей жизнь; None — если нет или протухла."""
+        now = self._clock()
+        with self._lock:
+            self._sweep_locked(now, self.sweep_per_call)
+            entry = self._items.get(key)
+            if entry is None:
+                self._stats.misses += 1
+                return None
+            arena, ts = entry
+            if now - ts > self.ttl:
+                del self._items[key]
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return None
+            self._items[key] = (arena, now)
+            self._items.move_to_end(key)
+            self._stats.hits += 1
+            return arena
+
+    def put(self, key: str, arena: Arena) -> None:
+        now = self._clock()
+        evicted: list[tuple[str, tuple[Arena, float]]] = []
+        with self._lock:
+            self._sweep_locked(now, self.sweep_per_call)
+            self._items[key] = (arena, now)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                evicted.append(self._items.popitem(last=False))
+                self._stats.evictions += 1
+        # колбэк — вне лока кэша: он может сам писать в кэш или брать свои локи
+        if self.on_evict is not None:
+            for old_key, (old_arena, ts) in evicted:
+                self.on_evict(old_key, old_arena, ts)
+
+    def pop(self, key: str) -> Arena | None:
+        with self._lock:
+            entry = self._items.pop(key, None)
+        return entry[0] if entry is not None else None
+
+    def sweep(self, limit: int | None = None) -> int:
+        """Снимает протухшие записи (не больше limit за вызов); возвращает сколько снято."""
+        with self._lock:
+            return self._sweep_locked(self._clock(), limit)
+
+    def _sweep_locked(self, now: float, limit: int | None) -> int:
+        removed = 0
+        while self._items and (limit is None or removed < limit):
+            _, (_, ts) = next(iter(self._items.items()))
+            if now - ts <= self.ttl:
+                break
+            self._items.popitem(last=False)
+            removed += 1
+        self._stats.expirations += removed
+        return removed
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            data = asdict(self._stats)
+            data["size"] = len(self._items)
+        return data
+
+
+class Sweepable(Protocol):
+    def sweep(self, limit: int | None = None) -> int: ...
+
+
+class ArenaReaper:
+    """
+    Фоновый «жнец»: раз в interval секунд снимает не больше batch протухших арен.
+    Запросы при этом не платят за обслуживание кэша.
+    """
+
+    def __init__(self, target: Sweepable, *, interval: float, batch: int) -> None:
+        if interval <= 0:
+            raise ValueError("interval должен быть > 0")
+        self.target = target
+        self.interval = interval
+        self.batch = batch
+        self.reaped = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="arena-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def tick(self) -> int:
+        """Один проход: ограниченная порция работы."""
+        removed = self.target.sweep(limit=self.batch)
+        self.reaped += removed
+        return removed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception:  # жнец не должен умирать от одной ошибки
+                log.exception("arena reaper tick failed")
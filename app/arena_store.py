@@ -0,0 +1,482 @@
+from __future__ import annotations
+
+import abc
+import socket
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import asdict
+from pathlib import Path
+from time import time
+from urllib.parse import urlparse
+
+from app.arena import Arena
+from app.arena_cache import ArenaCache, CacheStats
+from app.state_table import BattleStateTable
+
+# Сколько видимых строк лога сохраняем вместе с боем (панель показывает последние 8).
+_LOG_TAIL = 8
+
+
+def _dumps(arena: Arena) -> bytes:
+    return arena.to_bytes(log_tail=_LOG_TAIL)
+
+
+def _loads(data: bytes) -> Arena:
+    return Arena.from_bytes(data)
+
+
+class ArenaConflict(Exception):
+    """Бой в общем хранилище сохранил другой запрос после нашей загрузки."""
+
+
+class _LoadedData:
+    """
+    С какими байтами арена загружена из общего хранилища: save пишет, только если
+    в хранилище всё ещё они (compare-and-set). Байты включают состояние RNG,
+    поэтому любой ход их меняет.
+    """
+
+    def __init__(self) -> None:
+        self._data: weakref.WeakKeyDictionary[Arena, bytes] = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, arena: Arena) -> bytes | None:
+        with self._lock:
+            return self._data.get(arena)
+
+    def set(self, arena: Arena, data: bytes) -> None:
+        with self._lock:
+            self._data[arena] = data
+
+
+class ArenaStore(abc.ABC):
+    """
+    Хранилище боёв по arena_id.
+    Веб-слой загружает бой в начале запроса и сохраняет после хода, поэтому
+    с общим хранилищем (SQLite/KV) запрос может попасть в любой воркер. Если бой
+    между load и save сохранил другой воркер, save общего хранилища не пишет и
+    бросает ArenaConflict: ход надо повторить на свежей загрузке.
+    """
+
+    @abc.abstractmethod
+    def load(self, aid: str) -> Arena | None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def save(self, aid: str, arena: Arena) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, aid: str) -> None:
+        raise NotImplementedError
+
+    def sweep(self, limit: int | None = None) -> int:
+        """Удаляет протухшие бои (если хранилище само этого не делает)."""
+        return 0
+
+    @abc.abstractmethod
+    def stats(self) -> dict[str, int]:
+        raise NotImplementedError
+
+
+class MemoryArenaStore(ArenaStore):
+    """
+    Бои живут объектами в памяти воркера (LRU/TTL-кэш). С parked_max > 0 бои,
+    вытесненные из кэша по размеру, не теряются, а паркуются строкой
+    BattleStateTable (состояние, имена и хвост лога вместо объекта Arena) и
+    поднимаются обратно в кэш при следующем запросе; TTL у них тот же.
+    """
+
+    def __init__(self, cache: ArenaCache, *, parked_max: int = 0) -> None:
+        if parked_max < 0:
+            raise ValueError("parked_max должен быть >= 0")
+        self.cache = cache
+        self.parked_max = parked_max
+        self.table = BattleStateTable() if parked_max else None
+        # aid → (слот, время последнего обращения); порядок — порядок вытеснения
+        self._parked: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        # запись в кэш (с парковкой вытесненных) и подъём из таблицы — под одним
+        # локом, поэтому бой всегда виден либо в кэше, либо в таблице
+        self._lock = threading.RLock()
+        self._unparked = 0
+        self._parked_evictions = 0
+        self._parked_expirations = 0
+        cache.on_evict = self._park if self.table is not None else None
+
+    def load(self, aid: str) -> Arena | None:
+        arena = self.cache.get(aid)
+        if arena is not None or self.table is None:
+            return arena
+        with self._lock:
+            if aid in self.cache:  # подняли, пока ждали лок
+                return self.cache.get(aid)
+            entry = self._parked.pop(aid, None)
+            if entry is None:
+                return None
+            slot, ts = entry
+            try:
+                if self.cache.now() - ts > self.cache.ttl:
+                    self._parked_expirations += 1
+                    return None
+                arena = self.table.load(slot)
+            finally:
+                self.table.free(slot)
+            self._unparked += 1
+            self.cache.put(aid, arena)
+        return arena
+
+    def save(self, aid: str, arena: Arena) -> None:
+        if self.table is None:
+            self.cache.put(aid, arena)
+            return
+        with self._lock:
+            self._drop_parked(aid)
+            self.cache.put(aid, arena)
+
+    def delete(self, aid: str) -> None:
+        with self._lock:
+            self.cache.pop(aid)
+            self._drop_parked(aid)
+
+    def sweep(self, limit: int | None = None) -> int:
+        removed = self.cache.sweep(limit)
+        if self.table is None:
+            return removed
+        with self._lock:
+            now = self.cache.now()
+            while self._parked and (limit is None or removed < limit):
+                aid, (slot, ts) = next(iter(self._parked.items()))
+                if now - ts <= self.cache.ttl:
+                    break
+                del self._parked[aid]
+                self.table.free(slot)
+                self._parked_expirations += 1
+                removed += 1
+        return removed
+
+    def stats(self) -> dict[str, int]:
+        data = self.cache.stats()
+        if self.table is not None:
+            with self._lock:
+                data["parked"] = len(self._parked)
+                data["unparked"] = self._unparked
+                data["parked_evictions"] = self._parked_evictions
+                data["parked_expirations"] = self._parked_expirations
+        return data
+
+    def _park(self, aid: str, arena: Arena, ts: float) -> None:
+        """Колбэк вытеснения кэша: бой уходит строкой в таблицу."""
+        if self.table is None or not arena.is_initialized:
+            return
+        with self._lock:
+            self._drop_parked(aid)
+            slot = self.table.alloc()
+            try:
+                self.table.store(slot, arena, log_tail=_LOG_TAIL)
+            except (OverflowError, TypeError):  # не влезло в колонки / не CompactRandom
+                self.table.free(slot)
+                self._parked_evictions += 1
+                return
+            self._parked[aid] = (slot, ts)
+            while len(self._parked) > self.parked_max:
+                _, (old, _) = self._parked.popitem(last=False)
+                self.table.free(old)
+                self._parked_evictions += 1
+
+    def _drop_parked(self, aid: str) -> None:
+        entry = self._parked.pop(aid, None)
+        if entry is not None and self.table is not None:
+            self.table.free(entry[0])
+
+
+class SqliteArenaStore(ArenaStore):
+    """
+    Бои в SQLite-файле, общем для всех воркеров одного узла.
+    Соединение — своё на каждый поток (sqlite3 привязывает соединение к потоку).
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        ttl: float,
+        clock: Callable[[], float] = time,
+    ) -> None:
+        self.path = str(path)
+        self.ttl = ttl
+        self._clock = clock
+        self._local = threading.local()
+        self._stats = CacheStats()
+        self._loaded = _LoadedData()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS arenas ("
+                " aid TEXT PRIMARY KEY, data BLOB NOT NULL, ts REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS arenas_ts ON arenas(ts)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            self._local.conn = conn
+        return conn
+
+    def load(self, aid: str) -> Arena | None:
+        now = self._clock()
+        with self._conn() as conn:
+            row = conn.execute("SELECT data, ts FROM arenas WHERE aid = ?", (aid,)).fetchone()
+            if row is None:
+                self._stats.misses += 1
+                return None
+            data, ts = row
+            if now - ts > self.ttl:
+                conn.execute("DELETE FROM arenas WHERE aid = ?", (aid,))
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return None
+            conn.execute("UPDATE arenas SET ts = ? WHERE aid = ?", (now, aid))
+        self._stats.hits += 1
+        arena = _loads(data)
+        self._loaded.set(arena, data)
+        return arena
+
+    def save(self, aid: str, arena: Arena) -> None:
+        data = _dumps(arena)
+        expected = self._loaded.get(arena)
+        with self._conn() as conn:
+            if expected is None:  # новый бой — пишем как есть
+                conn.execute(
+                    "INSERT OR REPLACE INTO arenas (aid, data, ts) VALUES (?, ?, ?)",
+                    (aid, data, self._clock()),
+                )
+            else:
+                cur = conn.execute(
+                    "UPDATE arenas SET data = ?, ts = ? WHERE aid = ? AND data = ?",
+                    (data, self._clock(), aid, expected),
+                )
+                if cur.rowcount == 0:
+                    raise ArenaConflict(aid)
+        self._loaded.set(arena, data)
+
+    def delete(self, aid: str) -> None:
+        with self._conn() as conn:
+            conn.execute("DELETE FROM arenas WHERE aid = ?", (aid,))
+
+    def sweep(self, limit: int | None = None) -> int:
+        cutoff = self._clock() - self.ttl
+        with self._conn() as conn:
+            cur = conn.execute(
+                "DELETE FROM arenas WHERE aid IN (SELECT aid FROM arenas WHERE ts < ? LIMIT ?)",
+                (cutoff, -1 if limit is None else limit),
+            )
+            removed = cur.rowcount
+        self._stats.expirations += removed
+        return removed
+
+    def stats(self) -> dict[str, int]:
+        data = asdict(self._stats)
+        with self._conn() as conn:
+            data["size"] = conn.execute("SELECT COUNT(*) FROM arenas").fetchone()[0]
+        return data
+
+
+# Ответ RESP: строка, число, массив (EXEC) или nil.
+_Reply = bytes | int | list["_Reply"] | None
+
+
+class RespClient:
+    """
+    Минимальный клиент протокола RESP (Redis/Valkey/KeyDB): GET, SET EX, DEL и
+    compare-and-set через WATCH/MULTI/EXEC.
+    Одно соединение под локом; при сетевой ошибке переподключается один раз.
+    """
+
+    def __init__(self, host: str, port: int, *, db: int = 0, timeout: float = 2.0) -> None:
+        self.host = host
+        self.port = port
+        self.db = db
+        self.timeout = timeout
+        self._sock: socket.socket | None = None
+        self._buf = b""
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str) -> RespClient:
+        """redis://host:port/db"""
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(parsed.hostname or "127.0.0.1", parsed.port or 6379, db=db)
+
+    def get(self, key: str) -> bytes | None:
+        reply = self._call(b"GET", key.encode())
+        return reply if isinstance(reply, bytes) else None
+
+    def set(self, key: str, value: bytes, *, ex: int | None = None) -> None:
+        args = [b"SET", key.encode(), value]
+        if ex is not None:
+            args += [b"EX", str(ex).encode()]
+        self._call(*args)
+
+    def delete(self, key: str) -> None:
+        self._call(b"DEL", key.encode())
+
+    def compare_and_set(
+        self, key: str, expected: bytes, value: bytes, *, ex: int | None = None
+    ) -> bool:
+        """SET, только если значение ключа всё ещё expected; False — ключ изменился."""
+        set_args = [b"SET", key.encode(), value]
+        if ex is not None:
+            set_args += [b"EX", str(ex).encode()]
+        with self._lock:
+            try:
+                return self._cas(key.encode(), expected, tuple(set_args))
+            except OSError:
+                self._drop()
+                return self._cas(key.encode(), expected, tuple(set_args))
+
+    def _cas(self, key: bytes, expected: bytes, set_args: tuple[bytes, ...]) -> bool:
+        # WATCH держится на соединении, поэтому вся последовательность — под одним локом
+        self._roundtrip((b"WATCH", key))
+        if self._roundtrip((b"GET", key)) != expected:
+            self._roundtrip((b"UNWATCH",))
+            return False
+        self._roundtrip((b"MULTI",))
+        self._roundtrip(set_args)
+        return self._roundtrip((b"EXEC",)) is not None  # nil — ключ тронули после WATCH
+
+    def close(self) -> None:
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+    def _call(self, *args: bytes) -> _Reply:
+        with self._lock:
+            try:
+                return self._roundtrip(args)
+            except OSError:
+                self._drop()
+                return self._roundtrip(args)
+
+    def _drop(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._buf = b""
+
+    def _roundtrip(self, args: tuple[bytes, ...]) -> _Reply:
+        if self._sock is None:
+            self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self._buf = b""
+            if self.db:
+                self._send((b"SELECT", str(self.db).encode()))
+                self._read_reply()
+        self._send(args)
+        return self._read_reply()
+
+    def _send(self, args: tuple[bytes, ...]) -> None:
+        assert self._sock is not None
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._sock.sendall(b"".join(parts))
+
+    def _read_line(self) -> bytes:
+        assert self._sock is not None
+        while b"\r\n" not in self._buf:
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("KV-сервер закрыл соединение")
+            self._buf += chunk
+        line, self._buf = self._buf.split(b"\r\n", 1)
+        return line
+
+    def _read_exact(self, n: int) -> bytes:
+        assert self._sock is not None
+        while len(self._buf) < n + 2:
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("KV-сервер закрыл соединение")
+            self._buf += chunk
+        data, self._buf = self._buf[:n], self._buf[n + 2 :]
+        return data
+
+    def _read_reply(self) -> _Reply:
+        line = self._read_line()
+        kind, rest = line[:1], line[1:]
+        if kind == b"+":
+            return rest
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            return None if size < 0 else self._read_exact(size)
+        if kind == b"*":
+            count = int(rest)
+            return None if count < 0 else [self._read_reply() for _ in range(count)]
+        if kind == b"-":
+            raise RuntimeError(f"KV error: {rest.decode(errors='replace')}")
+        raise ValueError(f"Неожиданный ответ KV: {line!r}")
+
+
+class KeyValueArenaStore(ArenaStore):
+    """
+    Бои в сетевом KV (Redis-совместимом): общие для всех воркеров и узлов.
+    TTL отдаём серверу (SET EX), поэтому sweep не нужен.
+    """
+
+    def __init__(self, client: RespClient, *, ttl: float, prefix: str = "arena:") -> None:
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._stats = CacheStats()
+        self._loaded = _LoadedData()
+
+    def load(self, aid: str) -> Arena | None:
+        data = self.client.get(self.prefix + aid)
+        if data is None:
+            self._stats.misses += 1
+            return None
+        self._stats.hits += 1
+        arena = _loads(data)
+        self._loaded.set(arena, data)
+        return arena
+
+    def save(self, aid: str, arena: Arena) -> None:
+        data = _dumps(arena)
+        expected = self._loaded.get(arena)
+        ex = max(1, int(self.ttl))
+        if expected is None:  # новый бой — пишем как есть
+            self.client.set(self.prefix + aid, data, ex=ex)
+        elif not self.client.compare_and_set(self.prefix + aid, expected, data, ex=ex):
+            raise ArenaConflict(aid)
+        self._loaded.set(arena, data)
+
+    def delete(self, aid: str) -> None:
+        self.client.delete(self.prefix + aid)
+
+    def stats(self) -> dict[str, int]:
+        return asdict(self._stats)
+
+
+def make_arena_store(kind: str, url: str, *, cache: ArenaCache, parked_max: int = 0) -> ArenaStore:
+    """
+    Фабрика по конфигу: memory | sqlite (url — путь к файлу) | kv (url — redis://...).
+    parked_max — сколько вытесненных боёв memory держит строками BattleStateTable.
+    """
+    kind = kind.strip().lower()
+    cache.on_evict = None  # прежнее memory-хранилище больше не паркует
+    if kind == "memory":
+        return MemoryArenaStore(cache, parked_max=parked_max)
+    if kind == "sqlite":
+        return SqliteArenaStore(url or "arenas.sqlite3", ttl=cache.ttl)
+    if kind == "kv":
+        return KeyValueArenaStore(
+            RespClient.from_url(url or "redis://127.0.0.1:6379/0"), ttl=cache.ttl
+        )
+    raise ValueError(f"Неизвестный ARENA_STORE: {kind!r}")
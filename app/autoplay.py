@@ -0,0 +1,82 @@
+"""
+Автобой: доигрывание боя на сервере за один запрос (POST /fight/autoplay).
+
+Ходы игрока выбирает политика игрока: attack — стрелять, пока хватает энергии
+(иначе пропуск, как игрок в app.sim), или пороговая политика easy/normal/hard из
+app.policy, применённая к игроку «зеркально» (EMP по щиту ИИ, Overcharge на
+добивание). ИИ отвечает как обычно (Arena.run_ai), поэтому журнал и итог боя
+такие же, как при ручных кликах с теми же действиями.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal
+
+from app.policy import THRESHOLD_DIFFICULTIES, compile_policies
+from app.speculation import PlayerAction
+
+if TYPE_CHECKING:
+    from app.arena import Arena
+    from app.unit import AttackOutcome
+
+PlayerPolicy = Literal["attack", "easy", "normal", "hard"]
+PLAYER_POLICIES: tuple[PlayerPolicy, ...] = ("attack", *THRESHOLD_DIFFICULTIES)
+
+
+@dataclass(frozen=True, slots=True)
+class TurnSummary:
+    """Ход игрока и ответ ИИ одной строкой."""
+
+    turn: int
+    action: PlayerAction
+    dealt: int  # урон игрока по щиту и корпусу ИИ
+    taken: int  # урон ИИ по щиту и корпусу игрока
+    p_hull: int
+    a_hull: int
+
+
+def player_move(arena: Arena, policy: PlayerPolicy) -> PlayerAction:
+    """Действие игрока по политике в текущем состоянии боя."""
+    p = arena.player
+    if policy == "attack":
+        return "attack" if p.can_fire() else "pass"
+    cds = arena.cooldowns["player"]
+    move = compile_policies(arena.config)[policy].choose(p, arena.ai, cds)
+    if move in ("overcharge", "emp") and p.skill_used:
+        return "attack"  # скилл игрока — один на бой
+    return move
+
+
+def _damage(outcomes: Iterable[AttackOutcome | None]) -> int:
+    return sum(o.shield_absorbed + o.hull_damage for o in outcomes if o is not None and o.hit)
+
+
+def autoplay(arena: Arena, *, policy: PlayerPolicy, max_turns: int) -> list[TurnSummary]:
+    """
+    До max_turns ходов игрока с ответами ИИ (под локом боя); останавливается на
+    конце боя. Возвращает сводку по ходам.
+    """
+    summary: list[TurnSummary] = []
+    with arena.lock:
+        arena.run_ai()  # если бой ждёт ответа ИИ
+        for turn in range(1, max_turns + 1):
+            if arena.is_finished or arena.turn != "player":
+                break
+            action = player_move(arena, policy)
+            dealt = _damage([_act(arena, action)])
+            taken = _damage(arena.run_ai())
+            summary.append(
+                TurnSummary(turn, action, dealt, taken, arena.player.hull, arena.ai.hull)
+            )
+    return summary
+
+
+def _act(arena: Arena, action: PlayerAction) -> AttackOutcome | None:
+    if action == "attack":
+        return arena.attack()
+    if action == "pass":
+        arena.pass_turn()
+        return None
+    return arena.attack_with_player_skill(action)
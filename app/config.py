@@ -13,6 +13,47 @@ class Config:
     ARENA_RNG_SEED: str | None = None
     AI_SKILL_CHANCE: str | None = None
 
+    # Кэш арен: TTL (сек), максимум боёв на воркер, шаг и порция фоновой чистки.
+    ARENA_TTL: int = 30 * 60
+    ARENA_MAX: int = 1000
+    ARENA_SWEEP_INTERVAL: float = 5.0
+    ARENA_SWEEP_BATCH: int = 256
+    # memory: сколько вытесненных из кэша боёв держать строками BattleStateTable (0 — выкл.).
+    ARENA_PARKED_MAX: int = 20_000
+
+    # Где живут бои: memory (в воркере) | sqlite (файл на узел) | kv (Redis-совместимый).
+    ARENA_STORE: str = "memory"
+    ARENA_STORE_URL: str = ""
+    # Каталог, куда дописываются вытесненные из памяти строки лога боя ("" — выкл.).
+    ARENA_LOG_SPILL_DIR: str = ""
+    # Каталог решённых таблиц ИИ (python -m app.solved) для сложности hard ("" — выкл.).
+    AI_POLICY_TABLES: str = ""
+    # Файл порогов ИИ от python -m app.tuning ("" — пороги по умолчанию).
+    AI_TUNING_FILE: str = ""
+    # Общий кэш решений ИИ expert/mcts: максимум записей на воркер (0 — выкл.) и квант состояния.
+    AI_DECISION_CACHE_MAX: int = 65_536
+    AI_DECISION_CACHE_QUANTUM: int = 1
+    # Спекулятивный ответ ИИ expert/mcts, пока игрок думает: потоков пула (0 — выкл.).
+    AI_SPECULATE_WORKERS: int = 0
+    # Автобой (POST /fight/autoplay): потолок ходов игрока за один запрос.
+    AUTOPLAY_MAX_TURNS: int = 200
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    try:
+        return int(raw) if raw is not None else default
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    try:
+        return float(raw) if raw is not None else default
+    except ValueError:
+        return default
+
 
 def make_config_from_env() -> Config:
     cfg = Config()
@@ -22,4 +63,21 @@ def make_config_from_env() -> Config:
     cfg.ARENA_RNG_SEED = os.getenv("ARENA_RNG_SEED")
     cfg.AI_SKILL_CHANCE = os.getenv("AI_SKILL_CHANCE")
 
+    cfg.ARENA_TTL = _env_int("ARENA_TTL", cfg.ARENA_TTL)
+    cfg.ARENA_MAX = _env_int("ARENA_MAX", cfg.ARENA_MAX)
+    cfg.ARENA_SWEEP_INTERVAL = _env_float("ARENA_SWEEP_INTERVAL", cfg.ARENA_SWEEP_INTERVAL)
+    cfg.ARENA_SWEEP_BATCH = _env_int("ARENA_SWEEP_BATCH", cfg.ARENA_SWEEP_BATCH)
+    cfg.ARENA_PARKED_MAX = _env_int("ARENA_PARKED_MAX", cfg.ARENA_PARKED_MAX)
+    cfg.ARENA_STORE = os.getenv("ARENA_STORE", cfg.ARENA_STORE)
+    cfg.ARENA_STORE_URL = os.getenv("ARENA_STORE_URL", cfg.ARENA_STORE_URL)
+    cfg.ARENA_LOG_SPILL_DIR = os.getenv("ARENA_LOG_SPILL_DIR", cfg.ARENA_LOG_SPILL_DIR)
+    cfg.AI_POLICY_TABLES = os.getenv("AI_POLICY_TABLES", cfg.AI_POLICY_TABLES)
+    cfg.AI_TUNING_FILE = os.getenv("AI_TUNING_FILE", cfg.AI_TUNING_FILE)
+    cfg.AI_DECISION_CACHE_MAX = _env_int("AI_DECISION_CACHE_MAX", cfg.AI_DECISION_CACHE_MAX)
+    cfg.AI_DECISION_CACHE_QUANTUM = _env_int(
+        "AI_DECISION_CACHE_QUANTUM", cfg.AI_DECISION_CACHE_QUANTUM
+    )
+    cfg.AI_SPECULATE_WORKERS = _env_int("AI_SPECULATE_WORKERS", cfg.AI_SPECULATE_WORKERS)
+    cfg.AUTOPLAY_MAX_TURNS = _env_int("AUTOPLAY_MAX_TURNS", cfg.AUTOPLAY_MAX_TURNS)
+
     return cfg
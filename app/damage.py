@@ -0,0 +1,147 @@
+"""
+Таблицы урона по броску.
+
+При фиксированных (класс и оружие атакующего, класс и щит цели, AttackContext)
+исход попадания зависит только от броска урона и текущего shield_hp цели.
+Поэтому float-арифметика (модификаторы, clamp01, round, _round_half_up)
+считается один раз на бросок, а попадание сводится к индексу и min() по щиту.
+Таблицы кэшируются по сборке и сбрасываются при перезагрузке каталога.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.classes import UnitClass
+    from app.equipment import Shield, Weapon
+    from app.unit import AttackContext
+
+
+def _round_half_up(x: float) -> int:
+    """Математическое округление: 0.5 → вверх."""
+    return int(math.floor(x + 0.5))
+
+
+def clamp01(x: float) -> float:
+    """Обрезает значение к диапазону [0.0, 1.0]."""
+    if x < 0.0:
+        return 0.0
+    if x > 1.0:
+        return 1.0
+    return x
+
+
+def _resolve(
+    roll: int, attack_mod: float, dmgx: float, eff_ignore: float, eff_shield: float
+) -> tuple[int, int, int]:
+    """(modified, nonignored, potential) — арифметика BaseUnit._resolve_damage_on_hit."""
+    modified = max(0, int(round(float(roll) * attack_mod * dmgx)))
+    nonignored = int(round(modified * (1.0 - eff_ignore)))
+    return modified, nonignored, _round_half_up(nonignored * eff_shield)
+
+
+@dataclass(frozen=True, slots=True)
+class DamageTable:
+    """
+    Исходы попадания по броскам dmg_min..dmg_max: урон после модификаторов,
+    неигнорируемая часть и потолок поглощения щитом (до ограничения shield_hp).
+    """
+
+    dmg_min: int
+    attack_mod: float
+    damage_multiplier: float
+    eff_ignore: float
+    eff_shield: float
+    modified: tuple[int, ...]
+    nonignored: tuple[int, ...]
+    potential: tuple[int, ...]
+
+    @classmethod
+    def build(
+        cls,
+        attacker_class: UnitClass,
+        weapon: Weapon,
+        target_class: UnitClass,
+        target_shield: Shield,
+        ctx: AttackContext,
+    ) -> DamageTable:
+        eff_ignore = clamp01(weapon.shield_ignore + ctx.extra_shield_ignore)
+        eff_shield = clamp01(
+            target_shield.efficiency * target_class.shield_mod * ctx.shield_efficiency_factor
+        )
+        rows = [
+            _resolve(roll, attacker_class.attack_mod, ctx.damage_multiplier, eff_ignore, eff_shield)
+            for roll in range(weapon.dmg_min, weapon.dmg_max + 1)
+        ]
+        return cls(
+            weapon.dmg_min,
+            attacker_class.attack_mod,
+            ctx.damage_multiplier,
+            eff_ignore,
+            eff_shield,
+            tuple(r[0] for r in rows),
+            tuple(r[1] for r in rows),
+            tuple(r[2] for r in rows),
+        )
+
+    def row(self, roll: int) -> tuple[int, int, int]:
+        """(modified, nonignored, potential) для броска; вне диапазона — расчётом."""
+        i = roll - self.dmg_min
+        if 0 <= i < len(self.modified):
+            return self.modified[i], self.nonignored[i], self.potential[i]
+        return _resolve(
+            roll, self.attack_mod, self.damage_multiplier, self.eff_ignore, self.eff_shield
+        )
+
+    def hit(self, roll: int, shield_hp: int) -> tuple[int, int, int]:
+        """(урон до щита, поглощено щитом, урон корпусу) при текущем shield_hp цели."""
+        modified, _, potential = self.row(roll)
+        absorbed = min(potential, shield_hp)
+        return modified, absorbed, modified - absorbed
+
+
+# (id класса, id оружия, id класса цели, id щита цели, поля контекста) → (объекты, таблица).
+# Ключ по id дешевле хэша вложенных датаклассов; объекты держим, чтобы id не переиспользовались.
+_TABLES: dict[tuple[object, ...], tuple[tuple[object, ...], DamageTable]] = {}
+_TABLES_MAX = 4096
+
+
+def damage_table(
+    attacker_class: UnitClass,
+    weapon: Weapon,
+    target_class: UnitClass,
+    target_shield: Shield,
+    ctx: AttackContext,
+) -> DamageTable:
+    key = (
+        id(attacker_class),
+        id(weapon),
+        id(target_class),
+        id(target_shield),
+        ctx.damage_multiplier,
+        ctx.extra_shield_ignore,
+        ctx.shield_efficiency_factor,
+    )
+    cached = _TABLES.get(key)
+    if cached is not None:
+        owners, table = cached
+        if (
+            owners[0] is attacker_class
+            and owners[1] is weapon
+            and owners[2] is target_class
+            and owners[3] is target_shield
+        ):
+            return table
+    if len(_TABLES) >= _TABLES_MAX:
+        _TABLES.clear()
+    table = DamageTable.build(attacker_class, weapon, target_class, target_shield, ctx)
+    _TABLES[key] = ((attacker_class, weapon, target_class, target_shield), table)
+    return table
+
+
+def clear_damage_tables() -> None:
+    """Сброс кэша (перезагрузка каталога оборудования)."""
+    _TABLES.clear()
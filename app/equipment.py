@@ -9,6 +9,8 @@ from typing import IO, Literal
 from marshmallow import Schema, ValidationError
 from marshmallow_dataclass import class_schema
 
+from app.damage import clear_damage_tables
+
 # ====== Датаклассы экипировки ======
 
 
@@ -121,6 +123,7 @@ def load_equipment_from_json(
         raise ValueError(f"equipment.json: некорректный JSON: {exc}") from exc
     WEAPON_REGISTRY.clear()
     SHIELD_REGISTRY.clear()
+    clear_damage_tables()  # таблицы урона держат ссылки на старые предметы
 
     # Нормолизация формата.
     if isinstance(payload_raw, dict):
@@ -0,0 +1,388 @@
+"""
+ИИ сложности expert: expectimax с ограничением по времени.
+
+Узлы поиска — ходы ИИ (максимум оценки) и случайные исходы (среднее по
+вероятностям). Игрок моделируется так же, как в app.sim и app.odds: стреляет
+обычным выстрелом, если хватает энергии, иначе пропускает ход. Вероятности
+выстрела — те же, что у BaseUnit.basic_attack: попадание с шансом точности
+оружия, бросок урона равновероятен, урон по таблицам app.damage. Одинаковые
+исходы бросков сливаются, поэтому ветвление невелико.
+
+Поиск идёт с итеративным углублением до дедлайна хода. Результаты кладутся в
+таблицу транспозиций (состояние, глубина) → оценка; таблица общая на матчап и
+переживает ход, так что следующий ход ИИ стартует с уже посчитанных узлов.
+Таблица без блокировки: оценка для ключа детерминирована, поэтому гонка двух
+поисков одного матчапа за запись безвредна — оба пишут одно и то же. Счётчик
+узлов и дедлайн у каждого вызова свои. Если за дедлайн не закончилась даже
+глубина 1, ход выбирает пороговая политика hard.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING
+
+from app.damage import damage_table
+from app.policy import AIMove, ThresholdPolicy, compile_policies
+from app.skills import compile_skills
+from app.unit import AttackContext
+
+if TYPE_CHECKING:
+    from app.arena import Arena, ArenaConfig
+    from app.classes import UnitClass
+    from app.equipment import Shield, Weapon
+    from app.unit import BaseUnit
+
+# (p_hull, p_shield, p_energy, a_hull, a_shield, a_energy, КД ИИ overcharge, КД ИИ emp)
+SearchState = tuple[int, int, int, int, int, int, int, int]
+# исходы выстрела: (вероятность, поглощено щитом, урон корпусу)
+Shots = tuple[tuple[float, int, int], ...]
+# исходы хода: (вероятность, следующее состояние или None — бой окончен, оценка конца)
+Outcomes = list[tuple[float, SearchState | None, float]]
+
+# Порядок перебора ходов; при равной оценке выигрывает более ранний.
+_MOVES: tuple[AIMove, ...] = ("attack", "emp", "overcharge", "pass")
+_SKILL_COOLDOWN = 2  # как SKILL_COOLDOWN_TURNS в app.arena
+# Как часто (в узлах) сверяться с часами.
+_CLOCK_EVERY = 16
+_TT_MAX = 200_000
+# Потолок «раундов до убийства» в оценке (цель не пробивается).
+_RACE_CAP = 1000.0
+
+
+class _Timeout(Exception):
+    """Дедлайн хода истёк посреди итерации углубления."""
+
+
+@dataclass(slots=True)
+class _Search:
+    """Состояние одного вызова search: счётчик узлов и дедлайн."""
+
+    deadline: float
+    nodes: int = 0
+
+
+@dataclass(frozen=True, slots=True)
+class SearchResult:
+    """Итог поиска одного хода."""
+
+    move: AIMove
+    depth: int  # глубина (в полуходах) последней завершённой итерации; 0 — запасная политика
+    nodes: int
+    elapsed: float
+    value: float
+
+
+class SearchMetrics:
+    """Счётчики поиска на процесс (для /metrics)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.moves = 0
+        self.fallbacks = 0
+        self.nodes = 0
+        self.seconds = 0.0
+        self.depth_sum = 0
+        self.max_depth = 0
+
+    def record(self, result: SearchResult) -> None:
+        with self._lock:
+            self.moves += 1
+            self.nodes += result.nodes
+            self.seconds += result.elapsed
+            self.depth_sum += result.depth
+            self.max_depth = max(self.max_depth, result.depth)
+            if result.depth == 0:
+                self.fallbacks += 1
+
+    def snapshot(self) -> dict[str, float | int]:
+        with self._lock:
+            return {
+                "moves": self.moves,
+                "fallbacks": self.fallbacks,
+                "nodes": self.nodes,
+                "avg_depth": self.depth_sum / self.moves if self.moves else 0.0,
+                "max_depth": self.max_depth,
+                "nodes_per_second": self.nodes / self.seconds if self.seconds > 0 else 0.0,
+            }
+
+
+METRICS = SearchMetrics()
+
+
+class ExpectimaxAI:
+    """
+    Поиск для одного матчапа (сборки игрока и ИИ, конфиг). Таблицы исходов
+    выстрелов и таблица транспозиций живут вместе с объектом.
+    """
+
+    def __init__(self, player: BaseUnit, ai: BaseUnit, config: ArenaConfig) -> None:
+        skills = compile_skills(config)
+        self._fallback: ThresholdPolicy = compile_policies(config)["hard"]
+        self._regen = config.energy_regen_per_turn
+        self._costs = {slug: skills[slug].energy_cost for slug in ("overcharge", "emp")}
+        self._contexts = {
+            "attack": AttackContext(),
+            "overcharge": skills["overcharge"].context,
+            "emp": skills["emp"].context,
+        }
+        # стреляет ИИ → (класс и оружие атакующего, класс и щит цели)
+        self._loadouts: dict[bool, tuple[UnitClass, Weapon, UnitClass, Shield]] = {
+            True: (ai.unit_class, ai.weapon, player.unit_class, player.shield),
+            False: (player.unit_class, player.weapon, ai.unit_class, ai.shield),
+        }
+        self._p_hull_max, self._a_hull_max = player.hull_max, ai.hull_max
+        self._p_cap, self._a_cap = player.shield.capacity, ai.shield.capacity
+        self._p_emax, self._a_emax = player.energy_max, ai.energy_max
+        self._p_sregen, self._a_sregen = player.shield.regen, ai.shield.regen
+        self._p_wcost, self._a_wcost = player.weapon.energy_cost, ai.weapon.energy_cost
+        # стреляет ИИ → параметры гонки для оценки позиции (см. _rounds_to_kill)
+        self._race = {by_ai: self._race_rates(by_ai) for by_ai in (True, False)}
+        self._shots: dict[tuple[bool, str, int], Shots] = {}
+        self._tt: dict[tuple[SearchState, int, bool], float] = {}
+
+    def _race_rates(self, by_ai: bool) -> tuple[float, float, int, float, int]:
+        """(урон до щита и поглощение за выстрел в среднем, цена, выстрелов за раунд, реген щита)."""
+        att_class, weapon, dfn_class, dfn_shield = self._loadouts[by_ai]
+        table = damage_table(att_class, weapon, dfn_class, dfn_shield, self._contexts["attack"])
+        acc = min(1.0, max(0.0, weapon.accuracy))
+        modified = acc * sum(table.modified) / len(table.modified)
+        absorbed = acc * sum(min(p, dfn_shield.capacity) for p in table.potential)
+        absorbed /= len(table.potential)
+        cost = weapon.energy_cost
+        # энергия регенится в конце каждого полухода, стрелять можно раз в раунд
+        shots = 1.0 if cost <= 0 else min(1.0, 2 * self._regen / cost)
+        return modified, absorbed, cost, shots, 2 * dfn_shield.regen
+
+    @staticmethod
+    def state_of(arena: Arena) -> SearchState:
+        p, a = arena.player, arena.ai
+        cd_a = arena.cooldowns["ai"]
+        return (
+            p.hull,
+            p.shield_hp,
+            p.energy,
+            a.hull,
+            a.shield_hp,
+            a.energy,
+            cd_a["overcharge"],
+            cd_a["emp"],
+        )
+
+    @property
+    def cached_states(self) -> int:
+        return len(self._tt)
+
+    def choose(self, arena: Arena, *, deadline: float, max_depth: int) -> SearchResult:
+        """Лучший ход ИИ из текущего состояния боя за deadline секунд."""
+        start = time.perf_counter()
+        result = self.search(self.state_of(arena), deadline=deadline, max_depth=max_depth)
+        elapsed = time.perf_counter() - start
+        if result.depth == 0:
+            move = self._fallback.choose(arena.ai, arena.player, arena.cooldowns["ai"])
+            result = SearchResult(move, 0, result.nodes, elapsed, result.value)
+        else:
+            result = replace(result, elapsed=elapsed)
+        METRICS.record(result)
+        return result
+
+    def search(self, state: SearchState, *, deadline: float, max_depth: int) -> SearchResult:
+        """Итеративное углубление 1..max_depth, пока не истёк дедлайн (в секундах)."""
+        start = time.perf_counter()
+        ctx = _Search(start + deadline)
+        if len(self._tt) > _TT_MAX:
+            self._tt.clear()
+        best: AIMove = "attack"
+        value = 0.0
+        depth = 0
+        for d in range(1, max_depth + 1):
+            if time.perf_counter() >= ctx.deadline:
+                break
+            try:
+                best, value = self._root(ctx, state, d)
+            except _Timeout:
+                break
+            depth = d
+            if abs(value) >= 1.0:  # исход решён — глубже искать незачем
+                break
+        return SearchResult(best, depth, ctx.nodes, time.perf_counter() - start, value)
+
+    # ---- дерево
+
+    def _root(self, ctx: _Search, state: SearchState, depth: int) -> tuple[AIMove, float]:
+        best: AIMove = "attack"
+        best_value = -2.0
+        for move in self._ai_moves(state):
+            value = self._expect(ctx, self._ai_after(state, move), depth - 1, ai_turn=False)
+            if value > best_value:
+                best, best_value = move, value
+        return best, best_value
+
+    def _value(self, ctx: _Search, state: SearchState, depth: int, ai_turn: bool) -> float:
+        if depth <= 0:
+            return self._evaluate(state)
+        key = (state, depth, ai_turn)
+        cached = self._tt.get(key)
+        if cached is not None:
+            return cached
+        ctx.nodes += 1
+        if ctx.nodes % _CLOCK_EVERY == 0 and time.perf_counter() > ctx.deadline:
+            raise _Timeout
+        if ai_turn:
+            value = max(
+                self._expect(ctx, self._ai_after(state, m), depth - 1, ai_turn=False)
+                for m in self._ai_moves(state)
+            )
+        else:
+            value = self._expect(ctx, self._player_after(state), depth - 1, ai_turn=True)
+        self._tt[key] = value
+        return value
+
+    def _expect(self, ctx: _Search, outcomes: Outcomes, depth: int, ai_turn: bool) -> float:
+        total = 0.0
+        for prob, nxt, terminal in outcomes:
+            total += prob * (terminal if nxt is None else self._value(ctx, nxt, depth, ai_turn))
+        return total
+
+    def _evaluate(self, s: SearchState) -> float:
+        """
+        Оценка позиции для ИИ в (-1, 1) — гонка на убийство: сколько раундов нужно
+        каждой стороне, чтобы добить цель при стрельбе на пределе регена энергии
+        (запас энергии — залп сразу). Щит цели регенится, поэтому урон по щиту
+        ценится меньше урона по корпусу.
+        """
+        p_hull, p_shield, p_energy, a_hull, a_shield, a_energy = s[:6]
+        t_ai = self._rounds_to_kill(True, p_hull, p_shield, a_energy)
+        t_player = self._rounds_to_kill(False, a_hull, a_shield, p_energy)
+        return 0.95 * (t_player - t_ai) / (t_player + t_ai)
+
+    def _rounds_to_kill(self, by_ai: bool, hull: int, shield: int, energy: int) -> float:
+        """
+        Две фазы: пока щит держится, корпус получает только непоглощённую часть;
+        щит тает со скоростью поглощения минус реген. Потом — весь урон минус реген.
+        """
+        modified, absorbed, cost, shots, regen = self._race[by_ai]
+        burst = energy // cost if cost > 0 else 0
+        shield_left = shield - burst * absorbed
+        hull_left = hull - burst * (modified - absorbed) + min(0.0, shield_left)
+        shield_left = max(0.0, shield_left)
+        if hull_left <= 0:
+            return 0.5
+        through = shots * (modified - absorbed)  # корпусу за раунд, пока щит держится
+        drain = shots * absorbed - regen  # таяние щита за раунд
+        full = shots * modified - regen  # корпусу за раунд без щита
+        if drain <= 0 or shield_left <= 0:
+            rate = through if shield_left > 0 else full
+            return min(_RACE_CAP, 0.5 + hull_left / rate) if rate > 0 else _RACE_CAP
+        t_shield = shield_left / drain
+        if through * t_shield >= hull_left:
+            return 0.5 + hull_left / through
+        hull_left -= through * t_shield
+        if full <= 0:
+            return _RACE_CAP
+        return min(_RACE_CAP, 0.5 + t_shield + hull_left / full)
+
+    # ---- ходы и переходы
+
+    def _ai_moves(self, s: SearchState) -> list[AIMove]:
+        energy, cd_over, cd_emp = s[5], s[6], s[7]
+        moves: list[AIMove] = []
+        for move in _MOVES:
+            if move == "attack":
+                ok = energy >= self._a_wcost
+            elif move == "pass":
+                ok = True
+            else:
+                cd = cd_over if move == "overcharge" else cd_emp
+                ok = cd <= 0 and energy >= self._costs[move]
+            if ok:
+                moves.append(move)
+        return moves
+
+    def _shot_outcomes(self, by_ai: bool, mode: str, shield_hp: int) -> Shots:
+        key = (by_ai, mode, shield_hp)
+        cached = self._shots.get(key)
+        if cached is not None:
+            return cached
+        att_class, weapon, dfn_class, dfn_shield = self._loadouts[by_ai]
+        acc = min(1.0, max(0.0, weapon.accuracy))
+        table = damage_table(att_class, weapon, dfn_class, dfn_shield, self._contexts[mode])
+        rolls = range(weapon.dmg_min, weapon.dmg_max + 1)
+        merged: dict[tuple[int, int], float] = {}
+        if acc < 1.0:
+            merged[(0, 0)] = 1.0 - acc
+        for roll in rolls:
+            _, absorbed, hull = table.hit(roll, shield_hp)
+            merged[(absorbed, hull)] = merged.get((absorbed, hull), 0.0) + acc / len(rolls)
+        shots = self._shots[key] = tuple((p, a, h) for (a, h), p in merged.items() if p > 0.0)
+        return shots
+
+    def _ai_after(self, s: SearchState, move: AIMove) -> Outcomes:
+        """Ход ИИ: скилл, выстрел, реген конца хода, КД (ход ИИ тикает всегда)."""
+        p_hull, p_shield, p_energy, a_hull, a_shield, a_energy, cd_over, cd_emp = s
+        shots: Shots = ((1.0, 0, 0),)
+        if move == "overcharge":
+            a_energy -= self._costs[move]
+            cd_over = max(cd_over, _SKILL_COOLDOWN)
+        elif move == "emp":
+            a_energy -= self._costs[move]
+            cd_emp = max(cd_emp, _SKILL_COOLDOWN)
+        if move != "pass" and a_energy >= self._a_wcost:
+            a_energy -= self._a_wcost
+            shots = self._shot_outcomes(True, move, p_shield)
+        p_energy = min(p_energy + self._regen, self._p_emax)
+        a_energy = min(a_energy + self._regen, self._a_emax)
+        a_shield = min(a_shield + self._a_sregen, self._a_cap)
+        cd_over, cd_emp = max(0, cd_over - 1), max(0, cd_emp - 1)
+        out: Outcomes = []
+        for prob, absorbed, hull in shots:
+            hull_left = p_hull - hull
+            if hull_left <= 0:
+                out.append((prob, None, 1.0))
+                continue
+            shield = min(p_shield - absorbed + self._p_sregen, self._p_cap)
+            nxt = (hull_left, shield, p_energy, a_hull, a_shield, a_energy, cd_over, cd_emp)
+            out.append((prob, nxt, 0.0))
+        return out
+
+    def _player_after(self, s: SearchState) -> Outcomes:
+        """Ход игрока: обычный выстрел, если хватает энергии, иначе пасс (КД не тикают)."""
+        p_hull, p_shield, p_energy, a_hull, a_shield, a_energy, cd_over, cd_emp = s
+        shots: Shots = ((1.0, 0, 0),)
+        if p_energy >= self._p_wcost:
+            p_energy -= self._p_wcost
+            shots = self._shot_outcomes(False, "attack", a_shield)
+        p_energy = min(p_energy + self._regen, self._p_emax)
+        a_energy = min(a_energy + self._regen, self._a_emax)
+        p_shield = min(p_shield + self._p_sregen, self._p_cap)
+        out: Outcomes = []
+        for prob, absorbed, hull in shots:
+            hull_left = a_hull - hull
+            if hull_left <= 0:
+                out.append((prob, None, -1.0))
+                continue
+            shield = min(a_shield - absorbed + self._a_sregen, self._a_cap)
+            nxt = (p_hull, p_shield, p_energy, hull_left, shield, a_energy, cd_over, cd_emp)
+            out.append((prob, nxt, 0.0))
+        return out
+
+
+# матчап → поиск; таблица транспозиций переиспользуется между боями
+_ENGINES: dict[tuple[object, ...], ExpectimaxAI] = {}
+_ENGINES_MAX = 256
+_ENGINES_LOCK = threading.Lock()
+
+
+def engine_for(arena: Arena) -> ExpectimaxAI:
+    p, a = arena.player, arena.ai
+    cfg = replace(arena.config, rng_seed=None, telemetry="off")
+    key = (p.unit_class, p.weapon, p.shield, a.unit_class, a.weapon, a.shield, cfg)
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            if len(_ENGINES) >= _ENGINES_MAX:
+                _ENGINES.clear()
+            engine = _ENGINES[key] = ExpectimaxAI(p, a, cfg)
+    return engine
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import struct
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Literal
+
+EventKind = Literal["attack", "pass", "skill", "ai_turn", "ai_move"]
+
+# Коды событий: одно событие — один байт в журнале.
+_EV_ATTACK = 0
+_EV_PASS = 1
+_EV_AI_TURN = 2
+_EV_SKILL_BASE = 3  # 3 + индекс в SKILL_SLUGS
+
+SKILL_SLUGS: tuple[str, ...] = ("overcharge", "emp")
+# Ходы ИИ, выбранные поиском (сложность expert): пишутся в журнал явно,
+# потому что глубина поиска зависит от времени и при повторе может отличаться.
+AI_MOVES: tuple[str, ...] = ("pass", "attack", "overcharge", "emp")
+_EV_AI_MOVE_BASE = _EV_SKILL_BASE + len(SKILL_SLUGS)  # + индекс в AI_MOVES
+
+_JOURNAL_VERSION = 1
+_JOURNAL_HEAD = struct.Struct("<BHIIH")  # version, checkpoint_every, events, base_len, ckpts
+_CKPT_HEAD = struct.Struct("<II")  # индекс события, длина снимка
+
+
+@dataclass(frozen=True, slots=True)
+class BattleEvent:
+    """
+    Одно действие верхнего уровня: выстрел, пропуск, скилл игрока или ход ИИ.
+    skill — слаг скилла (kind="skill") или ход ИИ из AI_MOVES (kind="ai_move").
+    """
+
+    kind: EventKind
+    skill: str | None = None
+
+    @property
+    def code(self) -> int:
+        if self.kind == "attack":
+            return _EV_ATTACK
+        if self.kind == "pass":
+            return _EV_PASS
+        if self.kind == "ai_turn":
+            return _EV_AI_TURN
+        if self.kind == "ai_move":
+            if self.skill not in AI_MOVES:
+                raise ValueError(f"Неизвестный ход ИИ в событии: {self.skill!r}")
+            return _EV_AI_MOVE_BASE + AI_MOVES.index(self.skill)
+        if self.skill not in SKILL_SLUGS:
+            raise ValueError(f"Неизвестный скилл в событии: {self.skill!r}")
+        return _EV_SKILL_BASE + SKILL_SLUGS.index(self.skill)
+
+
+_EVENTS: tuple[BattleEvent, ...] = (
+    BattleEvent("attack"),
+    BattleEvent("pass"),
+    BattleEvent("ai_turn"),
+    *(BattleEvent("skill", slug) for slug in SKILL_SLUGS),
+    *(BattleEvent("ai_move", move) for move in AI_MOVES),
+)
+
+
+class BattleJournal:
+    """
+    Журнал боя: снимок состояния на старте (Arena.to_bytes) + события по байту.
+    Бой детерминирован состоянием RNG, поэтому повтор событий от снимка
+    восстанавливает его точно. checkpoint_every > 0 — каждые N событий
+    дополнительно пишется снимок, чтобы повтор не шёл с самого начала.
+    """
+
+    __slots__ = ("base", "checkpoint_every", "checkpoints", "_codes")
+
+    def __init__(self, base: bytes, *, checkpoint_every: int = 0) -> None:
+        if checkpoint_every < 0:
+            raise ValueError("checkpoint_every должен быть >= 0")
+        self.base = base
+        self.checkpoint_every = checkpoint_every
+        # индекс события → снимок состояния до этого события
+        self.checkpoints: dict[int, bytes] = {}
+        self._codes = bytearray()
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __iter__(self) -> Iterator[BattleEvent]:
+        for code in self._codes:
+            yield _EVENTS[code]
+
+    @property
+    def events(self) -> tuple[BattleEvent, ...]:
+        return tuple(self)
+
+    def append(self, event: BattleEvent) -> None:
+        self._codes.append(event.code)
+
+    def checkpoint_due(self) -> bool:
+        n = len(self._codes)
+        return self.checkpoint_every > 0 and n > 0 and n % self.checkpoint_every == 0
+
+    def add_checkpoint(self, snapshot: bytes) -> None:
+        self.checkpoints[len(self._codes)] = snapshot
+
+    def nearest_checkpoint(self, upto: int) -> tuple[int, bytes]:
+        """Последний снимок не позже события upto: (индекс, снимок)."""
+        best = 0
+        for idx in self.checkpoints:
+            if best < idx <= upto:
+                best = idx
+        return best, self.checkpoints[best] if best else self.base
+
+    def prefix(self, upto: int) -> BattleJournal:
+        """Копия журнала, обрезанная до первых upto событий."""
+        journal = BattleJournal(self.base, checkpoint_every=self.checkpoint_every)
+        journal._codes = self._codes[:upto]
+        journal.checkpoints = {i: s for i, s in self.checkpoints.items() if i <= upto}
+        return journal
+
+    def to_bytes(self) -> bytes:
+        parts = [
+            _JOURNAL_HEAD.pack(
+                _JOURNAL_VERSION,
+                self.checkpoint_every,
+                len(self._codes),
+                len(self.base),
+                len(self.checkpoints),
+            ),
+            self.base,
+            bytes(self._codes),
+        ]
+        for idx, snap in sorted(self.checkpoints.items()):
+            parts.append(_CKPT_HEAD.pack(idx, len(snap)))
+            parts.append(snap)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> BattleJournal:
+        if not data or data[0] != _JOURNAL_VERSION:
+            raise ValueError("Неизвестная версия формата журнала")
+        _version, every, n_events, base_len, n_ckpts = _JOURNAL_HEAD.unpack_from(data)
+        pos = _JOURNAL_HEAD.size
+        journal = cls(data[pos : pos + base_len], checkpoint_every=every)
+        pos += base_len
+        journal._codes = bytearray(data[pos : pos + n_events])
+        if any(code >= len(_EVENTS) for code in journal._codes):
+            raise ValueError("Неизвестный код события в журнале")
+        pos += n_events
+        for _ in range(n_ckpts):
+            idx, size = _CKPT_HEAD.unpack_from(data, pos)
+            pos += _CKPT_HEAD.size
+            journal.checkpoints[idx] = data[pos : pos + size]
+            pos += size
+        return journal
@@ -0,0 +1,325 @@
+"""
+ИИ сложности mcts: поиск Монте-Карло в фоновом пуле потоков.
+
+Корень дерева — ходы ИИ из текущего состояния боя. Ход оценивается пакетом
+доигровок пакетного движка app.sim (simulate с opening=ход): после него ИИ
+играет по политике hard, игрок — обычными выстрелами, как в app.sim. Каждый
+следующий пакет достаётся ходу с наибольшей верхней границей UCB1, поэтому
+бюджет уходит на спорные ходы. Дерево одноуровневое: доигровку до конца боя
+делает пакетный движок, ветвить по исходам бросков внутри дерева незачем.
+
+Итерации делятся между воркерами пула (NumPy отпускает GIL на операциях с
+массивами); у каждого воркера свой поток случайных чисел, статистика по ходам
+складывается. Запрос ждёт не дольше бюджета времени; если к этому моменту хотя
+бы один допустимый ход не получил ни одной доигровки, ходит пороговая
+политика hard.
+
+Детерминированный режим: итерации делятся на фиксированное число долей (от
+числа итераций и ходов, но не от числа ядер), seed каждой доли выводится из
+ArenaConfig.rng_seed и состояния генератора арены, поиск останавливается только
+по числу итераций — ход воспроизводим на любой машине (для тестов; задержка
+запроса в этом режиме не ограничена).
+"""
+
+from __future__ import annotations
+
+import copy
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from app.policy import AIMove, compile_policies
+from app.sim import simulate
+from app.skills import compile_skills
+
+if TYPE_CHECKING:
+    from app.arena import Arena, ArenaConfig
+    from app.unit import AIUnit, PlayerUnit
+
+# Порядок ходов: первые визиты и равенство статистик решаются в этом порядке.
+_MOVES: tuple[AIMove, ...] = ("attack", "emp", "overcharge", "pass")
+# Коэффициент исследования UCB1 (оценка доигровки — в [-1, 1]).
+_EXPLORE = 1.4
+# Предел полуходов одной доигровки.
+_PLAYOUT_TURNS = 200
+# Предел числа долей итераций в детерминированном режиме.
+_DETERMINISTIC_SHARDS = 8
+
+
+@dataclass(slots=True)
+class MoveStats:
+    """Статистика хода: пакеты, доигровки и сумма их исходов (+1 победа ИИ, -1 — игрока)."""
+
+    visits: int = 0
+    playouts: int = 0
+    total: float = 0.0
+
+    def add(self, other: MoveStats) -> None:
+        self.visits += other.visits
+        self.playouts += other.playouts
+        self.total += other.total
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.playouts if self.playouts else 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class MCTSResult:
+    """Итог поиска одного хода."""
+
+    move: AIMove
+    fallback: bool  # ход выбрала пороговая политика hard
+    iterations: int
+    playouts: int
+    elapsed: float
+    stats: dict[AIMove, MoveStats] = field(default_factory=dict)
+
+
+class MCTSMetrics:
+    """Счётчики поиска на процесс (для /metrics)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.moves = 0
+        self.fallbacks = 0
+        self.playouts = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, result: MCTSResult) -> None:
+        with self._lock:
+            self.moves += 1
+            self.playouts += result.playouts
+            self.seconds += result.elapsed
+            self.max_seconds = max(self.max_seconds, result.elapsed)
+            if result.fallback:
+                self.fallbacks += 1
+
+    def snapshot(self) -> dict[str, float | int]:
+        with self._lock:
+            return {
+                "moves": self.moves,
+                "fallbacks": self.fallbacks,
+                "playouts": self.playouts,
+                "avg_ms": 1000 * self.seconds / self.moves if self.moves else 0.0,
+                "max_ms": 1000 * self.max_seconds,
+                "playouts_per_second": self.playouts / self.seconds if self.seconds > 0 else 0.0,
+            }
+
+
+METRICS = MCTSMetrics()
+
+_POOL: ThreadPoolExecutor | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=workers(), thread_name_prefix="mcts")
+        return _POOL
+
+
+def workers() -> int:
+    """Число воркеров поиска — по числу ядер."""
+    return os.cpu_count() or 1
+
+
+def legal_moves(arena: Arena) -> list[AIMove]:
+    """Ходы ИИ, которые имеет смысл перебирать: скилл — только готовый и оплаченный."""
+    ai = arena.ai
+    cds = arena.cooldowns["ai"]
+    skills = compile_skills(arena.config)
+    moves: list[AIMove] = []
+    for move in _MOVES:
+        if move == "attack":
+            ok = ai.can_fire()
+        elif move == "pass":
+            ok = True
+        else:
+            ok = cds.get(move, 0) <= 0 and ai.energy >= skills[move].energy_cost
+        if ok:
+            moves.append(move)
+    return moves
+
+
+@dataclass(frozen=True, slots=True)
+class _Root:
+    """Копия корня для воркеров: арена после таймаута живёт дальше без них."""
+
+    player: PlayerUnit
+    ai: AIUnit
+    config: ArenaConfig
+    cooldowns: dict[str, int]
+    moves: tuple[AIMove, ...]
+
+
+def _search_worker(
+    root: _Root,
+    *,
+    iterations: int,
+    batch: int,
+    seed: np.random.SeedSequence,
+    deadline: float | None,
+    stop: threading.Event,
+    offset: int = 0,
+) -> tuple[dict[AIMove, MoveStats], int]:
+    """
+    UCB1 по ходам корня; возвращает статистику и число сделанных итераций.
+    offset сдвигает порядок первых визитов: воркеры начинают с разных ходов.
+    """
+    gen = np.random.default_rng(seed)
+    shift = offset % len(root.moves)
+    order = root.moves[shift:] + root.moves[:shift]
+    stats = {move: MoveStats() for move in order}
+    slowest = 0.0
+    done = 0
+    for _ in range(iterations):
+        now = time.perf_counter()
+        # следующий пакет не влезет в дедлайн — отдаём то, что есть
+        if stop.is_set() or (deadline is not None and now + slowest >= deadline):
+            break
+        move = _select(stats, done)
+        res = simulate(
+            root.player,
+            root.ai,
+            batch,
+            difficulty="hard",
+            config=root.config,
+            rng=gen,
+            max_turns=_PLAYOUT_TURNS,
+            ai_cooldowns=root.cooldowns,
+            opening=move,
+        )
+        s = stats[move]
+        s.visits += 1
+        s.playouts += res.n
+        s.total += res.ai_wins - res.player_wins
+        done += 1
+        slowest = max(slowest, time.perf_counter() - now)
+    return stats, done
+
+
+def _select(stats: dict[AIMove, MoveStats], visits: int) -> AIMove:
+    """Ход без визитов — первым (в порядке stats), иначе максимум UCB1."""
+    best: AIMove = "attack"
+    best_score = -math.inf
+    for move, s in stats.items():
+        if s.visits == 0:
+            return move
+        score = s.mean + _EXPLORE * math.sqrt(math.log(visits) / s.visits)
+        if score > best_score:
+            best, best_score = move, score
+    return best
+
+
+def search(
+    arena: Arena,
+    *,
+    iterations: int,
+    batch: int,
+    time_budget: float,
+    deterministic: bool = False,
+) -> MCTSResult:
+    """
+    Поиск хода ИИ для текущего состояния боя. iterations — пакетов доигровок
+    всего (делятся между воркерами), batch — доигровок в пакете, time_budget —
+    сколько секунд ждать воркеров (в детерминированном режиме не действует).
+    """
+    start = time.perf_counter()
+    fallback_move = compile_policies(arena.config)["hard"].choose(
+        arena.ai, arena.player, arena.cooldowns["ai"]
+    )
+    moves = legal_moves(arena)
+    if len(moves) == 1:
+        result = MCTSResult(moves[0], False, 0, 0, time.perf_counter() - start)
+        METRICS.record(result)
+        return result
+
+    if deterministic:
+        if arena.config.rng_seed is None:
+            raise ValueError("Детерминированный MCTS требует ArenaConfig.rng_seed")
+        root = np.random.SeedSequence((arena.config.rng_seed, arena.rng_state))
+        deadline = None
+    else:
+        root = np.random.SeedSequence()
+        deadline = start + time_budget
+
+    snapshot = _Root(
+        player=copy.copy(arena.player),
+        ai=copy.copy(arena.ai),
+        config=arena.config,
+        cooldowns=dict(arena.cooldowns["ai"]),
+        moves=tuple(moves),
+    )
+    # у каждой доли — хотя бы по визиту на ход, иначе на многоядерной машине
+    # доли меньше числа ходов и часть ходов остаётся без доигровок; в
+    # детерминированном режиме число долей не зависит от ядер — пул их просто
+    # разбирает по очереди
+    cap = _DETERMINISTIC_SHARDS if deterministic else workers()
+    n_shards = max(1, min(cap, iterations // len(moves)))
+    shares = [iterations // n_shards + (i < iterations % n_shards) for i in range(n_shards)]
+    stop = threading.Event()
+    pool = _pool()
+    futures: list[Future[tuple[dict[AIMove, MoveStats], int]]] = [
+        pool.submit(
+            _search_worker,
+            snapshot,
+            iterations=share,
+            batch=batch,
+            seed=seed,
+            deadline=deadline,
+            stop=stop,
+            offset=i,
+        )
+        for i, (share, seed) in enumerate(zip(shares, root.spawn(n_shards), strict=True))
+    ]
+    finished, _ = wait(futures, timeout=None if deterministic else time_budget)
+    stop.set()
+
+    merged = {move: MoveStats() for move in moves}
+    done = 0
+    for future in futures:  # в порядке долей — сумма не зависит от расписания
+        if future not in finished:
+            continue
+        stats, count = future.result()
+        done += count
+        for move, s in stats.items():
+            merged[move].add(s)
+
+    playouts = sum(s.playouts for s in merged.values())
+    elapsed = time.perf_counter() - start
+    if any(s.playouts == 0 for s in merged.values()):
+        result = MCTSResult(fallback_move, True, done, playouts, elapsed, merged)
+    else:
+        # самый посещённый ход; при равенстве — лучший по среднему
+        best = max(moves, key=lambda m: (merged[m].playouts, merged[m].mean))
+        result = MCTSResult(best, False, done, playouts, elapsed, merged)
+    METRICS.record(result)
+    return result
+
+
+def mcts_move(
+    arena: Arena,
+    *,
+    iterations: int,
+    batch: int,
+    time_budget: float,
+    deterministic: bool = False,
+) -> AIMove:
+    """Ход ИИ сложности mcts для текущего состояния боя."""
+    return search(
+        arena,
+        iterations=iterations,
+        batch=batch,
+        time_budget=time_budget,
+        deterministic=deterministic,
+    ).move
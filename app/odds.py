@@ -0,0 +1,362 @@
+"""
+Точные шансы боя без Монте-Карло.
+
+Дуэль — конечная марковская цепь. Правила те же, что у Arena: игрок стреляет
+обычным выстрелом (как кнопка «Огонь»), ИИ ходит по Arena._ai_take_turn со
+случайным скиллом из _maybe_apply_ai_skill.
+
+Полная цепь велика (миллионы состояний на матчап), но распадается на две
+независимые: «игрок бьёт ИИ» — (корпус и щит ИИ, энергия игрока) и «ИИ бьёт
+игрока» — (корпус и щит игрока, энергия/скилл/КД ИИ). Выбор ИИ не зависит от
+его корпуса и щита, а игрок всегда стреляет, поэтому цепи связаны только
+моментом окончания боя. Для каждой считается распределение полухода гибели
+цели, а шансы — из их свёртки:
+    win = Σ_t A[t] · P(игрок жив к t),  loss = Σ_t B[t] · P(ИИ жив к t).
+
+Ничья — бой не закончился за max_turns полуходов (как unfinished в app.sim).
+Распределения обрываются, когда живая масса цепи падает ниже tol.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import Literal
+
+from app.arena import Arena, ArenaConfig
+from app.classes import UnitClass
+from app.damage import DamageTable, clamp01, damage_table
+from app.equipment import Shield, Weapon
+from app.policy import compile_policies
+from app.skills import compile_skills, get_skill
+from app.unit import AttackContext, BaseUnit
+
+# (ход ИИ, p_hull, p_shield, p_energy, a_hull, a_shield, a_energy, a_skill_used, cd_over, cd_emp)
+State = tuple[int, int, int, int, int, int, int, int, int, int]
+# состояние одной из двух цепей (см. _PLAYER_SIDE / _AI_SIDE)
+SideState = tuple[int, ...]
+# исходы выстрела: (вероятность, поглощено щитом, урон корпусу)
+Shots = tuple[tuple[float, int, int], ...]
+# переходы цепи: (вероятность, следующее состояние или None — цель погибла)
+Moves = tuple[tuple[float, SideState | None], ...]
+
+_EMP_COST = get_skill("emp").energy_cost
+_OVER_COST = get_skill("overcharge").energy_cost
+
+# режимы выстрела (контекст атаки)
+_PLAIN, _OVER, _EMP = 0, 1, 2
+
+# цепи: игрок бьёт ИИ — (a_hull, a_shield, p_energy);
+# ИИ бьёт игрока — (p_hull, p_shield, a_energy, a_skill_used, cd_over, cd_emp)
+_PLAYER_SIDE, _AI_SIDE = 0, 1
+
+
+@dataclass(frozen=True, slots=True)
+class Odds:
+    """Вероятности исхода для игрока."""
+
+    win: float
+    loss: float
+
+    @property
+    def draw(self) -> float:
+        return max(0.0, 1.0 - self.win - self.loss)
+
+
+@dataclass(frozen=True, slots=True)
+class _Loadout:
+    unit_class: UnitClass
+    weapon: Weapon
+    shield: Shield
+
+    @classmethod
+    def of(cls, unit: BaseUnit) -> _Loadout:
+        return cls(unit.unit_class, unit.weapon, unit.shield)
+
+
+class OddsSolver:
+    """
+    Решатель для одного матчапа (сборки, сложность, конфиг). Переходы цепей,
+    распределения выстрелов и полученные распределения времени гибели
+    кэшируются по состоянию и переиспользуются между запросами.
+    """
+
+    def __init__(
+        self,
+        player: BaseUnit,
+        ai: BaseUnit,
+        *,
+        difficulty: Literal["easy", "normal", "hard"] = "normal",
+        config: ArenaConfig | None = None,
+        max_turns: int = 1000,
+        tol: float = 1e-12,
+    ) -> None:
+        cfg = config or ArenaConfig()
+        self.max_turns = max_turns
+        self.tol = tol
+        self._p = _Loadout.of(player)
+        self._a = _Loadout.of(ai)
+        self._regen = cfg.energy_regen_per_turn
+        self._skill_chance = clamp01(cfg.ai_skill_chance)
+        # та же ThresholdPolicy, что у Arena._ai_take_turn
+        self._policy = compile_policies(cfg)[difficulty]
+        skills = compile_skills(cfg)
+        contexts = {
+            _PLAIN: AttackContext(),
+            _OVER: skills["overcharge"].context,
+            _EMP: skills["emp"].context,
+        }
+        # (атакует ИИ, режим) → (точность, таблица урона по броскам)
+        self._tables: dict[tuple[int, int], tuple[float, DamageTable]] = {
+            (by_ai, mode): (
+                clamp01(att.weapon.accuracy),
+                damage_table(att.unit_class, att.weapon, dfn.unit_class, dfn.shield, ctx),
+            )
+            for by_ai, att, dfn in ((0, self._p, self._a), (1, self._a, self._p))
+            for mode, ctx in contexts.items()
+        }
+        self._shots: dict[tuple[int, int, int], Shots] = {}
+        self._moves: dict[tuple[int, bool, SideState], Moves] = {}
+        self._deaths: dict[tuple[int, bool, SideState], tuple[float, ...]] = {}
+        self._memo: dict[State, Odds] = {}
+
+    @property
+    def cached_states(self) -> int:
+        """Сколько состояний цепей уже разобрано (размер кэша переходов)."""
+        return len(self._moves)
+
+    # ====== Запросы ======
+
+    def odds(self, state: State) -> Odds:
+        cached = self._memo.get(state)
+        if cached is not None:
+            return cached
+        turn_ai, p_hull, p_shield, p_energy, a_hull, a_shield, a_energy, used, cdo, cde = state
+        if p_hull <= 0 or a_hull <= 0:
+            return Odds(float(a_hull <= 0 < p_hull), float(p_hull <= 0 < a_hull))
+        player_first = not turn_ai
+        # A[t] — ИИ погиб на полуходе t; B[t] — игрок погиб на полуходе t
+        a_dies = self._death_times(_PLAYER_SIDE, player_first, (a_hull, a_shield, p_energy))
+        p_dies = self._death_times(
+            _AI_SIDE, not player_first, (p_hull, p_shield, a_energy, used, cdo, cde)
+        )
+        win = _race(a_dies, p_dies)
+        loss = _race(p_dies, a_dies)
+        result = self._memo[state] = Odds(win, loss)
+        return result
+
+    @staticmethod
+    def state_of(arena: Arena) -> State:
+        p, a = arena.player, arena.ai
+        cd = arena.cooldowns["ai"]
+        return (
+            int(arena.turn == "ai"),
+            p.hull,
+            p.shield_hp,
+            p.energy,
+            a.hull,
+            a.shield_hp,
+            a.energy,
+            int(a.skill_used),
+            max(0, cd.get("overcharge", 0)),
+            max(0, cd.get("emp", 0)),
+        )
+
+    # ====== Цепи ======
+
+    def _death_times(self, side: int, attacks_first: bool, start: SideState) -> tuple[float, ...]:
+        """
+        Распределение полухода, на котором цель цепи погибнет: прямой проход по
+        распределению состояний (одинаковые состояния сливаются).
+        """
+        key = (side, attacks_first, start)
+        cached = self._deaths.get(key)
+        if cached is not None:
+            return cached
+        dist: dict[SideState, float] = {start: 1.0}
+        attacking = attacks_first
+        deaths: list[float] = []
+        for _ in range(self.max_turns):
+            nxt: dict[SideState, float] = {}
+            dead = 0.0
+            for state, prob in dist.items():
+                for p, after in self._transitions(side, attacking, state):
+                    if after is None:
+                        dead += prob * p
+                    else:
+                        nxt[after] = nxt.get(after, 0.0) + prob * p
+            deaths.append(dead)
+            dist = nxt
+            attacking = not attacking
+            if sum(dist.values()) <= self.tol:
+                break
+        result = self._deaths[key] = tuple(deaths)
+        return result
+
+    def _transitions(self, side: int, attacking: bool, state: SideState) -> Moves:
+        key = (side, attacking, state)
+        moves = self._moves.get(key)
+        if moves is None:
+            out: dict[SideState | None, float] = {}
+            if side == _PLAYER_SIDE:
+                self._player_shoots(out, attacking, state)
+            else:
+                self._ai_shoots(out, attacking, state)
+            moves = self._moves[key] = tuple((p, s) for s, p in out.items() if p > 0.0)
+        return moves
+
+    def _shot_outcomes(self, by_ai: int, mode: int, shield_hp: int) -> Shots:
+        """Исходы одного выстрела (с промахом) — зависят только от щита цели."""
+        key = (by_ai, mode, shield_hp)
+        shots = self._shots.get(key)
+        if shots is None:
+            acc, table = self._tables[by_ai, mode]
+            per_roll = acc / len(table.modified)
+            dist: dict[tuple[int, int], float] = {(0, 0): 1.0 - acc}
+            for modified, potential in zip(table.modified, table.potential, strict=True):
+                absorbed = min(potential, shield_hp)
+                k = (absorbed, modified - absorbed)
+                dist[k] = dist.get(k, 0.0) + per_roll
+            shots = self._shots[key] = tuple((p, ab, hd) for (ab, hd), p in dist.items())
+        return shots
+
+    def _player_shoots(
+        self, out: dict[SideState | None, float], attacking: bool, state: SideState
+    ) -> None:
+        a_hull, a_shield, energy = state
+        regen, e_max = self._regen, self._p.unit_class.energy_max
+        s_regen, s_cap = self._a.shield.regen, self._a.shield.capacity
+        if not attacking:  # ход ИИ: только реген конца хода
+            after = (a_hull, min(a_shield + s_regen, s_cap), min(energy + regen, e_max))
+            out[after] = 1.0
+            return
+        cost = self._p.weapon.energy_cost
+        if energy >= cost:
+            energy -= cost
+            shots = self._shot_outcomes(0, _PLAIN, a_shield)
+        else:
+            shots = ((1.0, 0, 0),)
+        energy = min(energy + regen, e_max)
+        for p, absorbed, hull_dmg in shots:
+            hull = a_hull - hull_dmg
+            nxt = (hull, min(a_shield - absorbed + s_regen, s_cap), energy) if hull > 0 else None
+            out[nxt] = out.get(nxt, 0.0) + p
+
+    def _ai_shoots(
+        self, out: dict[SideState | None, float], attacking: bool, state: SideState
+    ) -> None:
+        p_hull, p_shield, energy, used, cd_over, cd_emp = state
+        if not attacking:  # ход игрока: только реген конца хода
+            out[
+                (
+                    p_hull,
+                    min(p_shield + self._p.shield.regen, self._p.shield.capacity),
+                    min(energy + self._regen, self._a.unit_class.energy_max),
+                    used,
+                    cd_over,
+                    cd_emp,
+                )
+            ] = 1.0
+            return
+        move = self._policy.decide(
+            can_fire=energy >= self._a.weapon.energy_cost,
+            energy=energy,
+            p_hull=p_hull,
+            p_hull_max=self._p.unit_class.hull_max,
+            p_shield=p_shield,
+            cd_over=cd_over,
+            cd_emp=cd_emp,
+        )
+        if move == "pass":  # нет энергии
+            self._ai_fire(out, 1.0, state, _PLAIN, fire=False)
+        elif move == "emp":
+            self._ai_fire(out, 1.0, state, _EMP, spend=_EMP_COST, cd_emp=2)
+        elif move == "overcharge":
+            self._ai_fire(out, 1.0, state, _OVER, spend=_OVER_COST, cd_over=2)
+        else:
+            # обычная атака: случайный скилл, если ещё не использован
+            chance = 0.0 if used else self._skill_chance
+            if chance < 1.0:
+                self._ai_fire(out, 1.0 - chance, state, _PLAIN)
+            if chance > 0.0:
+                for cost, mode in ((_OVER_COST, _OVER), (_EMP_COST, _EMP)):
+                    if energy >= cost:
+                        self._ai_fire(out, chance * 0.5, state, mode, spend=cost, mark=True)
+                    else:
+                        self._ai_fire(out, chance * 0.5, state, _PLAIN)
+
+    def _ai_fire(
+        self,
+        out: dict[SideState | None, float],
+        prob: float,
+        state: SideState,
+        mode: int,
+        *,
+        fire: bool = True,
+        spend: int = 0,
+        mark: bool = False,
+        cd_over: int = 0,
+        cd_emp: int = 0,
+    ) -> None:
+        """Скилл (оплата), выстрел, реген конца хода и тик КД — как в _ai_take_turn."""
+        p_hull, p_shield, energy, used, over, emp = state
+        energy = max(0, energy - spend)
+        cost = self._a.weapon.energy_cost
+        if fire and energy >= cost:
+            energy -= cost
+            shots = self._shot_outcomes(1, mode, p_shield)
+        else:
+            shots = ((1.0, 0, 0),)
+        energy = min(energy + self._regen, self._a.unit_class.energy_max)
+        used = 1 if mark else used
+        over = max(0, max(over, cd_over) - 1)
+        emp = max(0, max(emp, cd_emp) - 1)
+        s_regen, s_cap = self._p.shield.regen, self._p.shield.capacity
+        for p, absorbed, hull_dmg in shots:
+            hull = p_hull - hull_dmg
+            nxt = (
+                (hull, min(p_shield - absorbed + s_regen, s_cap), energy, used, over, emp)
+                if hull > 0
+                else None
+            )
+            out[nxt] = out.get(nxt, 0.0) + prob * p
+
+
+def _race(dies: tuple[float, ...], other: tuple[float, ...]) -> float:
+    """P(цель dies погибнет раньше цели other): гибели приходятся на разные полуходы."""
+    total = 0.0
+    other_dead = 0.0
+    for t, p in enumerate(dies):
+        if t < len(other):
+            other_dead += other[t]
+        if p:
+            total += p * (1.0 - other_dead)
+    return total
+
+
+# матчап → решатель; кэши переиспользуются между боями и запросами
+_SOLVERS: dict[tuple[object, ...], OddsSolver] = {}
+
+
+def solver_for(arena: Arena) -> OddsSolver:
+    difficulty = arena.ai_difficulty
+    if difficulty == "expert" or difficulty == "mcts":
+        raise ValueError(f"Шансы считаются только для пороговых сложностей (не {difficulty})")
+    cfg = replace(arena.config, rng_seed=None, telemetry="off")
+    key = (_Loadout.of(arena.player), _Loadout.of(arena.ai), difficulty, cfg)
+    solver = _SOLVERS.get(key)
+    if solver is None:
+        solver = _SOLVERS[key] = OddsSolver(
+            arena.player, arena.ai, difficulty=difficulty, config=cfg
+        )
+    return solver
+
+
+def arena_odds(arena: Arena) -> Odds:
+    """Шансы игрока из текущего состояния боя."""
+    if arena.is_finished:
+        return Odds(float(arena.player.is_alive), float(arena.ai.is_alive))
+    return solver_for(arena).odds(OddsSolver.state_of(arena))
+
+
+def clear_cache() -> None:
+    _SOLVERS.clear()
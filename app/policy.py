@@ -0,0 +1,132 @@
+"""
+Пороговая политика ИИ.
+
+Пороги сложностей лежат в ArenaConfig (ai_emp_shield_threshold и т.д.) и
+компилируются один раз на конфиг в ThresholdPolicy — по объекту на сложность.
+Ход ИИ сводится к нескольким сравнениям полей; те же объекты используют
+пакетный движок app.sim и точный решатель app.odds, поэтому правило выбора
+хода у всех одно.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Literal, Protocol
+
+from app.skills import get_skill
+
+Difficulty = Literal["easy", "normal", "hard"]
+# Сложности с пороговой политикой; строки порогов в ArenaConfig — в этом порядке.
+THRESHOLD_DIFFICULTIES: tuple[Difficulty, ...] = ("easy", "normal", "hard")
+
+# Ход ИИ: пропуск, обычный выстрел (со случайным скиллом) или выстрел со скиллом.
+AIMove = Literal["pass", "attack", "overcharge", "emp"]
+
+
+class PolicyTuning(Protocol):
+    """Пороги ИИ из конфига арены (ArenaConfig)."""
+
+    @property
+    def ai_emp_shield_threshold(self) -> tuple[int, ...]: ...
+    @property
+    def ai_overcharge_hull_pct(self) -> tuple[float, ...]: ...
+    @property
+    def ai_emp_min_energy(self) -> int: ...
+    @property
+    def ai_overcharge_min_energy(self) -> int: ...
+
+
+class _Fighter(Protocol):
+    energy: int
+    hull: int
+    shield_hp: int
+
+    @property
+    def hull_max(self) -> int: ...
+    def can_fire(self) -> bool: ...
+
+
+@dataclass(frozen=True, slots=True)
+class ThresholdPolicy:
+    """
+    Политика одной сложности. Порядок проверок:
+    1) не может стрелять — пропуск;
+    2) щит игрока > emp_shield и EMP готов — EMP;
+    3) корпус игрока <= over_hull_pct от максимума и Overcharge готов — Overcharge;
+    4) иначе обычный выстрел.
+    Энергетические пороги уже включают стоимость скилла.
+    """
+
+    difficulty: Difficulty
+    emp_shield: int
+    emp_energy: int
+    over_energy: int
+    over_hull_pct: float
+
+    def over_hull(self, hull_max: int) -> int:
+        """Корпус игрока, начиная с которого (и ниже) ИИ добивает Overcharge."""
+        return int(self.over_hull_pct * hull_max)
+
+    def decide(
+        self,
+        *,
+        can_fire: bool,
+        energy: int,
+        p_hull: int,
+        p_hull_max: int,
+        p_shield: int,
+        cd_over: int,
+        cd_emp: int,
+    ) -> AIMove:
+        if not can_fire:
+            return "pass"
+        if p_shield > self.emp_shield and cd_emp <= 0 and energy >= self.emp_energy:
+            return "emp"
+        if cd_over <= 0 and energy >= self.over_energy and p_hull <= self.over_hull(p_hull_max):
+            return "overcharge"
+        return "attack"
+
+    def choose(self, ai: _Fighter, player: _Fighter, cooldowns: Mapping[str, int]) -> AIMove:
+        """decide() по живым юнитам и КД ИИ из Arena.cooldowns['ai']."""
+        return self.decide(
+            can_fire=ai.can_fire(),
+            energy=ai.energy,
+            p_hull=player.hull,
+            p_hull_max=player.hull_max,
+            p_shield=player.shield_hp,
+            cd_over=cooldowns.get("overcharge", 0),
+            cd_emp=cooldowns.get("emp", 0),
+        )
+
+
+# Конфиг → политики по сложностям.
+_COMPILED: dict[PolicyTuning, Mapping[str, ThresholdPolicy]] = {}
+
+
+def compile_policies(tuning: PolicyTuning) -> Mapping[str, ThresholdPolicy]:
+    """Таблица сложность → ThresholdPolicy для конфига; строится один раз на конфиг."""
+    table = _COMPILED.get(tuning)
+    if table is not None:
+        return table
+    n = len(THRESHOLD_DIFFICULTIES)
+    if len(tuning.ai_emp_shield_threshold) != n or len(tuning.ai_overcharge_hull_pct) != n:
+        raise ValueError(f"Пороги ИИ задаются по {n} сложностям: {THRESHOLD_DIFFICULTIES}")
+    emp_energy = max(tuning.ai_emp_min_energy, get_skill("emp").energy_cost)
+    over_energy = max(tuning.ai_overcharge_min_energy, get_skill("overcharge").energy_cost)
+    table = _COMPILED[tuning] = {
+        difficulty: ThresholdPolicy(
+            difficulty=difficulty,
+            emp_shield=int(emp_shield),
+            emp_energy=emp_energy,
+            over_energy=over_energy,
+            over_hull_pct=float(pct),
+        )
+        for difficulty, emp_shield, pct in zip(
+            THRESHOLD_DIFFICULTIES,
+            tuning.ai_emp_shield_threshold,
+            tuning.ai_overcharge_hull_pct,
+            strict=True,
+        )
+    }
+    return table
@@ -0,0 +1,313 @@
+"""
+Пакетный движок: N независимых дуэлей за один проход на массивах NumPy.
+
+Правила те же, что у Arena (урон — таблицы app.damage, как в BaseUnit, конец хода —
+Arena._end_of_turn_regen, ход ИИ — Arena._ai_take_turn со скиллом из
+_maybe_apply_ai_skill). Игрок всегда стреляет обычным выстрелом — как при
+нажатии «Огонь» в вебе. Случайность — пакетные броски numpy.random.Generator,
+поэтому бои воспроизводимы по seed, но поток чисел другой, чем у CompactRandom.
+
+NumPy — необязательная зависимость (нужна только для симуляций).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Literal, Protocol
+
+import numpy as np
+import numpy.typing as npt
+
+from app.arena import ArenaConfig
+from app.damage import damage_table
+from app.policy import AIMove, compile_policies
+from app.skills import compile_skills, get_skill
+from app.unit import AttackContext, BaseUnit
+
+IntArray = npt.NDArray[np.int64]
+FloatArray = npt.NDArray[np.float64]
+BoolArray = npt.NDArray[np.bool_]
+
+_EMP_COST = get_skill("emp").energy_cost
+_OVER_COST = get_skill("overcharge").energy_cost
+
+
+class BatchRandom(Protocol):
+    """Подмножество numpy.random.Generator, которое использует ядро."""
+
+    def random(self, size: int) -> FloatArray: ...
+    def integers(self, low: int, high: int, size: int, *, endpoint: bool) -> IntArray: ...
+
+
+@dataclass(frozen=True, slots=True)
+class _Side:
+    """Неизменяемые параметры стороны (класс, оружие, щит) и её таблицы урона по цели."""
+
+    hull_max: int
+    energy_max: int
+    w_cost: int
+    w_acc: float
+    w_min: int
+    w_max: int
+    s_cap: int
+    s_regen: int
+    # [режим, бросок - w_min]: урон до щита и потолок поглощения щитом цели
+    modified: IntArray
+    potential: IntArray
+
+    @classmethod
+    def of(cls, unit: BaseUnit, target: BaseUnit, contexts: tuple[AttackContext, ...]) -> _Side:
+        tables = [
+            damage_table(unit.unit_class, unit.weapon, target.unit_class, target.shield, ctx)
+            for ctx in contexts
+        ]
+        return cls(
+            hull_max=unit.hull_max,
+            energy_max=unit.energy_max,
+            w_cost=unit.weapon.energy_cost,
+            w_acc=unit.weapon.accuracy,
+            w_min=unit.weapon.dmg_min,
+            w_max=unit.weapon.dmg_max,
+            s_cap=unit.shield.capacity,
+            s_regen=unit.shield.regen,
+            modified=np.array([t.modified for t in tables], dtype=np.int64),
+            potential=np.array([t.potential for t in tables], dtype=np.int64),
+        )
+
+
+# режимы выстрела — строки таблиц _Side
+_PLAIN, _OVER, _EMP = 0, 1, 2
+
+
+@dataclass(slots=True)
+class _State:
+    """Изменяемое состояние живых боёв (все массивы одной длины)."""
+
+    ids: IntArray
+    p_hull: IntArray
+    p_energy: IntArray
+    p_shield: IntArray
+    a_hull: IntArray
+    a_energy: IntArray
+    a_shield: IntArray
+    a_skill_used: BoolArray
+    a_cd_over: IntArray
+    a_cd_emp: IntArray
+
+    def take(self, keep: BoolArray) -> _State:
+        return _State(**{name: getattr(self, name)[keep] for name in _STATE_FIELDS})
+
+
+_STATE_FIELDS = tuple(_State.__dataclass_fields__)
+
+
+@dataclass(frozen=True, slots=True)
+class SimResult:
+    """Итоги пакета: по бою — корпуса в конце и число сыгранных ходов (полуходов)."""
+
+    player_hull: IntArray
+    ai_hull: IntArray
+    turns: IntArray
+
+    @property
+    def n(self) -> int:
+        return int(self.turns.size)
+
+    @property
+    def player_wins(self) -> int:
+        return int(np.count_nonzero((self.player_hull > 0) & (self.ai_hull <= 0)))
+
+    @property
+    def ai_wins(self) -> int:
+        return int(np.count_nonzero((self.ai_hull > 0) & (self.player_hull <= 0)))
+
+    @property
+    def unfinished(self) -> int:
+        """Бои, упёршиеся в max_turns."""
+        return int(np.count_nonzero((self.player_hull > 0) & (self.ai_hull > 0)))
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "battles": self.n,
+            "player_wins": self.player_wins,
+            "ai_wins": self.ai_wins,
+            "unfinished": self.unfinished,
+            "player_winrate": self.player_wins / self.n if self.n else 0.0,
+            "mean_turns": float(self.turns.mean()) if self.n else 0.0,
+        }
+
+
+def _shot(
+    fire: BoolArray,
+    roll: FloatArray,
+    dmg_roll: IntArray,
+    att: _Side,
+    mode: IntArray | int,
+    dfn_shield: IntArray,
+) -> tuple[BoolArray, IntArray, IntArray]:
+    """
+    Векторная версия BaseUnit.basic_attack: попадание и поиск по таблице урона.
+    Возвращает (попал, поглощено щитом, урон корпусу); энергию списывает вызывающий.
+    """
+    hit = fire & (roll <= att.w_acc)
+    i = dmg_roll - att.w_min
+    modified = att.modified[mode, i]
+    absorbed = np.minimum(att.potential[mode, i], dfn_shield)
+    zero = np.zeros_like(absorbed)
+    return hit, np.where(hit, absorbed, zero), np.where(hit, modified - absorbed, zero)
+
+
+def simulate(
+    player: BaseUnit,
+    ai: BaseUnit,
+    n: int,
+    *,
+    difficulty: Literal["easy", "normal", "hard"] = "normal",
+    config: ArenaConfig | None = None,
+    rng: BatchRandom | int | None = None,
+    max_turns: int = 1000,
+    ai_cooldowns: Mapping[str, int] | None = None,
+    opening: AIMove | None = None,
+) -> SimResult:
+    """
+    Играет n боёв player против ai (стартовое состояние берётся из юнитов).
+    rng — Generator или seed; max_turns — предел полуходов на бой.
+    ai_cooldowns — КД скиллов ИИ на старте (Arena.cooldowns['ai']).
+    opening — бой начинается с хода ИИ, и этот ход задан (как Arena._ai_move:
+    без случайного скилла); дальше ИИ играет по политике difficulty.
+    """
+    cfg = config or ArenaConfig()
+    gen: BatchRandom = (
+        rng if rng is not None and not isinstance(rng, int) else np.random.default_rng(rng)
+    )
+    skills = compile_skills(cfg)
+    contexts = (AttackContext(), skills["overcharge"].context, skills["emp"].context)
+    ps, as_ = _Side.of(player, ai, contexts), _Side.of(ai, player, contexts)
+    regen = cfg.energy_regen_per_turn
+    # та же ThresholdPolicy, что у Arena._ai_take_turn, — по массивам
+    policy = compile_policies(cfg)[difficulty]
+    over_hull = policy.over_hull(ps.hull_max)
+
+    def full(value: int) -> IntArray:
+        return np.full(n, value, dtype=np.int64)
+
+    st = _State(
+        ids=np.arange(n, dtype=np.int64),
+        p_hull=full(player.hull),
+        p_energy=full(player.energy),
+        p_shield=full(player.shield_hp),
+        a_hull=full(ai.hull),
+        a_energy=full(ai.energy),
+        a_shield=full(ai.shield_hp),
+        a_skill_used=np.full(n, ai.skill_used, dtype=np.bool_),
+        a_cd_over=full((ai_cooldowns or {}).get("overcharge", 0)),
+        a_cd_emp=full((ai_cooldowns or {}).get("emp", 0)),
+    )
+    out_p_hull = full(player.hull)
+    out_a_hull = full(ai.hull)
+    out_turns = full(0)
+
+    def end_of_turn(s: _State) -> None:
+        # Arena._end_of_turn_regen: энергия и щит обеих сторон, корпус не растёт
+        np.minimum(s.p_energy + regen, ps.energy_max, out=s.p_energy)
+        np.minimum(s.p_shield + ps.s_regen, ps.s_cap, out=s.p_shield)
+        np.minimum(s.a_energy + regen, as_.energy_max, out=s.a_energy)
+        np.minimum(s.a_shield + as_.s_regen, as_.s_cap, out=s.a_shield)
+
+    def finish(s: _State, done: BoolArray, turns: int) -> _State:
+        if not done.any():
+            return s
+        ids = s.ids[done]
+        out_p_hull[ids] = s.p_hull[done]
+        out_a_hull[ids] = s.a_hull[done]
+        out_turns[ids] = turns
+        return s.take(~done)
+
+    turns = 0
+    forced = opening
+    while st.ids.size and turns < max_turns:
+        if forced is None:
+            # --- ход игрока: обычный выстрел (без энергии — пустой ход)
+            m = st.ids.size
+            fire = st.p_energy >= ps.w_cost
+            roll = gen.random(m)
+            dmg = gen.integers(ps.w_min, ps.w_max, m, endpoint=True)
+            _, absorbed, hull_dmg = _shot(fire, roll, dmg, ps, _PLAIN, st.a_shield)
+            st.p_energy -= np.where(fire, ps.w_cost, 0)
+            st.a_shield -= absorbed
+            st.a_hull = np.maximum(0, st.a_hull - hull_dmg)
+            end_of_turn(st)
+            turns += 1
+            st = finish(st, st.a_hull <= 0, turns)
+            if not st.ids.size or turns >= max_turns:
+                break
+
+        # --- ход ИИ
+        m = st.ids.size
+        can_fire = st.a_energy >= as_.w_cost
+        if forced is not None:
+            # заданный ход: скилл — если хватает энергии (иначе обычный выстрел)
+            none = np.zeros(m, dtype=np.bool_)
+            emp = can_fire & (st.a_energy >= _EMP_COST) if forced == "emp" else none
+            over = can_fire & (st.a_energy >= _OVER_COST) if forced == "overcharge" else none
+            plain = none if forced == "pass" else can_fire & ~emp & ~over
+        else:
+            emp = (
+                can_fire
+                & (st.p_shield > policy.emp_shield)
+                & (st.a_cd_emp <= 0)
+                & (st.a_energy >= policy.emp_energy)
+            )
+            over = (
+                can_fire
+                & ~emp
+                & (st.a_cd_over <= 0)
+                & (st.a_energy >= policy.over_energy)
+                & (st.p_hull <= over_hull)
+            )
+            plain = can_fire & ~emp & ~over
+
+        # обычный выстрел ИИ: шанс скилла из _maybe_apply_ai_skill (у заданного хода — нет)
+        u_skill = gen.random(m)
+        u_slug = gen.random(m)
+        chance = cfg.ai_skill_chance if forced is None else 0.0
+        try_skill = plain & ~st.a_skill_used & (u_skill < chance)
+        want_over = u_slug < 0.5
+        skill_cost = np.where(want_over, _OVER_COST, _EMP_COST)
+        rnd_skill = try_skill & (st.a_energy >= skill_cost)
+        rnd_over = rnd_skill & want_over
+        rnd_emp = rnd_skill & ~want_over
+        st.a_skill_used |= rnd_skill
+
+        use_over = over | rnd_over
+        use_emp = emp | rnd_emp
+        st.a_energy -= np.where(use_over, _OVER_COST, 0) + np.where(use_emp, _EMP_COST, 0)
+
+        mode = np.where(use_over, _OVER, np.where(use_emp, _EMP, _PLAIN))
+
+        # после оплаты скилла на выстрел энергии может уже не хватить
+        fire = (emp | over | plain) & (st.a_energy >= as_.w_cost)
+        roll = gen.random(m)
+        dmg = gen.integers(as_.w_min, as_.w_max, m, endpoint=True)
+        _, absorbed, hull_dmg = _shot(fire, roll, dmg, as_, mode, st.p_shield)
+        st.a_energy = np.maximum(0, st.a_energy - np.where(fire, as_.w_cost, 0))
+        st.p_shield -= absorbed
+        st.p_hull = np.maximum(0, st.p_hull - hull_dmg)
+        end_of_turn(st)
+
+        # КД: EMP/Overcharge по порогам ставят 2, затем общий тик (КД обычного
+        # выстрела и пасса тоже тикают)
+        st.a_cd_emp = np.where(emp, np.maximum(st.a_cd_emp, 2), st.a_cd_emp)
+        st.a_cd_over = np.where(over, np.maximum(st.a_cd_over, 2), st.a_cd_over)
+        st.a_cd_emp = np.maximum(0, st.a_cd_emp - 1)
+        st.a_cd_over = np.maximum(0, st.a_cd_over - 1)
+        turns += 1
+        forced = None
+        st = finish(st, st.p_hull <= 0, turns)
+
+    # бои, упёршиеся в предел ходов
+    out_p_hull[st.ids] = st.p_hull
+    out_a_hull[st.ids] = st.a_hull
+    out_turns[st.ids] = turns
+    return SimResult(player_hull=out_p_hull, ai_hull=out_a_hull, turns=out_turns)
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import abc
+from collections.abc import Mapping
 from dataclasses import dataclass
 from typing import ClassVar, Protocol
 
+from app.unit import AttackContext
+
 
 class UnitLike(Protocol):
     """Мини-протокол, чтобы типизировать взаимодействие."""
@@ -11,6 +14,17 @@ class UnitLike(Protocol):
     energy: int
 
 
+class SkillTuning(Protocol):
+    """Параметры скиллов из конфига арены (ArenaConfig)."""
+
+    @property
+    def overcharge_damage_mult(self) -> float: ...
+    @property
+    def emp_shield_eff_factor(self) -> float: ...
+    @property
+    def emp_extra_ignore(self) -> float: ...
+
+
 @dataclass(frozen=True, slots=True)
 class SkillResult:
     """Результат применения скилла."""
@@ -46,8 +60,26 @@ class ShipSkill(abc.ABC):
     def _perform(self, user: UnitLike, target: UnitLike) -> str:
         raise NotImplementedError
 
+    def attack_context(self, tuning: SkillTuning) -> AttackContext:
+        """Как скилл меняет следующий выстрел (по умолчанию — никак)."""
+        return AttackContext()
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledSkill:
+    """Скилл, готовый к применению: общий экземпляр и контекст выстрела под конфиг."""
+
+    slug: str
+    skill: ShipSkill
+    context: AttackContext
+    energy_cost: int
+
 
 _SKILL_REGISTRY: dict[str, type[ShipSkill]] = {}
+# Скиллы без состояния: один экземпляр на слаг (flyweight).
+_SKILL_INSTANCES: dict[str, ShipSkill] = {}
+# Конфиг → таблица скиллов; сбрасывается при регистрации нового скилла.
+_COMPILED: dict[SkillTuning, Mapping[str, CompiledSkill]] = {}
 
 
 def register_skill(name: str, cls: type[ShipSkill]) -> None:
@@ -55,6 +87,8 @@ def register_skill(name: str, cls: type[ShipSkill]) -> None:
     if name in _SKILL_REGISTRY:
         raise KeyError(f"Skill '{name}' уже зарегистрирован")
     _SKILL_REGISTRY[name] = cls
+    _SKILL_INSTANCES[name] = cls()
+    _COMPILED.clear()
 
 
 def create_skill(name: str) -> ShipSkill:
@@ -66,6 +100,25 @@ def create_skill(name: str) -> ShipSkill:
     return skill_cls()
 
 
+def get_skill(name: str) -> ShipSkill:
+    """Общий экземпляр скилла по имени (без создания нового)."""
+    try:
+        return _SKILL_INSTANCES[name]
+    except KeyError as exc:
+        raise KeyError(f"Skill '{name}' не найден") from exc
+
+
+def compile_skills(tuning: SkillTuning) -> Mapping[str, CompiledSkill]:
+    """Таблица слаг → CompiledSkill для конфига; строится один раз на конфиг."""
+    table = _COMPILED.get(tuning)
+    if table is None:
+        table = _COMPILED[tuning] = {
+            slug: CompiledSkill(slug, skill, skill.attack_context(tuning), skill.energy_cost)
+            for slug, skill in _SKILL_INSTANCES.items()
+        }
+    return table
+
+
 def skill_registered(name: str) -> bool:
     """Проверяет, зарегистрирован ли скилл."""
     return name in _SKILL_REGISTRY
@@ -80,6 +133,9 @@ class Overcharge(ShipSkill):
     def _perform(self, user: UnitLike, target: UnitLike) -> str:
         return "Overcharge: следующий выстрел усилен"
 
+    def attack_context(self, tuning: SkillTuning) -> AttackContext:
+        return AttackContext(damage_multiplier=tuning.overcharge_damage_mult)
+
 
 class EMP(ShipSkill):
     """Скилл: ЭМИ-импульс; временно подавляет щиты цели."""
@@ -90,6 +146,12 @@ class EMP(ShipSkill):
     def _perform(self, user: UnitLike, target: UnitLike) -> str:
         return "EMP: щиты цели временно подавлены"
 
+    def attack_context(self, tuning: SkillTuning) -> AttackContext:
+        return AttackContext(
+            extra_shield_ignore=tuning.emp_extra_ignore,
+            shield_efficiency_factor=tuning.emp_shield_eff_factor,
+        )
+
 
 register_skill("overcharge", Overcharge)
 register_skill("emp", EMP)
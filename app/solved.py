@@ -0,0 +1,371 @@
+"""
+Решённая политика ИИ: таблица «состояние → лучший ход», посчитанная офлайн
+и читаемая через mmap.
+
+Полное состояние дуэли — миллиарды клеток на матчап, но оно распадается так
+же, как в app.odds: игрок стреляет обычным выстрелом, и то, как игрок бьёт ИИ,
+от ходов ИИ не зависит. Ходы ИИ меняют только цепь «ИИ бьёт игрока» — корпус
+и щит игрока, энергия ИИ, КД его скиллов; ход игрока между ходами ИИ двигает
+её только регеном. Для этой цепи решатель находит ход, максимизирующий E[γ^T],
+где T — число ходов ИИ до гибели игрока: вероятность добить игрока раньше,
+чем игрок с постоянным риском 1−γ за раунд добьёт ИИ.
+
+Файл таблицы — заголовок _HEADER и байт на состояние: индекс хода в AI_MOVES
+(_NO_MOVE — цель не пробивается, ходит пороговая политика). Файлы лежат в
+каталоге под ключом матчапа и открываются mmap только на чтение, так что
+страницы общие у всех процессов gunicorn на узле. Таблицы считает решатель
+(нужен NumPy):
+
+    python -m app.solved --out policies/ [--all]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import mmap
+import struct
+import sys
+import threading
+from collections.abc import Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+from app.damage import damage_table
+from app.journal import AI_MOVES
+from app.policy import AIMove
+from app.skills import compile_skills
+from app.unit import AttackContext
+
+if TYPE_CHECKING:
+    from app.arena import Arena, ArenaConfig
+    from app.unit import BaseUnit
+
+# magic, версия, ключ матчапа, корпус игрока (макс.), ёмкость щита игрока,
+# энергия ИИ (макс.), γ
+_HEADER = struct.Struct("<4sH16sHHHd")
+_MAGIC = b"SDPT"
+_VERSION = 1
+_NO_MOVE = 0xFF
+SUFFIX = ".sdpt"
+_SKILL_COOLDOWN = 2  # как SKILL_COOLDOWN_TURNS в app.arena
+
+
+def matchup_key(player: BaseUnit, ai: BaseUnit, config: ArenaConfig) -> bytes:
+    """
+    Ключ таблицы: всё, от чего зависит цепь «ИИ бьёт игрока», — класс и оружие
+    ИИ, класс и щит игрока, реген энергии и скиллы. Пороги ИИ не входят.
+    """
+    skills = compile_skills(config)
+    raw = repr(
+        (
+            ai.unit_class,
+            ai.weapon,
+            player.unit_class,
+            player.shield,
+            config.energy_regen_per_turn,
+            tuple((slug, c.energy_cost, c.context) for slug, c in sorted(skills.items())),
+        )
+    )
+    return hashlib.blake2b(raw.encode(), digest_size=16).digest()
+
+
+class PolicyTable:
+    """Таблица одного матчапа поверх mmap файла."""
+
+    __slots__ = ("key", "hull_max", "shield_cap", "energy_max", "discount", "_mm")
+
+    def __init__(self, path: str | Path) -> None:
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < _HEADER.size:
+            raise ValueError(f"{path}: не таблица политики")
+        magic, version, key, hull_max, cap, emax, discount = _HEADER.unpack_from(self._mm)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path}: неизвестный формат таблицы")
+        if len(self._mm) != _HEADER.size + hull_max * (cap + 1) * (emax + 1) * 4:
+            raise ValueError(f"{path}: размер не сходится с заголовком")
+        self.key: bytes = key
+        self.hull_max: int = hull_max
+        self.shield_cap: int = cap
+        self.energy_max: int = emax
+        self.discount: float = discount
+
+    def move(
+        self, p_hull: int, p_shield: int, a_energy: int, cd_over: int, cd_emp: int
+    ) -> AIMove | None:
+        """Ход для состояния или None (состояние вне таблицы / хода нет)."""
+        if not (
+            1 <= p_hull <= self.hull_max
+            and 0 <= p_shield <= self.shield_cap
+            and 0 <= a_energy <= self.energy_max
+        ):
+            return None
+        idx = (p_hull - 1) * (self.shield_cap + 1) + p_shield
+        idx = (idx * (self.energy_max + 1) + a_energy) * 4
+        idx += 2 * min(cd_over, 1) + min(cd_emp, 1)
+        code = self._mm[_HEADER.size + idx]
+        return None if code == _NO_MOVE else cast(AIMove, AI_MOVES[code])
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+class PolicyBook:
+    """Загруженные таблицы по ключу матчапа; ключ арены кэшируется по сборкам."""
+
+    _KEYS_MAX = 1024
+
+    def __init__(self) -> None:
+        self._tables: dict[bytes, PolicyTable] = {}
+        self._keys: dict[tuple[object, ...], bytes] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def add(self, table: PolicyTable) -> None:
+        with self._lock:
+            old = self._tables.get(table.key)
+            self._tables[table.key] = table
+        if old is not None:
+            old.close()
+
+    def load_dir(self, path: str | Path) -> int:
+        """Открывает все *.sdpt каталога; возвращает число таблиц."""
+        files = sorted(Path(path).glob(f"*{SUFFIX}"))
+        for file in files:
+            self.add(PolicyTable(file))
+        return len(files)
+
+    def clear(self) -> None:
+        with self._lock:
+            tables = list(self._tables.values())
+            self._tables.clear()
+            self._keys.clear()
+        for table in tables:
+            table.close()
+
+    def table_for(self, player: BaseUnit, ai: BaseUnit, config: ArenaConfig) -> PolicyTable | None:
+        ident = (ai.unit_class, ai.weapon, player.unit_class, player.shield, config)
+        key = self._keys.get(ident)
+        if key is None:
+            key = matchup_key(player, ai, config)
+            with self._lock:
+                if len(self._keys) >= self._KEYS_MAX:
+                    self._keys.clear()
+                self._keys[ident] = key
+        return self._tables.get(key)
+
+    def move(self, arena: Arena) -> AIMove | None:
+        """Ход ИИ из таблицы матчапа арены или None, если таблицы/хода нет."""
+        p, a = arena.player, arena.ai
+        table = self.table_for(p, a, arena.config)
+        if table is None:
+            return None
+        cds = arena.cooldowns["ai"]
+        return table.move(p.hull, p.shield_hp, a.energy, cds["overcharge"], cds["emp"])
+
+
+BOOK = PolicyBook()
+
+
+def load_tables(path: str | Path) -> int:
+    """Подключает таблицы каталога к общему BOOK (вызывается при старте приложения)."""
+    return BOOK.load_dir(path)
+
+
+# ====== Решатель ======
+
+
+def solve(
+    player: BaseUnit,
+    ai: BaseUnit,
+    config: ArenaConfig,
+    *,
+    discount: float = 0.9,
+    tol: float = 1e-10,
+    max_sweeps: int = 10_000,
+) -> bytes:
+    """
+    Таблица матчапа (заголовок и ходы) для записи в файл. Слои по корпусу
+    игрока решаются снизу вверх: попадание в корпус уводит в решённый слой,
+    а промах и поглощение щитом оставляют в текущем — там итерация значений.
+    """
+    import numpy as np  # NumPy нужен только решателю
+
+    if not 0.0 < discount < 1.0:
+        raise ValueError("discount должен быть в (0, 1)")
+    skills = compile_skills(config)
+    regen = config.energy_regen_per_turn
+    h_max, cap, e_max = player.hull_max, player.shield.capacity, ai.energy_max
+    s_regen, w_cost = player.shield.regen, ai.weapon.energy_cost
+    acc = min(1.0, max(0.0, ai.weapon.accuracy))
+    rolls = range(ai.weapon.dmg_min, ai.weapon.dmg_max + 1)
+    costs = {"overcharge": skills["overcharge"].energy_cost, "emp": skills["emp"].energy_cost}
+    contexts = {
+        "attack": AttackContext(),
+        "overcharge": skills["overcharge"].context,
+        "emp": skills["emp"].context,
+    }
+    tables = {
+        mode: damage_table(ai.unit_class, ai.weapon, player.unit_class, player.shield, ctx)
+        for mode, ctx in contexts.items()
+    }
+    # (режим, щит) → исходы выстрела: (вероятность, поглощено, урон корпусу)
+    shots: dict[tuple[str, int], list[tuple[float, int, int]]] = {}
+    for mode, table in tables.items():
+        for s in range(cap + 1):
+            merged: dict[tuple[int, int], float] = {}
+            if acc < 1.0:
+                merged[(0, 0)] = 1.0 - acc
+            for roll in rolls:
+                _, absorbed, hull = table.hit(roll, s)
+                merged[(absorbed, hull)] = merged.get((absorbed, hull), 0.0) + acc / len(rolls)
+            shots[(mode, s)] = [(p, a, h) for (a, h), p in merged.items() if p > 0.0]
+
+    # порядок перебора = приоритет при равных оценках
+    order: tuple[AIMove, ...] = ("attack", "emp", "overcharge", "pass")
+    shape = (cap + 1, e_max + 1, 2, 2)
+    n = (cap + 1) * (e_max + 1) * 4
+    value = np.zeros((h_max + 1, *shape))
+    codes = np.full((h_max, *shape), _NO_MOVE, dtype=np.uint8)
+
+    for h in range(1, h_max + 1):
+        below = value
+        const = np.full((len(order), n), -np.inf)
+        links: list[list[list[tuple[int, float]]]] = [[[] for _ in range(n)] for _ in order]
+        for i, (s, e, co, ce) in enumerate(np.ndindex(*shape)):
+            for k, move in enumerate(order):
+                energy, cd_o, cd_e = e, co, ce
+                if move == "attack":
+                    if energy < w_cost:
+                        continue
+                elif move != "pass":
+                    cd = cd_o if move == "overcharge" else cd_e
+                    if cd > 0 or energy < costs[move]:
+                        continue
+                    energy -= costs[move]
+                    if move == "overcharge":
+                        cd_o = _SKILL_COOLDOWN
+                    else:
+                        cd_e = _SKILL_COOLDOWN
+                outcomes = [(1.0, 0, 0)]
+                if move != "pass" and energy >= w_cost:
+                    energy -= w_cost
+                    outcomes = shots[(move, s)]
+                # реген после хода ИИ и после хода игрока; ход ИИ тикает КД
+                energy = min(energy + 2 * regen, e_max)
+                cd_o, cd_e = max(0, cd_o - 1), max(0, cd_e - 1)
+                total = 0.0
+                for prob, absorbed, hull in outcomes:
+                    if hull >= h:
+                        total += prob
+                        continue
+                    s2 = min(s - absorbed + 2 * s_regen, cap)
+                    if hull > 0:
+                        total += prob * discount * below[h - hull, s2, energy, cd_o, cd_e]
+                    else:
+                        j = ((s2 * (e_max + 1) + energy) * 2 + cd_o) * 2 + cd_e
+                        links[k][i].append((j, prob * discount))
+                const[k, i] = total
+
+        # разреженные переходы внутри слоя → дополненные до K массивы
+        width = max(1, max(len(row) for per_move in links for row in per_move))
+        idx = np.zeros((len(order), n, width), dtype=np.int64)
+        coef = np.zeros((len(order), n, width))
+        for k, per_move in enumerate(links):
+            for i, row in enumerate(per_move):
+                for w, (j, c) in enumerate(row):
+                    idx[k, i, w] = j
+                    coef[k, i, w] = c
+        layer = np.zeros(n)
+        for _ in range(max_sweeps):
+            q = const + (coef * layer[idx]).sum(axis=2)
+            new = q.max(axis=0)
+            done = float(np.abs(new - layer).max()) < tol
+            layer = new
+            if done:
+                break
+        q = const + (coef * layer[idx]).sum(axis=2)
+        best = q.argmax(axis=0)
+        move_codes = np.array([AI_MOVES.index(m) for m in order], dtype=np.uint8)
+        layer_codes = np.where(layer > tol, move_codes[best], _NO_MOVE).astype(np.uint8)
+        value[h] = layer.reshape(shape)
+        codes[h - 1] = layer_codes.reshape(shape)
+
+    key = matchup_key(player, ai, config)
+    header = _HEADER.pack(_MAGIC, _VERSION, key, h_max, cap, e_max, discount)
+    return header + codes.tobytes()
+
+
+def write_table(
+    out_dir: str | Path,
+    player: BaseUnit,
+    ai: BaseUnit,
+    config: ArenaConfig,
+    *,
+    discount: float = 0.9,
+) -> Path:
+    """Решает матчап и пишет таблицу в out_dir/<ключ>.sdpt (через временный файл)."""
+    data = solve(player, ai, config, discount=discount)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    path = out / f"{matchup_key(player, ai, config).hex()}{SUFFIX}"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+    return path
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    from app.arena import ArenaConfig
+    from app.classes import CLASS_REGISTRY, get_unit_class
+    from app.equipment import (
+        SHIELD_REGISTRY,
+        WEAPON_REGISTRY,
+        get_shield,
+        get_weapon,
+        load_equipment_from_json,
+    )
+    from app.unit import create_ai, create_player
+
+    parser = argparse.ArgumentParser(prog="python -m app.solved", description=__doc__)
+    parser.add_argument("--out", default="policies", help="каталог таблиц")
+    parser.add_argument("--equipment", default="equipment.json", help="каталог оружия/щитов")
+    parser.add_argument("--discount", type=float, default=0.9, help="γ: 1−γ — риск ИИ за раунд")
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="все матчапы каталога (по умолчанию — только быстрый бой)",
+    )
+    args = parser.parse_args(argv)
+
+    load_equipment_from_json(args.equipment)
+    if args.all:
+        # таблица зависит от класса и оружия ИИ и от класса и щита игрока
+        combos = [
+            (pc, ps, ac, aw)
+            for pc in sorted(CLASS_REGISTRY)
+            for ps in sorted(SHIELD_REGISTRY)
+            for ac in sorted(CLASS_REGISTRY)
+            for aw in sorted(WEAPON_REGISTRY)
+        ]
+    else:
+        combos = [("interceptor", "shield_heavy", "destroyer", "railgun_mk1")]
+    config = ArenaConfig(telemetry="off")
+    any_weapon, any_shield = next(iter(WEAPON_REGISTRY)), next(iter(SHIELD_REGISTRY))
+    for pc, ps, ac, aw in combos:
+        player = create_player(
+            unit_class=get_unit_class(pc), weapon=get_weapon(any_weapon), shield=get_shield(ps)
+        )
+        ai = create_ai(
+            unit_class=get_unit_class(ac), weapon=get_weapon(aw), shield=get_shield(any_shield)
+        )
+        path = write_table(args.out, player, ai, config, discount=args.discount)
+        print(f"{pc}/{ps} ← {ac}/{aw}: {path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
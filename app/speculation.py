@@ -0,0 +1,191 @@
+"""
+Спекулятивный ответ ИИ: ход поиска считается, пока игрок думает.
+
+После ответа на запрос бой ждёт действия игрока. Speculator берёт лёгкую копию
+боя (Arena.fork) и в фоновом пуле для каждого действия игрока (выстрел, пропуск,
+Overcharge, EMP) разыгрывает его на копии и ищет ответ ИИ. Генератор копии —
+тот же CompactRandom в том же состоянии, поэтому броски копии — ровно те, что
+сделает настоящий запрос.
+
+Когда действие приходит, запрос проверяет догадку по настоящим броскам:
+состояние генератора и состояние боя после действия (ключ app.ai_cache) должны
+совпасть с посчитанными. Совпало — ход ИИ применяется как обычный ход поиска
+(ai_move в журнале), без поиска в запросе; догадка ещё считается — запрос ждёт
+её, а не ищет заново; не совпало или не начата — ход ищется как обычно.
+
+Имеет смысл только для дорогих политик (expert, mcts): пороговые ходы дешевы,
+а их случайный скилл тратит броски генератора.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Literal
+
+from app.ai_cache import DECISIONS, DecisionKey
+from app.policy import AIMove
+
+if TYPE_CHECKING:
+    from app.arena import Arena
+
+log = logging.getLogger(__name__)
+
+PlayerAction = Literal["attack", "pass", "overcharge", "emp"]
+# Порядок постановки в пул: сначала самое частое действие.
+PLAYER_ACTIONS: tuple[PlayerAction, ...] = ("attack", "pass", "overcharge", "emp")
+SPECULATED_DIFFICULTIES = ("expert", "mcts")
+
+
+@dataclass(frozen=True, slots=True)
+class Guess:
+    """Догадка для одного действия игрока: чем оно кончится и что ответит ИИ."""
+
+    rng_state: int  # состояние генератора после действия игрока
+    key: DecisionKey  # состояние боя после действия (ключ кэша решений)
+    move: AIMove
+
+
+def play(arena: Arena, action: PlayerAction) -> None:
+    """Действие игрока на арене (как в веб-обработчиках)."""
+    if action == "attack":
+        arena.attack()
+    elif action == "pass":
+        arena.pass_turn()
+    else:
+        arena.attack_with_player_skill(action)
+
+
+def guess(arena: Arena, action: PlayerAction) -> Guess | None:
+    """Разыгрывает действие на копии боя и ищет ответ ИИ; None — ИИ отвечать не будет."""
+    fork = arena.fork()
+    play(fork, action)
+    if fork.is_finished or fork.turn != "ai":
+        return None
+    return Guess(rng_state=fork.rng_state, key=DECISIONS.key(fork), move=fork._searched_move())
+
+
+class SpeculationMetrics:
+    """Счётчики на процесс (для /metrics)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.speculated = 0  # поставлено догадок
+        self.hits = 0  # догадка совпала и применена
+        self.waited = 0  # из них запрос ждал, пока догадка досчитается
+        self.mismatches = 0  # броски или состояние разошлись с догадкой
+        self.misses = 0  # догадки не было или её не успели начать
+
+    def bump(self, field: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def snapshot(self) -> dict[str, float | int]:
+        with self._lock:
+            replies = self.hits + self.mismatches + self.misses
+            return {
+                "speculated": self.speculated,
+                "hits": self.hits,
+                "waited": self.waited,
+                "mismatches": self.mismatches,
+                "misses": self.misses,
+                "hit_rate": self.hits / replies if replies else 0.0,
+            }
+
+
+class Speculator:
+    """Догадки по боям (ключ — id боя в хранилище); пул и счётчики — на процесс."""
+
+    def __init__(self, *, workers: int = 1, max_battles: int = 1024) -> None:
+        if workers <= 0 or max_battles <= 0:
+            raise ValueError("workers и max_battles должны быть > 0")
+        self.max_battles = max_battles
+        self.metrics = SpeculationMetrics()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="speculate")
+        self._lock = threading.Lock()
+        self._pending: OrderedDict[str, dict[PlayerAction, Future[Guess | None]]] = OrderedDict()
+
+    def speculate(self, aid: str, arena: Arena) -> None:
+        """Ставит догадки для следующего действия игрока; прежние догадки боя снимаются."""
+        if (
+            arena.ai_difficulty not in SPECULATED_DIFFICULTIES
+            or arena.is_finished
+            or arena.turn != "player"
+        ):
+            self.discard(aid)
+            return
+        base = arena.fork()  # снимок под локом запроса: пул не видит живую арену
+        futures = {action: self._pool.submit(guess, base, action) for action in PLAYER_ACTIONS}
+        with self._lock:
+            stale = self._pending.pop(aid, None)
+            self._pending[aid] = futures
+            while len(self._pending) > self.max_battles:
+                _, evicted = self._pending.popitem(last=False)
+                _cancel(evicted.values())
+        if stale is not None:
+            _cancel(stale.values())
+        self.metrics.bump("speculated", len(futures))
+
+    def discard(self, aid: str) -> None:
+        with self._lock:
+            stale = self._pending.pop(aid, None)
+        if stale is not None:
+            _cancel(stale.values())
+
+    def reply(self, aid: str, arena: Arena, action: PlayerAction) -> AIMove | None:
+        """
+        Сверяет догадку с боем после настоящего действия игрока. Возвращает ход ИИ,
+        если догадка совпала; None — ход надо искать как обычно.
+        """
+        with self._lock:
+            futures = self._pending.pop(aid, None)
+        if futures is None:
+            self.metrics.bump("misses")
+            return None
+        future = futures.pop(action)
+        _cancel(futures.values())
+        if future.cancel():  # до этой догадки пул не дошёл
+            self.metrics.bump("misses")
+            return None
+        waited = not future.done()
+        try:
+            found = future.result()
+        except Exception:  # догадка упала — ход найдёт сам запрос
+            log.exception("Спекуляция хода ИИ не удалась (бой %s, %s)", aid, action)
+            self.metrics.bump("misses")
+            return None
+        if arena.is_finished or arena.turn != "ai":
+            return None  # отвечать ИИ не нужно
+        if found is None or found.rng_state != arena.rng_state or found.key != DECISIONS.key(arena):
+            self.metrics.bump("mismatches")
+            return None
+        self.metrics.bump("hits")
+        if waited:
+            self.metrics.bump("waited")
+        return found.move
+
+    def commit(self, aid: str, arena: Arena, action: PlayerAction) -> bool:
+        """Применяет совпавшую догадку как ход ИИ (под локом боя); False — догадки нет."""
+        with arena.lock:
+            move = self.reply(aid, arena, action)
+            if move is None:
+                return False
+            arena._ai_move(move)
+            return True
+
+    def close(self) -> None:
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for futures in pending:
+            _cancel(futures.values())
+        self._pool.shutdown(wait=True)
+
+
+def _cancel(futures: Iterable[Future[Guess | None]]) -> None:
+    for future in futures:
+        future.cancel()
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+from array import array
+from collections.abc import Hashable
+from typing import Generic, Literal, TypeVar
+
+from app.arena import DIFFICULTIES, Arena, ArenaConfig
+from app.classes import UnitClass
+from app.equipment import Shield, Weapon
+from app.telemetry import text
+from app.unit import AIUnit, PlayerUnit
+
+T = TypeVar("T", bound=Hashable)
+
+# Биты колонки flags.
+_F_LIVE = 1 << 0
+_F_TURN_AI = 1 << 1
+_F_P_SKILL = 1 << 2
+_F_A_SKILL = 1 << 3
+_F_DIFF_SHIFT = 4
+
+
+class _Interner(Generic[T]):
+    """
+    Словарь «значение → маленький id»: неизменяемые предметы храним один раз.
+    Только для конечных наборов (реестры, конфиги): id не освобождаются.
+    """
+
+    __slots__ = ("_ids", "_items")
+
+    def __init__(self) -> None:
+        self._ids: dict[T, int] = {}
+        self._items: list[T] = []
+
+    def id_of(self, item: T) -> int:
+        idx = self._ids.get(item)
+        if idx is None:
+            idx = len(self._items)
+            if idx > 0xFFFF:
+                raise OverflowError("Слишком много различных значений для колонки uint16")
+            self._ids[item] = idx
+            self._items.append(item)
+        return idx
+
+    def get(self, idx: int) -> T:
+        return self._items[idx]
+
+
+class BattleRow:
+    """Лёгкое представление одной строки таблицы без сборки Arena."""
+
+    __slots__ = ("_table", "slot")
+
+    def __init__(self, table: BattleStateTable, slot: int) -> None:
+        self._table = table
+        self.slot = slot
+
+    @property
+    def turn(self) -> Literal["player", "ai"]:
+        return "ai" if self._table.flags[self.slot] & _F_TURN_AI else "player"
+
+    @property
+    def player_hull(self) -> int:
+        return self._table.p_hull[self.slot]
+
+    @property
+    def ai_hull(self) -> int:
+        return self._table.a_hull[self.slot]
+
+    @property
+    def is_finished(self) -> bool:
+        return self.player_hull <= 0 or self.ai_hull <= 0
+
+
+class BattleStateTable:
+    """
+    Компактное хранилище боёв в формате struct-of-arrays.
+    Каждая колонка — array фиксированной ширины, строка — слот боя.
+    Классы/предметы/конфиги интернируются и хранятся как uint16-id, RNG — одно
+    64-битное число (CompactRandom). Имена игроков (произвольные строки) и хвост
+    видимого лога лежат в боковом списке по слоту и освобождаются вместе со строкой.
+    """
+
+    def __init__(self) -> None:
+        # Ресурсы сторон.
+        self.p_hull = array("h")
+        self.p_energy = array("h")
+        self.p_shield = array("h")
+        self.a_hull = array("h")
+        self.a_energy = array("h")
+        self.a_shield = array("h")
+        # Кулдауны: (player|ai) × (overcharge|emp).
+        self.p_cd_over = array("b")
+        self.p_cd_emp = array("b")
+        self.a_cd_over = array("b")
+        self.a_cd_emp = array("b")
+        # Ход, skill_used, сложность, признак занятости слота.
+        self.flags = array("B")
+        self.rng = array("Q")
+        # Ссылки на неизменяемые части (id в интернерах).
+        self.p_class = array("H")
+        self.p_weapon = array("H")
+        self.p_shield_item = array("H")
+        self.a_class = array("H")
+        self.a_weapon = array("H")
+        self.a_shield_item = array("H")
+        self.config = array("H")
+        # Слот → (имя игрока, имя ИИ, хвост видимого лога); None — слот свободен.
+        self._side: list[tuple[str, str, tuple[str, ...]] | None] = []
+
+        self._classes: _Interner[UnitClass] = _Interner()
+        self._weapons: _Interner[Weapon] = _Interner()
+        self._shields: _Interner[Shield] = _Interner()
+        self._configs: _Interner[ArenaConfig] = _Interner()
+
+        self._free: list[int] = []
+        self._live = 0
+
+    def _columns(self) -> tuple[array[int], ...]:
+        return (
+            self.p_hull,
+            self.p_energy,
+            self.p_shield,
+            self.a_hull,
+            self.a_energy,
+            self.a_shield,
+            self.p_cd_over,
+            self.p_cd_emp,
+            self.a_cd_over,
+            self.a_cd_emp,
+            self.flags,
+            self.rng,
+            self.p_class,
+            self.p_weapon,
+            self.p_shield_item,
+            self.a_class,
+            self.a_weapon,
+            self.a_shield_item,
+            self.config,
+        )
+
+    @property
+    def bytes_per_row(self) -> int:
+        return sum(col.itemsize for col in self._columns())
+
+    @property
+    def capacity(self) -> int:
+        return len(self.flags)
+
+    def __len__(self) -> int:
+        return self._live
+
+    def alloc(self) -> int:
+        """Выдаёт свободный слот (переиспользует освобождённые)."""
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self.flags)
+            for col in self._columns():
+                col.append(0)
+            self._side.append(None)
+        self.flags[slot] = _F_LIVE
+        self._live += 1
+        return slot
+
+    def free(self, slot: int) -> None:
+        if not self.flags[slot] & _F_LIVE:
+            raise KeyError(f"Слот {slot} не занят")
+        self.flags[slot] = 0
+        self._side[slot] = None
+        self._free.append(slot)
+        self._live -= 1
+
+    def row(self, slot: int) -> BattleRow:
+        return BattleRow(self, slot)
+
+    def store(self, slot: int, arena: Arena, *, log_tail: int = 0) -> None:
+        """
+        Записывает состояние боя в строку slot (log_tail — сколько последних видимых
+        строк лога сохранить). Строка пишется целиком или не меняется вовсе.
+        """
+        if not self.flags[slot] & _F_LIVE:
+            raise KeyError(f"Слот {slot} не занят")
+        p, a = arena.player, arena.ai
+        cd = arena.cooldowns
+
+        flags = _F_LIVE | (DIFFICULTIES.index(arena.ai_difficulty) << _F_DIFF_SHIFT)
+        if arena.turn == "ai":
+            flags |= _F_TURN_AI
+        if p.skill_used:
+            flags |= _F_P_SKILL
+        if a.skill_used:
+            flags |= _F_A_SKILL
+        # порядок — как в _columns()
+        values = (
+            p.hull,
+            p.energy,
+            p.shield_hp,
+            a.hull,
+            a.energy,
+            a.shield_hp,
+            cd["player"]["overcharge"],
+            cd["player"]["emp"],
+            cd["ai"]["overcharge"],
+            cd["ai"]["emp"],
+            flags,
+            arena.rng_state,
+            self._classes.id_of(p.unit_class),
+            self._weapons.id_of(p.weapon),
+            self._shields.id_of(p.shield),
+            self._classes.id_of(a.unit_class),
+            self._weapons.id_of(a.weapon),
+            self._shields.id_of(a.shield),
+            self._configs.id_of(arena.config),
+        )
+        side = (p.name, a.name, arena._log.visible_tail(log_tail))
+
+        columns = self._columns()
+        before = [col[slot] for col in columns]
+        try:
+            for col, value in zip(columns, values, strict=True):
+                col[slot] = value
+        except OverflowError:  # значение не влезло в колонку — строку не портим
+            for col, old in zip(columns, before, strict=True):
+                col[slot] = old
+            raise
+        self._side[slot] = side
+
+    def load(self, slot: int) -> Arena:
+        """Собирает Arena из строки slot (бой продолжается с того же состояния RNG)."""
+        flags = self.flags[slot]
+        side = self._side[slot]
+        if not flags & _F_LIVE or side is None:
+            raise KeyError(f"Слот {slot} не занят")
+        p_name, a_name, log_tail = side
+
+        player = PlayerUnit(
+            name=p_name,
+            unit_class=self._classes.get(self.p_class[slot]),
+            weapon=self._weapons.get(self.p_weapon[slot]),
+            shield=self._shields.get(self.p_shield_item[slot]),
+            hull=self.p_hull[slot],
+            energy=self.p_energy[slot],
+            shield_hp=self.p_shield[slot],
+            skill_used=bool(flags & _F_P_SKILL),
+        )
+        ai = AIUnit(
+            name=a_name,
+            unit_class=self._classes.get(self.a_class[slot]),
+            weapon=self._weapons.get(self.a_weapon[slot]),
+            shield=self._shields.get(self.a_shield_item[slot]),
+            hull=self.a_hull[slot],
+            energy=self.a_energy[slot],
+            shield_hp=self.a_shield[slot],
+            skill_used=bool(flags & _F_A_SKILL),
+        )
+        arena = Arena.restore(
+            player=player,
+            ai=ai,
+            turn="ai" if flags & _F_TURN_AI else "player",
+            difficulty=DIFFICULTIES[flags >> _F_DIFF_SHIFT],
+            cooldowns={
+                "player": {
+                    "overcharge": self.p_cd_over[slot],
+                    "emp": self.p_cd_emp[slot],
+                },
+                "ai": {"overcharge": self.a_cd_over[slot], "emp": self.a_cd_emp[slot]},
+            },
+            rng_state=self.rng[slot],
+            config=self._configs.get(self.config[slot]),
+        )
+        arena._log.extend(text(line) for line in log_tail)
+        return arena
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+# Запись телеметрии боя — короткий кортеж (вид, *значения).
+# Строка собирается только по запросу (render): панель показывает последние
+# несколько видимых строк, а снимки [SNAP:...] нужны лишь при отладке/выгрузке.
+Record = tuple[Any, ...]
+
+TEXT = "text"  # (TEXT, готовая строка)
+SNAP = "snap"  # (SNAP, метка, ход, 6 чисел игрока, 6 чисел ИИ)
+SWAP = "swap"  # (SWAP, чей ход)
+PASS = "pass"  # (PASS, кто)
+SHOT = "shot"  # (SHOT, имя, попал, энергия, урон до щита, щит, корпус)
+
+# Виды, которые не показываются в ui_log.
+HIDDEN: frozenset[str] = frozenset({SNAP})
+
+
+def text(message: str) -> Record:
+    return (TEXT, message)
+
+
+def _render_snap(r: Record) -> str:
+    (_, label, turn, ph, phm, psh, pshm, pen, penm, ah, ahm, ash, ashm, aen, aenm) = r
+    return (
+        f"[SNAP:{label}] turn={turn} | "
+        f"P(hull={ph}/{phm}, sh={psh}/{pshm}, en={pen}/{penm}) | "
+        f"A(hull={ah}/{ahm}, sh={ash}/{ashm}, en={aen}/{aenm})"
+    )
+
+
+def _render_shot(r: Record) -> str:
+    _, name, hit, energy, before, absorbed, hull = r
+    if energy == 0 and not hit:
+        return f"{name}: недостаточно энергии для выстрела"
+    if not hit:
+        return f"{name}: промах (энергия -{energy})"
+    return (
+        f"{name}: попал (энергия -{energy}), "
+        f"урон до щита {before}, "
+        f"поглотил щит {absorbed}, "
+        f"корпусу {hull}"
+    )
+
+
+_RENDERERS: dict[str, Callable[[Record], str]] = {
+    TEXT: lambda r: str(r[1]),
+    SNAP: _render_snap,
+    SWAP: lambda r: f"Теперь ход: {r[1]}",
+    PASS: lambda r: f"{r[1]}: пропуск хода.",
+    SHOT: _render_shot,
+}
+
+
+def render(record: Record) -> str:
+    """Строка лога для записи (в том же виде, что раньше писалась сразу)."""
+    return _RENDERERS[record[0]](record)
+
+
+def is_visible(record: Record) -> bool:
+    """Попадает ли запись в ui_log (без снимков и шума про реген)."""
+    kind = record[0]
+    if kind in HIDDEN:
+        return False
+    return not (kind == TEXT and "реген" in str(record[1]).lower())
+
+
+class BattleLog:
+    """
+    Ограниченный лог боя: кольцевой буфер записей (append — O(1)) и отдельный
+    буфер видимых записей, чтобы «последние k строк для панели» стоили O(k).
+    Вытесненные записи при заданном spill_path дописываются в файл боя
+    (отрендеренными строками, пачками по spill_batch).
+    """
+
+    __slots__ = (
+        "capacity",
+        "spill_path",
+        "spill_batch",
+        "spilled",
+        "_ring",
+        "_visible",
+        "_pending",
+    )
+
+    def __init__(
+        self,
+        capacity: int = 512,
+        *,
+        spill_path: str | Path | None = None,
+        spill_batch: int = 64,
+    ) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity должен быть > 0")
+        self.capacity = capacity
+        self.spill_path = Path(spill_path) if spill_path is not None else None
+        self.spill_batch = spill_batch
+        self.spilled = 0
+        self._ring: deque[Record] = deque(maxlen=capacity)
+        self._visible: deque[Record] = deque(maxlen=capacity)
+        self._pending: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+    def __iter__(self) -> Iterator[Record]:
+        return iter(self._ring)
+
+    def append(self, record: Record) -> None:
+        ring = self._ring
+        if len(ring) == self.capacity and self.spill_path is not None:
+            self._pending.append(render(ring[0]))
+            if len(self._pending) >= self.spill_batch:
+                self.flush()
+        ring.append(record)
+        if is_visible(record):
+            self._visible.append(record)
+
+    def extend(self, records: Iterable[Record]) -> None:
+        for record in records:
+            self.append(record)
+
+    def clear(self) -> None:
+        """Новый бой: буферы очищаются, уже вытесненное остаётся в файле."""
+        self.flush()
+        self._ring.clear()
+        self._visible.clear()
+
+    def flush(self) -> None:
+        """Дописывает накопленные вытесненные строки в файл боя."""
+        if not self._pending or self.spill_path is None:
+            return
+        with self.spill_path.open("a", encoding="utf-8") as fh:
+            fh.write("\n".join(self._pending))
+            fh.write("\n")
+        self.spilled += len(self._pending)
+        self._pending.clear()
+
+    def tail(self, k: int) -> tuple[Record, ...]:
+        """Последние k записей (включая скрытые)."""
+        return _last(self._ring, k)
+
+    def visible_tail(self, k: int) -> tuple[str, ...]:
+        """Последние k видимых строк; рендерятся только они."""
+        return tuple(render(r) for r in _last(self._visible, k))
+
+    def visible(self) -> tuple[str, ...]:
+        return tuple(render(r) for r in self._visible)
+
+
+def _last(buf: deque[Record], k: int) -> tuple[Record, ...]:
+    if k <= 0:
+        return ()
+    out = list(islice(reversed(buf), k))  # идём с конца: O(k)
+    out.reverse()
+    return tuple(out)
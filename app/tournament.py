@@ -0,0 +1,329 @@
+"""
+Турнир по всем матчапам каталога: CLASS × WEAPON × SHIELD (игрок и ИИ) × сложность.
+
+    python -m app.tournament --out sweep.jsonl --battles 2000
+
+Матчапы режутся на шарды и считаются в ProcessPoolExecutor пакетным ядром app.sim.
+Seed каждого матчапа выводится из --seed и ключа матчапа, поэтому результат не
+зависит от числа воркеров, размера шарда и порядка завершения. Строки пишутся
+по мере готовности в JSONL или CSV (по расширению --out); повторный запуск с тем
+же файлом пропускает уже посчитанные матчапы.
+"""
+
+from __future__ import annotations
+
+import abc
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from itertools import product
+from pathlib import Path
+from typing import Any
+
+from app.arena import ArenaConfig
+from app.classes import CLASS_REGISTRY, get_unit_class
+from app.equipment import (
+    SHIELD_REGISTRY,
+    WEAPON_REGISTRY,
+    get_shield,
+    get_weapon,
+    load_equipment_from_json,
+)
+from app.policy import THRESHOLD_DIFFICULTIES, Difficulty
+from app.unit import create_ai, create_player
+
+ROW_FIELDS: tuple[str, ...] = (
+    "key",
+    "player_class",
+    "player_weapon",
+    "player_shield",
+    "ai_class",
+    "ai_weapon",
+    "ai_shield",
+    "difficulty",
+    "seed",
+    "battles",
+    "player_wins",
+    "ai_wins",
+    "unfinished",
+    "player_winrate",
+    "mean_turns",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Loadout:
+    """Сборка корабля: слаги класса, оружия и щита."""
+
+    unit_class: str
+    weapon: str
+    shield: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.unit_class}/{self.weapon}/{self.shield}"
+
+
+@dataclass(frozen=True, slots=True)
+class Matchup:
+    player: Loadout
+    ai: Loadout
+    difficulty: Difficulty
+
+    @property
+    def key(self) -> str:
+        return f"{self.player.key}|{self.ai.key}|{self.difficulty}"
+
+    def seed(self, base_seed: int) -> int:
+        """Детерминированный seed матчапа (не зависит от шардирования)."""
+        digest = hashlib.blake2b(f"{base_seed}:{self.key}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little")
+
+
+def enumerate_matchups(
+    classes: Iterable[str] | None = None,
+    weapons: Iterable[str] | None = None,
+    shields: Iterable[str] | None = None,
+    difficulties: Iterable[Difficulty] = THRESHOLD_DIFFICULTIES,
+) -> list[Matchup]:
+    """Все пары сборок × сложности из реестров (или переданных подмножеств), в стабильном порядке."""
+    loadouts = [
+        Loadout(c, w, s)
+        for c, w, s in product(
+            sorted(classes if classes is not None else CLASS_REGISTRY),
+            sorted(weapons if weapons is not None else WEAPON_REGISTRY),
+            sorted(shields if shields is not None else SHIELD_REGISTRY),
+        )
+    ]
+    return [Matchup(p, a, d) for p, a, d in product(loadouts, loadouts, difficulties)]
+
+
+# ====== Хранилище результатов ======
+
+
+class ResultStore(abc.ABC):
+    """Построчное хранилище результатов с дозаписью."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+
+    def _trim_partial_tail(self) -> None:
+        """Обрезает недописанную последнюю строку (если процесс прервали на записи)."""
+        if not self.path.exists():
+            return
+        data = self.path.read_bytes()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            with self.path.open("r+b") as fh:
+                fh.truncate(end)
+
+    @abc.abstractmethod
+    def rows(self) -> Iterator[dict[str, Any]]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def append(self, rows: Sequence[dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def done_keys(self) -> set[str]:
+        self._trim_partial_tail()
+        return {str(row["key"]) for row in self.rows()}
+
+
+class JsonlResultStore(ResultStore):
+    def rows(self) -> Iterator[dict[str, Any]]:
+        if not self.path.exists():
+            return
+        with self.path.open(encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+    def append(self, rows: Sequence[dict[str, Any]]) -> None:
+        with self.path.open("a", encoding="utf-8") as fh:
+            fh.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+
+class CsvResultStore(ResultStore):
+    def rows(self) -> Iterator[dict[str, Any]]:
+        if not self.path.exists():
+            return
+        with self.path.open(encoding="utf-8", newline="") as fh:
+            yield from csv.DictReader(fh)
+
+    def append(self, rows: Sequence[dict[str, Any]]) -> None:
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        with self.path.open("a", encoding="utf-8", newline="") as fh:
+            writer = csv.DictWriter(fh, fieldnames=ROW_FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+
+
+def open_result_store(path: str | Path) -> ResultStore:
+    """Формат по расширению: .csv → CSV, иначе JSONL."""
+    if Path(path).suffix.lower() == ".csv":
+        return CsvResultStore(path)
+    return JsonlResultStore(path)
+
+
+# ====== Воркеры ======
+
+
+def _init_worker(equipment_path: str | None) -> None:
+    """Каталог в дочернем процессе (при spawn реестры пустые)."""
+    if equipment_path is not None:
+        load_equipment_from_json(equipment_path)
+
+
+def _run_shard(
+    shard: Sequence[Matchup],
+    *,
+    battles: int,
+    base_seed: int,
+    max_turns: int,
+    config: ArenaConfig,
+) -> list[dict[str, Any]]:
+    from app.sim import simulate  # NumPy нужен только в воркере
+
+    rows: list[dict[str, Any]] = []
+    for m in shard:
+        player = create_player(
+            unit_class=get_unit_class(m.player.unit_class),
+            weapon=get_weapon(m.player.weapon),
+            shield=get_shield(m.player.shield),
+        )
+        ai = create_ai(
+            unit_class=get_unit_class(m.ai.unit_class),
+            weapon=get_weapon(m.ai.weapon),
+            shield=get_shield(m.ai.shield),
+        )
+        seed = m.seed(base_seed)
+        summary = simulate(
+            player,
+            ai,
+            battles,
+            difficulty=m.difficulty,
+            config=config,
+            rng=seed,
+            max_turns=max_turns,
+        ).summary()
+        rows.append(
+            {
+                "key": m.key,
+                "player_class": m.player.unit_class,
+                "player_weapon": m.player.weapon,
+                "player_shield": m.player.shield,
+                "ai_class": m.ai.unit_class,
+                "ai_weapon": m.ai.weapon,
+                "ai_shield": m.ai.shield,
+                "difficulty": m.difficulty,
+                "seed": seed,
+                "battles": summary["battles"],
+                "player_wins": summary["player_wins"],
+                "ai_wins": summary["ai_wins"],
+                "unfinished": summary["unfinished"],
+                "player_winrate": round(summary["player_winrate"], 6),
+                "mean_turns": round(summary["mean_turns"], 3),
+            }
+        )
+    return rows
+
+
+def run_tournament(
+    matchups: Sequence[Matchup],
+    store: ResultStore,
+    *,
+    battles: int = 1000,
+    base_seed: int = 0,
+    workers: int | None = None,
+    shard_size: int = 16,
+    max_turns: int = 1000,
+    equipment_path: str | Path | None = None,
+    config: ArenaConfig | None = None,
+    executor: Executor | None = None,
+) -> int:
+    """
+    Считает ещё не посчитанные матчапы и дописывает их в store.
+    Возвращает число новых строк.
+    """
+    done = store.done_keys()
+    todo = [m for m in matchups if m.key not in done]
+    if not todo:
+        return 0
+    cfg = config or ArenaConfig(telemetry="off")
+    shards = [todo[i : i + shard_size] for i in range(0, len(todo), shard_size)]
+
+    own = executor is None
+    pool = executor or ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(str(equipment_path) if equipment_path is not None else None,),
+    )
+    written = 0
+    try:
+        futures = [
+            pool.submit(
+                _run_shard,
+                shard,
+                battles=battles,
+                base_seed=base_seed,
+                max_turns=max_turns,
+                config=cfg,
+            )
+            for shard in shards
+        ]
+        for fut in as_completed(futures):
+            rows = fut.result()
+            store.append(rows)
+            written += len(rows)
+    finally:
+        if own:
+            pool.shutdown(cancel_futures=True)
+    return written
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.tournament", description=__doc__)
+    parser.add_argument("--out", default="tournament.jsonl", help="файл результатов (.jsonl/.csv)")
+    parser.add_argument("--equipment", default="equipment.json", help="каталог оружия/щитов")
+    parser.add_argument("--battles", type=int, default=1000, help="боёв на матчап")
+    parser.add_argument("--seed", type=int, default=0, help="базовый seed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="процессов")
+    parser.add_argument("--shard-size", type=int, default=16, help="матчапов на задачу")
+    parser.add_argument("--max-turns", type=int, default=1000, help="предел полуходов на бой")
+    parser.add_argument(
+        "--difficulty",
+        action="append",
+        choices=THRESHOLD_DIFFICULTIES,
+        help="сложность (можно несколько; по умолчанию все)",
+    )
+    args = parser.parse_args(argv)
+
+    load_equipment_from_json(args.equipment)
+    matchups = enumerate_matchups(difficulties=args.difficulty or THRESHOLD_DIFFICULTIES)
+    store = open_result_store(args.out)
+    already = len(store.done_keys())
+    print(f"матчапов: {len(matchups)}, уже посчитано: {already}", file=sys.stderr)
+    written = run_tournament(
+        matchups,
+        store,
+        battles=args.battles,
+        base_seed=args.seed,
+        workers=args.workers,
+        shard_size=args.shard_size,
+        max_turns=args.max_turns,
+        equipment_path=args.equipment,
+    )
+    print(f"готово: +{written} строк → {args.out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,336 @@
+"""
+Подбор порогов ИИ под целевые винрейты игрока по сложностям.
+
+    python -m app.tuning --out ai_tuning.json --target easy=0.7 --target hard=0.35
+
+Крутятся поля ArenaConfig, которые читает app.policy: ai_emp_shield_threshold и
+ai_overcharge_hull_pct (по сложности), энергетические гейты ai_emp_min_energy и
+ai_overcharge_min_energy и ai_skill_chance. Кандидаты — случайная выборка из
+сетки SearchSpace (плюс текущие значения); отбор — successive halving: все
+кандидаты играют малым числом боёв, лучшая 1/eta доля — в eta раз большим, и
+так до одного. Оценка кандидата — пакетное ядро app.sim на выборке матчапов
+каталога в ProcessPoolExecutor; seed боёв зависит только от ступени и матчапа
+(общие случайные числа), поэтому кандидаты сравниваются на одних и тех же
+бросках. Потеря — сумма квадратов отклонений винрейта от цели по сложностям.
+
+Итог пишется в JSON; приложение подхватывает его при старте
+(AI_TUNING_FILE, см. load_tuning).
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+from collections.abc import Mapping, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any
+
+from app.arena import ArenaConfig, set_ai_tuning
+from app.classes import get_unit_class
+from app.equipment import get_shield, get_weapon, load_equipment_from_json
+from app.policy import THRESHOLD_DIFFICULTIES, compile_policies
+from app.tournament import Loadout, enumerate_matchups
+from app.unit import create_ai, create_player
+
+# Поля ArenaConfig, которые подбирает тюнер и которые читаются из файла.
+TUNING_FIELDS: tuple[str, ...] = (
+    "ai_emp_shield_threshold",
+    "ai_overcharge_hull_pct",
+    "ai_emp_min_energy",
+    "ai_overcharge_min_energy",
+    "ai_skill_chance",
+)
+DEFAULT_TARGETS: dict[str, float] = {"easy": 0.70, "normal": 0.50, "hard": 0.35}
+
+Pair = tuple[Loadout, Loadout]
+
+
+@dataclass(frozen=True, slots=True)
+class Candidate:
+    """Набор порогов ИИ: по значению на сложность и общие гейты."""
+
+    ai_emp_shield_threshold: tuple[int, ...]
+    ai_overcharge_hull_pct: tuple[float, ...]
+    ai_emp_min_energy: int
+    ai_overcharge_min_energy: int
+    ai_skill_chance: float
+
+    @classmethod
+    def of(cls, config: ArenaConfig) -> Candidate:
+        return cls(**{name: getattr(config, name) for name in TUNING_FIELDS})
+
+    def apply(self, config: ArenaConfig) -> ArenaConfig:
+        return replace(config, **asdict(self))
+
+
+@dataclass(frozen=True, slots=True)
+class SearchSpace:
+    """Сетка значений; пороги сложностей выбираются из неё независимо."""
+
+    emp_shield: tuple[int, ...] = (0, 1, 4, 8, 15, 25, 99)
+    over_hull_pct: tuple[float, ...] = (0.0, 0.15, 0.25, 0.35, 0.45, 0.6)
+    emp_min_energy: tuple[int, ...] = (25, 30, 40)
+    over_min_energy: tuple[int, ...] = (20, 25, 34)
+    skill_chance: tuple[float, ...] = (0.0, 0.1, 0.25, 0.5)
+
+    @property
+    def size(self) -> int:
+        per_difficulty = len(self.emp_shield) * len(self.over_hull_pct)
+        shared = len(self.emp_min_energy) * len(self.over_min_energy) * len(self.skill_chance)
+        return math.prod([per_difficulty] * len(THRESHOLD_DIFFICULTIES)) * shared
+
+    def sample(self, n: int, seed: int) -> list[Candidate]:
+        """n различных кандидатов из сетки (вся сетка, если она меньше n)."""
+        rnd = random.Random(seed)
+        k = len(THRESHOLD_DIFFICULTIES)
+        out: dict[Candidate, None] = {}
+        while len(out) < min(n, self.size):
+            cand = Candidate(
+                ai_emp_shield_threshold=tuple(rnd.choice(self.emp_shield) for _ in range(k)),
+                ai_overcharge_hull_pct=tuple(rnd.choice(self.over_hull_pct) for _ in range(k)),
+                ai_emp_min_energy=rnd.choice(self.emp_min_energy),
+                ai_overcharge_min_energy=rnd.choice(self.over_min_energy),
+                ai_skill_chance=rnd.choice(self.skill_chance),
+            )
+            out[cand] = None
+        return list(out)
+
+
+@dataclass(frozen=True, slots=True)
+class Scored:
+    candidate: Candidate
+    winrates: dict[str, float]
+    loss: float
+    battles: int  # боёв на матчап и сложность на последней ступени
+
+
+def loss(winrates: Mapping[str, float], targets: Mapping[str, float]) -> float:
+    return sum((winrates[d] - t) ** 2 for d, t in targets.items())
+
+
+def sample_pairs(n: int, seed: int) -> list[Pair]:
+    """Быстрый бой и ещё n−1 случайных пар сборок каталога (реестры уже загружены)."""
+    pairs = [(m.player, m.ai) for m in enumerate_matchups(difficulties=("hard",))]
+    quick: Pair = (
+        Loadout("interceptor", "railgun_mk1", "shield_heavy"),
+        Loadout("destroyer", "railgun_mk1", "shield_heavy"),
+    )
+    rest = [p for p in pairs if p != quick]
+    random.Random(seed).shuffle(rest)
+    head = [quick] if quick in pairs else []
+    return (head + rest)[: max(1, n)]
+
+
+def _pair_seed(base_seed: int, rung: int, pair: Pair, difficulty: str) -> int:
+    key = f"{base_seed}:{rung}:{pair[0].key}|{pair[1].key}|{difficulty}"
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+def _init_worker(equipment_path: str | None) -> None:
+    """Каталог в дочернем процессе (при spawn реестры пустые)."""
+    if equipment_path is not None:
+        load_equipment_from_json(equipment_path)
+
+
+def evaluate(
+    candidate: Candidate,
+    pairs: Sequence[Pair],
+    difficulties: Sequence[str],
+    *,
+    battles: int,
+    base_seed: int,
+    rung: int,
+    config: ArenaConfig,
+    max_turns: int = 1000,
+) -> dict[str, float]:
+    """Винрейт игрока по сложностям на парах сборок (battles боёв на пару)."""
+    from app.sim import simulate  # NumPy нужен только в воркере
+
+    cfg = candidate.apply(config)
+    wins = dict.fromkeys(difficulties, 0)
+    for pair in pairs:
+        p, a = pair
+        player = create_player(
+            unit_class=get_unit_class(p.unit_class),
+            weapon=get_weapon(p.weapon),
+            shield=get_shield(p.shield),
+        )
+        ai = create_ai(
+            unit_class=get_unit_class(a.unit_class),
+            weapon=get_weapon(a.weapon),
+            shield=get_shield(a.shield),
+        )
+        for difficulty in difficulties:
+            res = simulate(
+                player,
+                ai,
+                battles,
+                difficulty=difficulty,  # type: ignore[arg-type]
+                config=cfg,
+                rng=_pair_seed(base_seed, rung, pair, difficulty),
+                max_turns=max_turns,
+            )
+            wins[difficulty] += res.player_wins
+    total = battles * len(pairs)
+    return {d: wins[d] / total for d in difficulties}
+
+
+def successive_halving(
+    candidates: Sequence[Candidate],
+    pairs: Sequence[Pair],
+    targets: Mapping[str, float],
+    *,
+    min_battles: int = 32,
+    max_battles: int = 2048,
+    eta: int = 3,
+    base_seed: int = 0,
+    config: ArenaConfig | None = None,
+    workers: int | None = None,
+    equipment_path: str | Path | None = None,
+    executor: Executor | None = None,
+) -> list[Scored]:
+    """
+    Отсев кандидатов; возвращает последнюю ступень по возрастанию потери
+    (первый — лучший). Каждая ступень — в eta раз меньше кандидатов и в eta
+    раз больше боёв, пока не останется один или не упрёмся в max_battles.
+    """
+    if not candidates:
+        raise ValueError("Нет кандидатов")
+    if eta < 2:
+        raise ValueError("eta должен быть >= 2")
+    cfg = config or ArenaConfig(telemetry="off")
+    difficulties = list(targets)
+    own = executor is None
+    pool = executor or ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(str(equipment_path) if equipment_path is not None else None,),
+    )
+    survivors = list(candidates)
+    battles = min_battles
+    rung = 0
+    try:
+        while True:
+            futures = [
+                pool.submit(
+                    evaluate,
+                    cand,
+                    pairs,
+                    difficulties,
+                    battles=battles,
+                    base_seed=base_seed,
+                    rung=rung,
+                    config=cfg,
+                )
+                for cand in survivors
+            ]
+            scored = [
+                Scored(cand, rates, loss(rates, targets), battles)
+                for cand, rates in zip(survivors, (f.result() for f in futures), strict=True)
+            ]
+            # стабильная сортировка: при равной потере — порядок выборки
+            scored.sort(key=lambda s: s.loss)
+            if len(scored) == 1 or battles * eta > max_battles:
+                return scored
+            survivors = [s.candidate for s in scored[: max(1, len(scored) // eta)]]
+            battles *= eta
+            rung += 1
+    finally:
+        if own:
+            pool.shutdown(cancel_futures=True)
+
+
+# ====== Файл тюнинга ======
+
+
+def write_tuning(path: str | Path, best: Scored, targets: Mapping[str, float]) -> None:
+    data = {
+        "tuning": asdict(best.candidate),
+        "targets": dict(targets),
+        "winrates": {d: round(r, 4) for d, r in best.winrates.items()},
+        "battles": best.battles,
+    }
+    Path(path).write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+def read_tuning(path: str | Path) -> dict[str, Any]:
+    """Пороги из файла тюнинга; ValueError, если файл не подходит к ArenaConfig."""
+    raw = json.loads(Path(path).read_text(encoding="utf-8"))
+    values = raw.get("tuning") if isinstance(raw, dict) else None
+    if not isinstance(values, dict) or not set(values) <= set(TUNING_FIELDS):
+        raise ValueError(f"{path}: ожидается объект 'tuning' с полями {TUNING_FIELDS}")
+    out: dict[str, Any] = {}
+    for name, value in values.items():
+        out[name] = tuple(value) if isinstance(value, list) else value
+    compile_policies(replace(ArenaConfig(), **out))  # проверка длин порогов
+    return out
+
+
+def load_tuning(path: str | Path) -> dict[str, Any]:
+    """Читает файл и делает его пороги значениями по умолчанию для новых арен."""
+    values = read_tuning(path)
+    set_ai_tuning(values)
+    return values
+
+
+def _parse_targets(items: Sequence[str] | None) -> dict[str, float]:
+    targets = dict(DEFAULT_TARGETS)
+    for item in items or ():
+        name, _, value = item.partition("=")
+        if name not in THRESHOLD_DIFFICULTIES or not value:
+            raise SystemExit(f"--target: ожидается сложность=доля, получено {item!r}")
+        targets[name] = float(value)
+    return targets
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.tuning", description=__doc__)
+    parser.add_argument("--out", default="ai_tuning.json", help="файл тюнинга (JSON)")
+    parser.add_argument("--equipment", default="equipment.json", help="каталог оружия/щитов")
+    parser.add_argument(
+        "--target", action="append", help="целевой винрейт игрока: сложность=доля (можно несколько)"
+    )
+    parser.add_argument("--candidates", type=int, default=81, help="кандидатов на первой ступени")
+    parser.add_argument("--pairs", type=int, default=12, help="пар сборок в оценке")
+    parser.add_argument("--min-battles", type=int, default=32, help="боёв на первой ступени")
+    parser.add_argument("--max-battles", type=int, default=2048, help="предел боёв на ступени")
+    parser.add_argument("--eta", type=int, default=3, help="во сколько раз режется ступень")
+    parser.add_argument("--seed", type=int, default=0, help="базовый seed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="процессов")
+    args = parser.parse_args(argv)
+
+    targets = _parse_targets(args.target)
+    load_equipment_from_json(args.equipment)
+    pairs = sample_pairs(args.pairs, args.seed)
+    base = ArenaConfig(telemetry="off")
+    candidates = [Candidate.of(base), *SearchSpace().sample(args.candidates - 1, args.seed)]
+    candidates = list(dict.fromkeys(candidates))
+    print(f"кандидатов: {len(candidates)}, пар сборок: {len(pairs)}", file=sys.stderr)
+    ranked = successive_halving(
+        candidates,
+        pairs,
+        targets,
+        min_battles=args.min_battles,
+        max_battles=args.max_battles,
+        eta=args.eta,
+        base_seed=args.seed,
+        config=base,
+        workers=args.workers,
+        equipment_path=args.equipment,
+    )
+    best = ranked[0]
+    write_tuning(args.out, best, targets)
+    rates = ", ".join(f"{d}={r:.3f}" for d, r in best.winrates.items())
+    print(f"готово: {rates} (потеря {best.loss:.5f}) → {args.out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
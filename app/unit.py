@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 import abc
-import math
 from dataclasses import dataclass
 from typing import Literal, Protocol, overload
 
 from app.classes import CLASS_REGISTRY, UnitClass, get_unit_class, register_unit_class
+from app.damage import damage_table
 from app.equipment import (
     Shield,
     Weapon,
@@ -15,12 +15,6 @@ from app.equipment import (
     register_weapon,
 )
 
-
-def _round_half_up(x: float) -> int:
-    """Математическое округление: 0.5 → вверх."""
-    return int(math.floor(x + 0.5))
-
-
 # Источник случайности.
 
 
@@ -37,17 +31,53 @@ class AttackContext:
     shield_efficiency_factor: float = 1.0
 
 
+_DEFAULT_CTX = AttackContext()
+
+
+_NO_ENERGY_NOTES = ("Недостаточно энергии для выстрела",)
+
+
 @dataclass(frozen=True, slots=True)
 class AttackOutcome:
     hit: bool
     energy_spent: int
     accuracy_roll: float
     weapon_slug: str
+    # Готовые текстовые заметки (если вызывающий их передал); см. rendered_notes().
     notes: tuple[str, ...] = ()
     raw_damage_roll: int = 0
     damage_before_shield: int = 0
     shield_absorbed: int = 0
     hull_damage: int = 0
+    # Числа для заметок: (accuracy, dmgx, ignore+, shield_eff*) и при попадании
+    # ещё (eff_ignore, nonignored, eff_shield, absorb_potential). None — не собирали.
+    trace: tuple[float, ...] | None = None
+
+    def rendered_notes(self) -> tuple[str, ...]:
+        """Заметки для отладки: переданные явно или собранные из trace при обращении."""
+        if self.notes or self.trace is None:
+            return self.notes
+        return self._render_notes(self.trace)
+
+    def _render_notes(self, t: tuple[float, ...]) -> tuple[str, ...]:
+        acc, dmgx, ignore_plus, shield_factor = t[:4]
+        notes = [f"accuracy: roll={self.accuracy_roll:.3f} vs acc={acc:.3f}"]
+        if dmgx != 1.0 or ignore_plus != 0.0 or shield_factor != 1.0:
+            notes.append(
+                f"ctx: dmgx={dmgx:.2f}, "
+                f"ignore+={ignore_plus:.2f}, "
+                f"shield_eff*={shield_factor:.2f}"
+            )
+        if len(t) > 4:
+            eff_ignore, nonignored, eff_shield, potential = t[4:]
+            notes.append(
+                f"dmg_roll={self.raw_damage_roll} → mod={self.damage_before_shield} | "
+                f"ignore={eff_ignore:.2f} nonignored={int(nonignored)} | "
+                f"shield_eff={eff_shield:.2f} "
+                f"absorb<=({int(potential)}) -> {self.shield_absorbed} | "
+                f"hull={self.hull_damage}"
+            )
+        return tuple(notes)
 
 
 @dataclass(slots=True)
@@ -131,15 +161,6 @@ class BaseUnit(abc.ABC):
     def mark_skill_used(self) -> None:
         self.skill_used = True
 
-    @staticmethod
-    def _clamp01(x: float) -> float:
-        """Обрезает значение к диапазону [0.0, 1.0]."""
-        if x < 0.0:
-            return 0.0
-        if x > 1.0:
-            return 1.0
-        return x
-
     def can_fire(self) -> bool:
         return self.energy >= self.weapon.energy_cost
 
@@ -150,62 +171,45 @@ class BaseUnit(abc.ABC):
         target: BaseUnit,
         rng: RandomSource,
         context: AttackContext,
-        notes_list: list[str],
-    ) -> tuple[int, int, int, int, tuple[str, ...]]:
+        trace: bool = True,
+    ) -> tuple[int, int, int, int, tuple[float, ...] | None]:
         """
-        Считает урон при попадании и обновляет заметки.
+        Считает урон при попадании; последним элементом — числа для заметок.
         """
         # Бросок базового урона по оружию.
         dmg_roll: int = rng.randint(self.weapon.dmg_min, self.weapon.dmg_max)
 
-        # Модификаторы урона: класс юнита и контекст.
-        modified_damage_f: float = (
-            float(dmg_roll) * self.unit_class.attack_mod * context.damage_multiplier
+        # Модификаторы класса/контекста, игнор и эффективность щита посчитаны
+        # заранее в таблице по броскам (app.damage); здесь — индекс и min() по щиту.
+        table = damage_table(
+            self.unit_class, self.weapon, target.unit_class, target.shield, context
         )
-        modified_damage: int = max(0, int(round(modified_damage_f)))
-
-        # Итоговый "игнор щита" [0..1]
-        eff_ignore: float = self._clamp01(self.weapon.shield_ignore + context.extra_shield_ignore)
-
-        # Итоговая эффективность щита цели [0..1]
-        eff_shield: float = self._clamp01(
-            target.shield.efficiency
-            * target.unit_class.shield_mod
-            * context.shield_efficiency_factor
-        )
-
-        # Делим урон: часть игнорирует щит, часть идёт на щит.
-        nonignored: int = int(round(modified_damage * (1.0 - eff_ignore)))
-        ignored_direct: int = modified_damage - nonignored
+        modified_damage, nonignored, shield_absorb_potential = table.row(dmg_roll)
 
-        # Щит может поглотить только долю nonignored и не больше текущего shield_hp.
-        shield_absorb_potential: int = _round_half_up(nonignored * eff_shield)
+        # Щит может поглотить только долю nonignored и не больше текущего shield_hp;
+        # остальное (и полностью игнорирующая часть) уходит в корпус.
         shield_absorbed: int = min(shield_absorb_potential, target.shield_hp)
+        hull_damage: int = modified_damage - shield_absorbed
 
-        # Что прошло в корпус (из неигнорируемой части) + полностью игнорирующая часть.
-        hull_from_nonignored: int = nonignored - shield_absorbed
-        hull_damage: int = hull_from_nonignored + ignored_direct
-
-        # Телеметрия для отладки.
-        telemetry_parts: list[str] = [
-            f"dmg_roll={dmg_roll} → mod={modified_damage} | ",
-            f"ignore={eff_ignore:.2f} nonignored={nonignored} | ",
-            f"shield_eff={eff_shield:.2f} ",
-            f"absorb<=({shield_absorb_potential}) -> {shield_absorbed} | ",
-            f"hull={hull_damage}",
-        ]
-        notes_list.append("".join(telemetry_parts))
-        notes: tuple[str, ...] = tuple(notes_list)
+        # Числа для отладочных заметок (AttackOutcome.notes); headless — не собираем.
+        hit_trace = (
+            (table.eff_ignore, nonignored, table.eff_shield, shield_absorb_potential)
+            if trace
+            else None
+        )
 
-        return dmg_roll, modified_damage, shield_absorbed, hull_damage, notes
+        return dmg_roll, modified_damage, shield_absorbed, hull_damage, hit_trace
 
     def basic_attack(
         self,
         target: BaseUnit,
         rng: RandomSource,
         ctx: AttackContext | None = None,
+        *,
+        trace: bool = True,
     ) -> AttackOutcome:
-        context = ctx or AttackContext()
+        """trace=False — не собирать числа для заметок (headless-режим, исход тот же)."""
+        context = ctx or _DEFAULT_CTX
 
         if not self.can_fire():
             return AttackOutcome(
@@ -213,24 +217,22 @@ class BaseUnit(abc.ABC):
                 energy_spent=0,
                 accuracy_roll=1.0,
                 weapon_slug=self.weapon.slug,
-                notes=("Недостаточно энергии для выстрела",),
+                notes=_NO_ENERGY_NOTES,
             )
 
         roll: float = rng.random()
         hit: bool = roll <= self.weapon.accuracy
 
-        notes_list: list[str] = [f"accuracy: roll={roll:.3f} vs acc={self.weapon.accuracy:.3f}"]
-        if (
-            context.damage_multiplier != 1.0
-            or context.extra_shield_ignore != 0.0
-            or context.shield_efficiency_factor != 1.0
-        ):
-            notes_list.append(
-                f"ctx: dmgx={context.damage_multiplier:.2f}, "
-                f"ignore+={context.extra_shield_ignore:.2f}, "
-                f"shield_eff*={context.shield_efficiency_factor:.2f}"
+        ctx_trace: tuple[float, ...] | None = (
+            (
+                self.weapon.accuracy,
+                context.damage_multiplier,
+                context.extra_shield_ignore,
+                context.shield_efficiency_factor,
             )
-        notes: tuple[str, ...] = tuple(notes_list)
+            if trace
+            else None
+        )
 
         if not hit:
             return AttackOutcome(
@@ -238,7 +240,7 @@ class BaseUnit(abc.ABC):
                 energy_spent=self.weapon.energy_cost,
                 accuracy_roll=roll,
                 weapon_slug=self.weapon.slug,
-                notes=notes,
+                trace=ctx_trace,
             )
 
         # Попадание: расчёт урона/щита.
@@ -247,12 +249,12 @@ class BaseUnit(abc.ABC):
             modified_damage,
             shield_absorbed,
             hull_damage,
-            notes,
+            hit_trace,
         ) = self._resolve_damage_on_hit(
             target=target,
             rng=rng,
             context=context,
-            notes_list=notes_list,
+            trace=trace,
         )
 
         return AttackOutcome(
@@ -260,7 +262,7 @@ class BaseUnit(abc.ABC):
             energy_spent=self.weapon.energy_cost,
             accuracy_roll=roll,
             weapon_slug=self.weapon.slug,
-            notes=notes,
+            trace=ctx_trace + hit_trace if ctx_trace and hit_trace else None,
             raw_damage_roll=dmg_roll,
             damage_before_shield=modified_damage,
             shield_absorbed=shield_absorbed,
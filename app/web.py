@@ -1,17 +1,34 @@
 from __future__ import annotations
 
 import secrets
+import sys
+import threading
 from collections.abc import Callable
 from functools import wraps
 from pathlib import Path
-from time import time
-from typing import Any, Literal, ParamSpec, TypedDict, TypeVar, cast
+from typing import Any, ParamSpec, TypedDict, TypeVar, cast
 from uuid import uuid4
 
-from flask import Blueprint, Request, abort, redirect, render_template, request, session, url_for
+from flask import (
+    Blueprint,
+    Request,
+    abort,
+    current_app,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
 from flask.typing import ResponseReturnValue
 
-from app.arena import Arena
+from app import expert
+from app.ai_cache import DECISIONS
+from app.arena import DIFFICULTIES, AIDifficulty, Arena
+from app.arena_cache import ArenaCache, ArenaReaper
+from app.arena_store import ArenaConflict, ArenaStore, MemoryArenaStore, make_arena_store
+from app.autoplay import PLAYER_POLICIES, TurnSummary, autoplay
 from app.classes import CLASS_REGISTRY, UnitClass, get_unit_class, register_unit_class
 from app.equipment import (
     SHIELD_REGISTRY,
@@ -20,6 +37,7 @@ from app.equipment import (
     get_weapon,
     load_equipment_from_json,
 )
+from app.speculation import PlayerAction, Speculator
 from app.stats import SessionStats, bump, dump, load_from
 from app.unit import AIUnit, PlayerUnit, create_ai, create_player
 
@@ -30,9 +48,61 @@ bp = Blueprint(
     static_folder="../static",
 )
 
-_ARENAS: dict[str, tuple[Arena, float]] = {}
 _ARENA_TTL = 30 * 60
 _ARENA_MAX = 1000
+_ARENAS = ArenaCache(ttl=_ARENA_TTL, max_size=_ARENA_MAX)
+_STORE: ArenaStore = MemoryArenaStore(_ARENAS)
+# Локи боёв по arena_id (полосами): load→ход→save одного боя в воркере идут по очереди.
+_BATTLE_LOCKS = tuple(threading.RLock() for _ in range(64))
+# Сколько раз повторить ход, если бой тем временем сохранил другой воркер.
+_CONFLICT_RETRIES = 3
+_REAPER: ArenaReaper | None = None
+# Потолок ходов игрока за один запрос автобоя (переопределяется AUTOPLAY_MAX_TURNS).
+AUTOPLAY_MAX_TURNS = 200
+# Спекулятивный ответ ИИ (app.speculation); None — выключен.
+_SPECULATOR: Speculator | None = None
+# Каталог для вытесненных строк лога (файл на бой); None — не сохранять.
+_LOG_SPILL_DIR: Path | None = None
+
+
+def init_arena_storage(
+    *,
+    ttl: float,
+    max_size: int,
+    sweep_interval: float,
+    sweep_batch: int,
+    parked_max: int = 0,
+    store: str = "memory",
+    store_url: str = "",
+    log_spill_dir: str = "",
+) -> ArenaReaper:
+    """
+    Настраивает хранилище боёв (memory | sqlite | kv) и запускает фоновую чистку
+    вместо чистки в запросах. parked_max — см. MemoryArenaStore.
+    """
+    global _REAPER, _STORE, _LOG_SPILL_DIR
+    if _REAPER is not None:
+        _REAPER.stop()
+    _ARENAS.ttl = ttl
+    _ARENAS.max_size = max_size
+    _ARENAS.sweep_per_call = 0
+    _STORE = make_arena_store(store, store_url, cache=_ARENAS, parked_max=parked_max)
+    _LOG_SPILL_DIR = Path(log_spill_dir) if log_spill_dir else None
+    if _LOG_SPILL_DIR is not None:
+        _LOG_SPILL_DIR.mkdir(parents=True, exist_ok=True)
+    reaper = ArenaReaper(_STORE, interval=sweep_interval, batch=sweep_batch)
+    reaper.start()
+    _REAPER = reaper
+    return reaper
+
+
+def init_speculation(*, workers: int) -> Speculator | None:
+    """Включает спекулятивный ответ ИИ с пулом на workers потоков; 0 — выключить."""
+    global _SPECULATOR
+    if _SPECULATOR is not None:
+        _SPECULATOR.close()
+    _SPECULATOR = Speculator(workers=workers) if workers > 0 else None
+    return _SPECULATOR
 
 
 def _result_of(arena: Arena) -> str | None:
@@ -131,24 +201,6 @@ def _ensure_sample_classes() -> None:
         )
 
 
-def _gc_arenas() -> None:
-    now = time()
-    # удалить по TTL
-    for aid, (_, ts) in list(_ARENAS.items()):
-        if now - ts > _ARENA_TTL:
-            _ARENAS.pop(aid, None)
-    # если всё еще много — подрежем самых старых
-    if len(_ARENAS) > _ARENA_MAX:
-        oldest = sorted(_ARENAS.items(), key=lambda kv: kv[1][1])[: len(_ARENAS) - _ARENA_MAX]
-        for aid, _ in oldest:
-            _ARENAS.pop(aid, None)
-
-
-def _touch(aid: str) -> None:
-    arena, _ = _ARENAS[aid]
-    _ARENAS[aid] = (arena, time())
-
-
 def _new_default_arena() -> Arena:
     _load_equipment_if_needed()
     _ensure_sample_classes()
@@ -183,68 +235,45 @@ def _new_default_arena() -> Arena:
     return arena
 
 
+def _attach_log_spill(aid: str, arena: Arena) -> None:
+    if _LOG_SPILL_DIR is not None:
+        arena.spill_log_to(_LOG_SPILL_DIR / f"{aid}.log")
+
+
 def _set_session_arena(arena: Arena) -> Arena:
-    _gc_arenas()
     aid = str(uuid4())
     session["arena_id"] = aid
-    _ARENAS[aid] = (arena, time())
+    _attach_log_spill(aid, arena)
+    _STORE.save(aid, arena)
+    if _SPECULATOR is not None:
+        _SPECULATOR.speculate(aid, arena)
     return arena
 
 
 def _get_session_arena() -> Arena:
-    """Вернуть арену из карты по session['arena_id']; создать дефолтную при отсутствии."""
-    _gc_arenas()
+    """Загрузить арену из хранилища по session['arena_id']; создать дефолтную при отсутствии."""
     aid = session.get("arena_id")
-    if isinstance(aid, str) and aid in _ARENAS:
-        arena, _ts = _ARENAS[aid]
-        # страхуемся: в редком случае арена есть, но не стартовала
-        if not arena.is_initialized:
-            arena = _new_default_arena()
-            _ARENAS[aid] = (arena, time())
-        else:
-            _touch(aid)
-        return arena
+    if isinstance(aid, str):
+        arena = _STORE.load(aid)
+        if arena is not None:
+            # страхуемся: в редком случае арена есть, но не стартовала
+            if not arena.is_initialized:
+                arena = _new_default_arena()
+                _STORE.save(aid, arena)
+            _attach_log_spill(aid, arena)
+            return arena
 
     return _set_session_arena(_new_default_arena())
 
 
-def _ensure_default_battle() -> Arena:
-    """Если бой не инициализирован поднимаем дефолт."""
-    _load_equipment_if_needed()
-    _ensure_sample_classes()
-
-    arena = Arena()
-
-    if arena.is_initialized:
-        return arena
-
-    p_class = get_unit_class("interceptor")
-    e_class = get_unit_class("destroyer")
-
-    try:
-        w_def = get_weapon("railgun_mk1")
-    except KeyError:
-        w_def = next(iter(WEAPON_REGISTRY.values()))  # любой доступный
-
-    try:
-        s_def = get_shield("shield_heavy")
-    except KeyError:
-        s_def = next(iter(SHIELD_REGISTRY.values()))  # любой доступный
-
-    player = create_player(
-        name="Alpha",
-        unit_class=p_class,
-        weapon=w_def,
-        shield=s_def,
-    )
-    enemy = create_ai(
-        name="Omega",
-        unit_class=e_class,
-        weapon=w_def,
-        shield=s_def,
-    )
-    arena.start(player=player, ai=enemy)
-    return arena
+def _save_session_arena(arena: Arena) -> None:
+    """Сохранить бой после хода (для общих хранилищ это запись в SQLite/KV)."""
+    aid = session.get("arena_id")
+    if isinstance(aid, str):
+        arena.flush_log()
+        _STORE.save(aid, arena)
+        if _SPECULATOR is not None:
+            _SPECULATOR.speculate(aid, arena)
 
 
 def _is_htmx(req: Request) -> bool:
@@ -261,11 +290,12 @@ def _ensure_csrf_token() -> str:
     return str(token)
 
 
-def _auto_ai(arena: Arena) -> None:
-    for _ in range(8):
-        if arena.is_finished or arena.turn == "player":
-            break
-        arena._ai_take_turn()
+def _auto_ai(arena: Arena, action: PlayerAction) -> None:
+    """Ответ ИИ на действие игрока: совпавшая догадка спекуляции или обычный ход."""
+    aid = session.get("arena_id")
+    if _SPECULATOR is not None and isinstance(aid, str):
+        _SPECULATOR.commit(aid, arena, action)
+    arena.run_ai(max_turns=8)
 
 
 @bp.app_context_processor
@@ -290,16 +320,38 @@ def require_csrf(view: Callable[P, R]) -> Callable[P, R]:  # noqa: UP047
     return wrapped
 
 
-def _render_fight(arena: Arena) -> ResponseReturnValue:
+def _with_battle(turn: Callable[[Arena], R]) -> R:
+    """
+    Загрузка боя сессии, ход и сохранение под локом боя: параллельные запросы
+    одного боя в воркере не перетирают ходы друг друга. Если бой между загрузкой
+    и сохранением записал другой воркер (ArenaConflict), ход повторяется на
+    свежей загрузке; не вышло за _CONFLICT_RETRIES попыток — 409.
+    """
+    for _ in range(_CONFLICT_RETRIES):
+        aid = session.get("arena_id")
+        key = aid if isinstance(aid, str) else ""
+        with _BATTLE_LOCKS[hash(key) % len(_BATTLE_LOCKS)]:
+            arena = _get_session_arena()
+            with arena.lock:
+                try:
+                    return turn(arena)
+                except ArenaConflict:
+                    continue
+    abort(409)
+
+
+def _render_fight(
+    arena: Arena, *, autoplay: list[TurnSummary] | None = None
+) -> ResponseReturnValue:
     """
     Универсальный рендер боя:
     если HTMX: отдать только панель боя (partial),
     иначе: полную страницу.
+    autoplay — сводка ходов автобоя (показывается в панели).
     """
     stats_dict = dump(load_from(session.get("stats")))
-    if _is_htmx(request):
-        return render_template("partials/fight_panel.html", arena=arena, stats=stats_dict)
-    return render_template("fight.html", arena=arena, stats=stats_dict)
+    template = "partials/fight_panel.html" if _is_htmx(request) else "fight.html"
+    return render_template(template, arena=arena, stats=stats_dict, autoplay=autoplay)
 
 
 def _build_player_from_selection(sel: Selection) -> PlayerUnit:
@@ -332,24 +384,58 @@ def fight() -> ResponseReturnValue:
 @require_csrf
 def fight_hit() -> ResponseReturnValue:
     """Ход игрока."""
-    arena = _get_session_arena()
-    if not arena.is_finished and arena.turn == "player":
-        arena.attack()
-        _auto_ai(arena)
-    _update_stats_if_finished(arena)
-    return _render_fight(arena)
+
+    def turn(arena: Arena) -> ResponseReturnValue:
+        if not arena.is_finished and arena.turn == "player":
+            arena.attack()
+            _auto_ai(arena, "attack")
+            _save_session_arena(arena)
+        _update_stats_if_finished(arena)
+        return _render_fight(arena)
+
+    return _with_battle(turn)
 
 
 @bp.post("/fight/pass-turn")
 @require_csrf
 def fight_pass() -> ResponseReturnValue:
     """Пропуск хода игроком."""
-    arena = _get_session_arena()
-    if not arena.is_finished and arena.turn == "player":
-        arena.pass_turn()
-        _auto_ai(arena)
-    _update_stats_if_finished(arena)
-    return _render_fight(arena)
+
+    def turn(arena: Arena) -> ResponseReturnValue:
+        if not arena.is_finished and arena.turn == "player":
+            arena.pass_turn()
+            _auto_ai(arena, "pass")
+            _save_session_arena(arena)
+        _update_stats_if_finished(arena)
+        return _render_fight(arena)
+
+    return _with_battle(turn)
+
+
+@bp.post("/fight/autoplay")
+@require_csrf
+def fight_autoplay() -> ResponseReturnValue:
+    """
+    Автобой: доигрывает бой (или turns ходов игрока) на сервере по политике игрока
+    policy (app.autoplay). Ходов за запрос — не больше AUTOPLAY_MAX_TURNS.
+    """
+    policy = request.form.get("policy", "attack").strip().lower()
+    if policy not in PLAYER_POLICIES:
+        abort(400)
+    cap = int(current_app.config.get("AUTOPLAY_MAX_TURNS", AUTOPLAY_MAX_TURNS))
+    raw_turns = request.form.get("turns", "").strip()
+    if raw_turns and not (raw_turns.isascii() and raw_turns.isdecimal()):
+        abort(400)
+    turns = min(int(raw_turns), cap) if raw_turns else cap
+
+    def turn(arena: Arena) -> ResponseReturnValue:
+        summary = autoplay(arena, policy=policy, max_turns=turns)
+        if summary:
+            _save_session_arena(arena)
+        _update_stats_if_finished(arena)
+        return _render_fight(arena, autoplay=summary)
+
+    return _with_battle(turn)
 
 
 @bp.post("/fight/end-fight")
@@ -374,12 +460,16 @@ def reset_stats() -> ResponseReturnValue:
 @require_csrf
 def fight_use_skill(slug: str) -> ResponseReturnValue:
     """Ход игрока с применением скилла."""
-    arena = _get_session_arena()
-    if not arena.is_finished and arena.turn == "player" and slug in {"overcharge", "emp"}:
-        arena.attack_with_player_skill(slug)
-        _auto_ai(arena)
-    _update_stats_if_finished(arena)
-    return _render_fight(arena)
+
+    def turn(arena: Arena) -> ResponseReturnValue:
+        if not arena.is_finished and arena.turn == "player" and slug in {"overcharge", "emp"}:
+            arena.attack_with_player_skill(slug)
+            _auto_ai(arena, cast(PlayerAction, slug))
+            _save_session_arena(arena)
+        _update_stats_if_finished(arena)
+        return _render_fight(arena)
+
+    return _with_battle(turn)
 
 
 @bp.get("/choose-hero", endpoint="choose_hero_form")
@@ -475,7 +565,7 @@ def choose_enemy_submit() -> ResponseReturnValue:
     shield_slug = request.form.get("shield", "")
     name = request.form.get("name", "").strip() or "Enemy"
     difficulty = request.form.get("difficulty", "normal").strip().lower()
-    if difficulty not in {"normal", "easy", "hard"}:
+    if difficulty not in DIFFICULTIES:
         difficulty = "normal"
 
     if unit_class_slug not in CLASS_REGISTRY:
@@ -518,12 +608,10 @@ def start_fight() -> ResponseReturnValue:
     arena = Arena()
 
     raw_diff = cast(str, session.get("difficulty", "normal")).lower()
-    if raw_diff == "easy":
-        diff_lit: Literal["easy", "normal", "hard"] = "easy"
-    elif raw_diff == "hard":
-        diff_lit = "hard"
-    else:
-        diff_lit = "normal"
+    diff_lit: AIDifficulty = "normal"
+    for level in DIFFICULTIES:
+        if level == raw_diff:
+            diff_lit = level
 
     arena.start(player=player, ai=ai, difficulty=diff_lit)
 
@@ -534,3 +622,20 @@ def start_fight() -> ResponseReturnValue:
 @bp.get("/healthz")
 def healthz() -> str:
     return "oK"
+
+
+@bp.get("/metrics")
+def metrics() -> ResponseReturnValue:
+    data: dict[str, Any] = {
+        "arenas": _STORE.stats(),
+        "ai_search": expert.METRICS.snapshot(),
+        "ai_cache": DECISIONS.snapshot(),
+    }
+    mcts = sys.modules.get("app.mcts")  # загружается с первым ходом mcts (нужен NumPy)
+    if mcts is not None:
+        data["ai_mcts"] = mcts.METRICS.snapshot()
+    if _SPECULATOR is not None:
+        data["ai_speculation"] = _SPECULATOR.metrics.snapshot()
+    if _REAPER is not None:
+        data["arenas"]["reaped"] = _REAPER.reaped
+    return jsonify(data)
@@ -0,0 +1,82 @@
+"""
+Бенчмарк сериализации боя: Arena.to_bytes/from_bytes против pickle и JSON.
+
+    python -m benchmarks.bench_codec
+"""
+
+from __future__ import annotations
+
+import json
+import pickle
+import timeit
+from collections.abc import Callable
+from typing import Any
+
+from app.arena import Arena
+from app.unit import create_ai, create_player
+
+N = 20_000
+
+
+def _arena() -> Arena:
+    arena = Arena()
+    arena.start(create_player(), create_ai(), difficulty="hard")
+    arena.attack()
+    arena._ai_take_turn()
+    return arena
+
+
+def _to_json(arena: Arena) -> bytes:
+    p, a = arena.player, arena.ai
+    data: dict[str, Any] = {
+        "turn": arena.turn,
+        "difficulty": arena.ai_difficulty,
+        "rng": arena.rng_state,
+        "cooldowns": arena.cooldowns,
+        "config": [
+            arena.config.energy_regen_per_turn,
+            arena.config.rng_seed,
+            arena.config.ai_skill_chance,
+            arena.config.overcharge_damage_mult,
+            arena.config.emp_shield_eff_factor,
+            arena.config.emp_extra_ignore,
+        ],
+        "units": [
+            {
+                "name": u.name,
+                "class": u.unit_class.name,
+                "weapon": u.weapon.slug,
+                "shield": u.shield.slug,
+                "hull": u.hull,
+                "energy": u.energy,
+                "shield_hp": u.shield_hp,
+                "skill_used": u.skill_used,
+            }
+            for u in (p, a)
+        ],
+    }
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def _bench(label: str, dump: Callable[[], bytes], load: Callable[[bytes], object]) -> None:
+    blob = dump()
+    t_dump = timeit.timeit(dump, number=N) / N * 1e6
+    t_load = timeit.timeit(lambda: load(blob), number=N) / N * 1e6
+    print(f"{label:<10} {len(blob):>6} B   dump {t_dump:6.2f} µs   load {t_load:6.2f} µs")
+
+
+def main() -> None:
+    arena = _arena()
+    print(f"{'format':<10} {'size':>8}   {'':>16}   ({N} итераций)")
+    _bench("to_bytes", arena.to_bytes, Arena.from_bytes)
+    _bench(
+        "pickle",
+        lambda: pickle.dumps(arena, protocol=pickle.HIGHEST_PROTOCOL),
+        pickle.loads,
+    )
+    # JSON только сериализует состояние; сборка Arena при загрузке не учитывается.
+    _bench("json", lambda: _to_json(arena), json.loads)
+
+
+if __name__ == "__main__":
+    main()
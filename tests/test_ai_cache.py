@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+
+import pytest
+
+from app import expert
+from app.ai_cache import DECISIONS, DecisionCache
+from app.arena import Arena, ArenaConfig
+from app.classes import UnitClass
+from app.equipment import Shield, Weapon
+from app.unit import AIUnit, PlayerUnit, create_ai, create_player
+
+_CLS = UnitClass(name="T", hull_max=40, energy_max=60, shield_mod=1.0, attack_mod=1.0)
+_GUN = Weapon(
+    slug="t_gun",
+    name="G",
+    kind="railgun",
+    dmg_min=10,
+    dmg_max=10,
+    energy_cost=10,
+    shield_ignore=0.0,
+    accuracy=1.0,
+)
+_SHIELD = Shield(slug="t_shield", name="S", capacity=20, efficiency=0.5, regen=0)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache() -> Iterator[None]:
+    DECISIONS.clear()
+    yield
+    DECISIONS.clear()
+
+
+def _units() -> tuple[PlayerUnit, AIUnit]:
+    return (
+        create_player(name="P", unit_class=_CLS, weapon=_GUN, shield=_SHIELD),
+        create_ai(name="A", unit_class=_CLS, weapon=_GUN, shield=_SHIELD),
+    )
+
+
+def _expert_to_move(seed: int, *, hull: int = 15, deadline: float = 1.0) -> Arena:
+    player, ai = _units()
+    player.hull, player.shield_hp, ai.energy = hull, 0, 40
+    arena = Arena(ArenaConfig(rng_seed=seed, telemetry="off"))
+    arena.expert_deadline = deadline
+    arena.start(player, ai, difficulty="expert")
+    arena._swap_turn()
+    return arena
+
+
+def test_repeated_state_skips_the_search_in_another_arena() -> None:
+    first = _expert_to_move(seed=1)
+    first._ai_take_turn()
+    searched = expert.METRICS.snapshot()["moves"]
+
+    # другой бой (и сид) в том же состоянии: ход из кэша, поиска нет
+    second = _expert_to_move(seed=2)
+    second._ai_take_turn()
+    assert expert.METRICS.snapshot()["moves"] == searched
+    assert not first.player.is_alive and not second.player.is_alive
+
+    stats = DECISIONS.snapshot()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_fallback_moves_are_not_cached() -> None:
+    _expert_to_move(seed=1, hull=40, deadline=0.0)._ai_take_turn()
+    assert len(DECISIONS) == 0
+    assert DECISIONS.snapshot()["misses"] == 1
+
+
+def test_quantized_keys_and_lru_eviction() -> None:
+    cache = DecisionCache(max_size=2, quantum=5)
+    arena = _expert_to_move(seed=1, hull=15)
+    k15 = cache.key(arena)
+    arena.player.hull = 19
+    assert cache.key(arena) == k15  # 15 и 19 — одна корзина по 5
+    arena.player.hull = 20
+    k20 = cache.key(arena)
+    assert k20 != k15
+    arena.cooldowns["ai"]["emp"] = 1
+    k_cd = cache.key(arena)
+    assert k_cd != k20
+
+    cache.put(k15, "overcharge")
+    cache.put(k20, "attack")
+    assert cache.get(k15) == "overcharge"  # k20 становится самым старым
+    cache.put(k_cd, "pass")
+    assert cache.get(k20) is None
+    assert cache.snapshot()["evictions"] == 1
+
+    with pytest.raises(ValueError):
+        cache.configure(max_size=10, quantum=0)
+
+
+def test_key_tracks_skill_use_and_rules_not_seed() -> None:
+    cache = DecisionCache()
+    arena = _expert_to_move(seed=1)
+    key = cache.key(arena)
+    arena.ai.skill_used = True  # доигровки mcts от этого зависят
+    assert cache.key(arena) != key
+    arena.ai.skill_used = False
+    arena.player.skill_used = True
+    assert cache.key(arena) != key
+    arena.player.skill_used = False
+
+    other = _expert_to_move(seed=2)  # другой сид и свой объект конфига
+    assert other.config is not arena.config
+    assert cache.key(other) == key
+    assert cache.key(arena.fork()) == key  # у копии телеметрия off
+    changed = Arena(ArenaConfig(rng_seed=1, overcharge_damage_mult=2.0, telemetry="off"))
+    changed.start(arena.player, arena.ai, difficulty="expert")
+    changed._swap_turn()
+    assert cache.key(changed) != key
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from app import telemetry
+from app.arena import Arena, ArenaConfig
+from app.journal import BattleEvent
+from app.unit import create_ai, create_player
+
+_SCRIPT = [
+    BattleEvent("attack"),
+    BattleEvent("skill", "emp"),
+    BattleEvent("pass"),
+    BattleEvent("skill", "overcharge"),
+] + [BattleEvent("attack")] * 200
+
+
+def _arena(seed: int) -> Arena:
+    arena = Arena(ArenaConfig(rng_seed=seed, ai_skill_chance=0.4))
+    arena.start(create_player(), create_ai(), difficulty="hard")
+    return arena
+
+
+def _state(arena: Arena) -> tuple[object, ...]:
+    p, a = arena.player, arena.ai
+    cds = arena.cooldowns
+    return (p.hull, p.energy, p.shield_hp, a.hull, a.energy, a.shield_hp, arena.rng_state, cds)
+
+
+def test_run_matches_single_calls() -> None:
+    for seed in range(6):
+        batch = _arena(seed)
+        outcomes = batch.run(_SCRIPT, ai_replies=True)
+
+        manual = _arena(seed)
+        for event in _SCRIPT:
+            if manual.is_finished:
+                break
+            manual.act(event)
+            while not manual.is_finished and manual.turn == "ai":
+                manual._ai_take_turn()
+
+        assert _state(batch) == _state(manual)
+        assert batch.log == manual.log
+        assert batch.journal is not None and manual.journal is not None
+        assert batch.journal.events == manual.journal.events
+        assert len(outcomes) == len(batch.journal)
+        assert batch.is_finished  # после конца боя остаток сценария не разыгрывается
+
+
+def test_every_turn_goes_through_one_pipeline() -> None:
+    arena = _arena(3)
+    arena.run([BattleEvent("skill", "emp")])
+    kinds = [r[0] for r in arena.records]
+    # скилл игрока — тот же конвейер, что и выстрел: снимки и КД
+    assert kinds.count(telemetry.SNAP) == 3
+    assert arena.cooldowns["player"]["emp"] == 1
+    assert arena.turn == "ai"
+
+    assert len(arena.run_ai()) == 1
+    assert arena.turn == "player"
+    assert arena.run_ai() == []
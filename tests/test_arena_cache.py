@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+from flask import Flask
+
+from app import create_app, web
+from app.arena import Arena
+from app.arena_cache import ArenaCache, ArenaReaper
+from app.web import bp as web_bp
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_hit_miss_and_ttl_expiry() -> None:
+    clock = FakeClock()
+    cache = ArenaCache(ttl=10, max_size=100, clock=clock)
+    arena = Arena()
+    cache.put("a", arena)
+
+    assert cache.get("a") is arena
+    assert cache.get("nope") is None
+
+    clock.now = 9  # touch продлевает жизнь
+    assert cache.get("a") is arena
+    clock.now = 18
+    assert cache.get("a") is arena
+    clock.now = 29
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (3, 2, 1)
+    assert stats["size"] == 0
+
+
+def test_lru_eviction_keeps_recently_used() -> None:
+    cache = ArenaCache(ttl=100, max_size=2, clock=FakeClock())
+    a, b, c = Arena(), Arena(), Arena()
+    cache.put("a", a)
+    cache.put("b", b)
+    cache.get("a")  # теперь "b" самая старая
+    cache.put("c", c)
+
+    assert "b" not in cache
+    assert cache.get("a") is a
+    assert cache.get("c") is c
+    assert cache.stats()["evictions"] == 1
+
+
+def test_sweep_is_bounded_and_amortized() -> None:
+    clock = FakeClock()
+    cache = ArenaCache(ttl=5, max_size=1000, clock=clock)
+    for i in range(50):
+        cache.put(str(i), Arena())
+
+    clock.now = 10
+    assert cache.sweep(limit=20) == 20
+    assert len(cache) == 30
+
+    # обычные вызовы попутно снимают протухшие записи порциями
+    cache.put("fresh", Arena())
+    assert 1 < len(cache) < 31
+    cache.sweep()
+    assert len(cache) == 1
+    assert "fresh" in cache
+
+
+def test_metrics_endpoint_reports_cache_counters() -> None:
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.register_blueprint(web_bp)
+    with app.test_client() as c:
+        c.get("/fight")
+        c.get("/fight")
+        data = c.get("/metrics").get_json()
+
+    assert data["arenas"]["hits"] >= 1
+    assert {"moves", "avg_depth", "nodes_per_second"} <= data["ai_search"].keys()
+    assert {"hits", "misses", "hit_rate"} <= data["ai_cache"].keys()
+    assert data["arenas"]["size"] >= 1
+
+
+def test_reaper_expires_in_background_with_bounded_ticks() -> None:
+    clock = FakeClock()
+    cache = ArenaCache(ttl=5, max_size=1000, clock=clock, sweep_per_call=0)
+    for i in range(10):
+        cache.put(str(i), Arena())
+    clock.now = 10
+
+    reaper = ArenaReaper(cache, interval=0.01, batch=3)
+    assert reaper.tick() == 3
+    assert len(cache) == 7
+
+    reaper.start()
+    try:
+        deadline = time.monotonic() + 2.0
+        while len(cache) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        reaper.stop()
+
+    assert len(cache) == 0
+    assert reaper.reaped == 10
+    assert not reaper.running
+
+
+def test_create_app_wires_reaper_from_config(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ARENA_TTL", "120")
+    monkeypatch.setenv("ARENA_MAX", "50")
+    monkeypatch.setenv("ARENA_SWEEP_INTERVAL", "0.5")
+    app = create_app()
+    reaper = app.extensions["arena_reaper"]
+    try:
+        assert reaper.running
+        assert reaper.interval == 0.5
+        assert web._ARENAS.ttl == 120
+        assert web._ARENAS.max_size == 50
+        assert web._ARENAS.sweep_per_call == 0
+    finally:
+        reaper.stop()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from dataclasses import replace
+
+import pytest
+
+from app.arena import Arena, ArenaConfig
+from app.unit import create_ai, create_player
+
+
+def _arena(seed: int | None = 11) -> Arena:
+    arena = Arena(ArenaConfig(rng_seed=seed, ai_skill_chance=0.3))
+    arena.start(create_player(), create_ai(), difficulty="hard")
+    arena.attack()
+    arena._ai_take_turn()
+    arena.cooldowns["ai"]["emp"] = 2
+    arena.player.skill_used = True
+    return arena
+
+
+def test_roundtrip_restores_state_and_config() -> None:
+    arena = _arena()
+    clone = Arena.from_bytes(arena.to_bytes())
+
+    assert clone.config == arena.config
+    assert clone.turn == arena.turn
+    assert clone.ai_difficulty == "hard"
+    assert clone.rng_state == arena.rng_state
+    assert clone.cooldowns == arena.cooldowns
+    assert clone.player == arena.player
+    assert clone.ai == arena.ai
+    # предметы и классы берутся из реестров по ссылке, а не копируются
+    assert clone.player.weapon is arena.player.weapon
+    assert clone.log == ()
+
+
+def test_restored_battle_continues_identically() -> None:
+    arena = _arena()
+    clone = Arena.from_bytes(arena.to_bytes())
+    for _ in range(6):
+        if arena.is_finished:
+            break
+        arena.attack()
+        clone.attack()
+        arena._ai_take_turn()
+        clone._ai_take_turn()
+    assert clone.player == arena.player
+    assert clone.ai == arena.ai
+    assert clone.rng_state == arena.rng_state
+
+
+def test_blob_is_compact_and_keeps_unseeded_config() -> None:
+    arena = _arena(seed=None)
+    blob = arena.to_bytes()
+    assert len(blob) < 200
+    assert Arena.from_bytes(blob).config.rng_seed is None
+
+
+def test_log_tail_is_optional() -> None:
+    arena = _arena()
+    tail = arena.ui_log[-3:]
+    assert Arena.from_bytes(arena.to_bytes(log_tail=3)).log == tail
+    assert len(arena.to_bytes(log_tail=3)) > len(arena.to_bytes())
+
+
+def test_unregistered_item_is_rejected() -> None:
+    arena = _arena()
+    arena.player.weapon = replace(arena.player.weapon, slug="homebrew", name="Homebrew")
+    with pytest.raises(ValueError):
+        arena.to_bytes()
+
+
+def test_unknown_version_is_rejected() -> None:
+    blob = bytearray(_arena().to_bytes())
+    blob[0] = 99
+    with pytest.raises(ValueError):
+        Arena.from_bytes(bytes(blob))
+    with pytest.raises(ValueError):
+        Arena.from_bytes(b"")
+
+
+def test_tuned_ai_thresholds_survive_roundtrip() -> None:
+    default_blob = _arena().to_bytes()
+    cfg = ArenaConfig(
+        rng_seed=3,
+        ai_emp_shield_threshold=(20, 10, 2),
+        ai_overcharge_hull_pct=(0.2, 0.3, 0.5),
+        ai_emp_min_energy=30,
+    )
+    arena = Arena(cfg)
+    arena.start(create_player(), create_ai(), difficulty="hard")
+    blob = arena.to_bytes()
+
+    assert Arena.from_bytes(blob).config == cfg
+    # пороги по умолчанию в блоб не пишутся
+    assert len(blob) > len(default_blob)
+    assert Arena.from_bytes(default_blob).config.ai_emp_shield_threshold == (15, 8, 1)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import pytest
+
+from app import telemetry
+from app.arena import TELEMETRY_LEVELS, Arena, ArenaConfig, TelemetryLevel, config_from_env
+from app.unit import create_ai, create_player
+
+
+def _battle(level: TelemetryLevel, seed: int) -> Arena:
+    arena = Arena(ArenaConfig(rng_seed=seed, ai_skill_chance=0.4, telemetry=level))
+    arena.start(create_player(), create_ai(), difficulty="hard")
+    for i in range(40):
+        if arena.is_finished:
+            break
+        if i % 5 == 3:
+            arena.attack_with_player_skill("emp")
+        elif i % 7 == 6:
+            arena.pass_turn()
+        else:
+            arena.attack()
+        arena._ai_take_turn()
+    return arena
+
+
+def _state(arena: Arena) -> tuple[object, ...]:
+    p, a = arena.player, arena.ai
+    return (p.hull, p.energy, p.shield_hp, a.hull, a.energy, a.shield_hp, arena.rng_state)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_levels_give_identical_battles(seed: int) -> None:
+    states = {_state(_battle(level, seed)) for level in TELEMETRY_LEVELS}
+    assert len(states) == 1
+
+
+def test_off_and_log_levels_skip_telemetry() -> None:
+    off = _battle("off", 1)
+    assert off.records == ()
+    assert off.ui_log == ()
+
+    log = _battle("log", 1)
+    full = _battle("full", 1)
+    assert not any(r[0] == telemetry.SNAP for r in log.records)
+    assert log.ui_log == full.ui_log
+
+
+def test_basic_attack_without_trace_has_no_notes() -> None:
+    p, a = create_player(), create_ai()
+
+    class Rng:
+        def random(self) -> float:
+            return 0.0
+
+        def randint(self, lo: int, hi: int) -> int:
+            return lo
+
+    quiet = p.basic_attack(a, rng=Rng(), trace=False)
+    loud = p.basic_attack(a, rng=Rng())
+    assert quiet.trace is None and quiet.rendered_notes() == ()
+    assert (quiet.hull_damage, quiet.shield_absorbed) == (loud.hull_damage, loud.shield_absorbed)
+    assert loud.rendered_notes()
+
+
+def test_level_survives_codec_and_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    arena = _battle("log", 2)
+    assert Arena.from_bytes(arena.to_bytes()).config.telemetry == "log"
+
+    monkeypatch.setenv("ARENA_TELEMETRY", "off")
+    assert config_from_env().telemetry == "off"
+    monkeypatch.setenv("ARENA_TELEMETRY", "loud")
+    assert config_from_env().telemetry == "full"
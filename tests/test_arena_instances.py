@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import threading
+
+from app.arena import Arena, ArenaConfig, SingletonArena
+from app.classes import UnitClass
+from app.equipment import Shield, Weapon
+from app.unit import create_ai, create_player
+
+
+def _mk_arena() -> Arena:
+    uclass = UnitClass(name="T", hull_max=400, energy_max=50, shield_mod=1.0, attack_mod=1.0)
+    weapon = Weapon(
+        slug="w",
+        name="W",
+        kind="laser",
+        dmg_min=5,
+        dmg_max=5,
+        energy_cost=3,
+        shield_ignore=0.0,
+        accuracy=1.0,
+    )
+    shield = Shield(slug="s", name="S", capacity=0, efficiency=0.0, regen=0)
+    arena = Arena(ArenaConfig(ai_skill_chance=0.0))
+    arena.start(
+        player=create_player(name="P", unit_class=uclass, weapon=weapon, shield=shield),
+        ai=create_ai(name="E", unit_class=uclass, weapon=weapon, shield=shield),
+    )
+    return arena
+
+
+def test_arenas_are_independent() -> None:
+    a1 = _mk_arena()
+    a2 = _mk_arena()
+    assert a1 is not a2
+
+    a1.attack()
+
+    assert a1.turn == "ai"
+    assert a2.turn == "player"
+    assert a1.ai.hull == a1.ai.hull_max - 5
+    assert a2.ai.hull == a2.ai.hull_max
+    assert len(a2.log) == 1
+
+
+def test_singleton_shim_is_opt_in() -> None:
+    assert SingletonArena() is SingletonArena()
+    assert Arena() is not Arena()
+
+
+def test_parallel_battles_do_not_share_state() -> None:
+    arenas = [_mk_arena() for _ in range(8)]
+    barrier = threading.Barrier(len(arenas))
+
+    def play(arena: Arena) -> None:
+        barrier.wait()
+        for _ in range(20):
+            with arena.lock:
+                arena.attack()
+
+    threads = [threading.Thread(target=play, args=(a,)) for a in arenas]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 20 ходов: по 10 выстрелов каждой стороны, по 5 урона.
+    for arena in arenas:
+        assert arena.player.hull == arena.player.hull_max - 50
+        assert arena.ai.hull == arena.ai.hull_max - 50
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import pytest
+
+from app.arena import Arena, ArenaConfig
+from app.journal import BattleEvent, BattleJournal
+from app.unit import create_ai, create_player
+
+
+def _state(arena: Arena) -> tuple[object, ...]:
+    p, a = arena.player, arena.ai
+    return (
+        (p.hull, p.energy, p.shield_hp, p.skill_used),
+        (a.hull, a.energy, a.shield_hp, a.skill_used),
+        arena.turn,
+        arena.rng_state,
+        repr(arena.cooldowns),
+    )
+
+
+def _play(arena: Arena, turns: int = 12) -> list[tuple[object, ...]]:
+    """Играет бой как веб-слой и возвращает состояние после каждого события."""
+    arena.start(create_player(), create_ai(), difficulty="hard")
+    states = [_state(arena)]
+    actions = ["attack", "pass", "emp", "attack", "overcharge", "attack"]
+    for i in range(turns):
+        if arena.is_finished:
+            break
+        action = actions[i % len(actions)]
+        if action == "attack":
+            arena.attack()
+        elif action == "pass":
+            arena.pass_turn()
+        else:
+            arena.attack_with_player_skill(action)
+        states.append(_state(arena))
+        if not arena.is_finished:
+            arena._ai_take_turn()
+            states.append(_state(arena))
+    return states
+
+
+def test_replay_rebuilds_unseeded_battle_exactly() -> None:
+    arena = Arena(ArenaConfig(rng_seed=None, ai_skill_chance=0.5))
+    states = _play(arena)
+    assert arena.journal is not None
+
+    clone = Arena.replay(arena.journal)
+    assert _state(clone) == _state(arena)
+    assert clone.log == arena.log
+    assert clone.journal is not None and len(clone.journal) == len(arena.journal)
+
+    for k in (0, 1, 5, len(states) - 1):
+        assert _state(Arena.replay(arena.journal, upto=k)) == states[k]
+
+
+def test_only_top_level_actions_are_recorded() -> None:
+    arena = Arena(ArenaConfig(rng_seed=4, ai_skill_chance=0.0))
+    arena.start(create_player(), create_ai())
+    arena.attack()
+    arena._ai_take_turn()  # внутри вызывает attack()/pass_turn()
+    arena.attack_with_player_skill("nope")  # неизвестный скилл ничего не меняет
+
+    assert arena.journal is not None
+    assert arena.journal.events == (BattleEvent("attack"), BattleEvent("ai_turn"))
+
+
+def test_checkpoints_shorten_replay_and_survive_serialization() -> None:
+    arena = Arena(ArenaConfig(rng_seed=9, ai_skill_chance=0.3))
+    arena.checkpoint_every = 3
+    states = _play(arena)
+    journal = arena.journal
+    assert journal is not None
+    assert sorted(journal.checkpoints) == list(range(3, len(journal) + 1, 3))
+
+    blob = journal.to_bytes()
+    restored = BattleJournal.from_bytes(blob)
+    assert restored.events == journal.events
+    assert restored.checkpoints == journal.checkpoints
+    for k in (3, 4, len(journal)):
+        assert _state(Arena.replay(restored, upto=k)) == states[k]
+
+    with pytest.raises(ValueError):
+        Arena.replay(restored, upto=len(journal) + 1)
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import socketserver
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from app import create_app, web
+from app.arena import Arena, ArenaConfig
+from app.arena_cache import ArenaCache
+from app.arena_store import (
+    ArenaConflict,
+    ArenaStore,
+    KeyValueArenaStore,
+    MemoryArenaStore,
+    RespClient,
+    SqliteArenaStore,
+    make_arena_store,
+)
+from app.unit import create_ai, create_player
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    """Локальная замена Redis: GET/SET [EX n]/DEL/SELECT и WATCH/MULTI/EXEC поверх RESP."""
+
+    def handle(self) -> None:
+        data: dict[bytes, bytes] = self.server.data  # type: ignore[attr-defined]
+        lock: threading.Lock = self.server.lock  # type: ignore[attr-defined]
+        watched: dict[bytes, bytes | None] = {}
+        queued: list[list[bytes]] | None = None
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            argc = int(line[1:])
+            args = []
+            for _ in range(argc):
+                size = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(size + 2)[:-2])
+            cmd = args[0].upper()
+            if queued is not None and cmd != b"EXEC":
+                queued.append(args)
+                reply = b"+QUEUED\r\n"
+            elif cmd == b"WATCH":
+                watched[args[1]] = data.get(args[1])
+                reply = b"+OK\r\n"
+            elif cmd == b"UNWATCH":
+                watched.clear()
+                reply = b"+OK\r\n"
+            elif cmd == b"MULTI":
+                queued = []
+                reply = b"+OK\r\n"
+            elif cmd == b"EXEC":
+                with lock:
+                    if any(data.get(k) != v for k, v in watched.items()):
+                        reply = b"*-1\r\n"
+                    else:
+                        replies = [_apply(data, c) for c in queued or []]
+                        reply = b"*%d\r\n" % len(replies) + b"".join(replies)
+                queued = None
+                watched.clear()
+            else:
+                with lock:
+                    reply = _apply(data, args)
+            self.wfile.write(reply)
+
+
+def _apply(data: dict[bytes, bytes], args: list[bytes]) -> bytes:
+    cmd = args[0].upper()
+    if cmd == b"GET":
+        value = data.get(args[1])
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+    if cmd == b"SET":
+        data[args[1]] = args[2]
+        return b"+OK\r\n"
+    if cmd == b"DEL":
+        return b":%d\r\n" % int(data.pop(args[1], None) is not None)
+    return b"+OK\r\n"
+
+
+@pytest.fixture()
+def kv_server() -> Iterator[tuple[str, int]]:
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespHandler)
+    server.daemon_threads = True
+    server.data = {}  # type: ignore[attr-defined]
+    server.lock = threading.Lock()  # type: ignore[attr-defined]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[0], server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def _started_arena() -> Arena:
+    arena = Arena(ArenaConfig(rng_seed=3, ai_skill_chance=0.0))
+    arena.start(create_player(), create_ai(), difficulty="hard")
+    arena.attack()
+    return arena
+
+
+def _player_to_move() -> Arena:
+    arena = _started_arena()
+    arena.run_ai()
+    return arena
+
+
+def _pass_round(arena: Arena) -> None:
+    """Пропуск хода игроком и ответ ИИ (как /fight/pass-turn)."""
+    if not arena.is_finished and arena.turn == "player":
+        arena.pass_turn()
+        arena.run_ai()
+
+
+def _check_roundtrip(writer: ArenaStore, reader: ArenaStore) -> None:
+    arena = _started_arena()
+    writer.save("a1", arena)
+
+    loaded = reader.load("a1")
+    assert loaded is not None
+    assert loaded.turn == arena.turn
+    assert loaded.ai.hull == arena.ai.hull
+    assert loaded.player.energy == arena.player.energy
+    assert loaded.ai_difficulty == "hard"
+    assert loaded.rng_state == arena.rng_state
+
+    assert reader.load("missing") is None
+    writer.delete("a1")
+    assert reader.load("a1") is None
+    assert reader.stats()["hits"] == 1
+
+
+def test_memory_store_roundtrip() -> None:
+    store = MemoryArenaStore(ArenaCache(ttl=60, max_size=10))
+    _check_roundtrip(store, store)
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path: Path) -> None:
+    path = tmp_path / "arenas.sqlite3"
+    # два «воркера» на одном файле
+    _check_roundtrip(SqliteArenaStore(path, ttl=60), SqliteArenaStore(path, ttl=60))
+
+
+def test_sqlite_store_sweeps_expired(tmp_path: Path) -> None:
+    now = [0.0]
+    store = SqliteArenaStore(tmp_path / "a.sqlite3", ttl=10, clock=lambda: now[0])
+    for i in range(5):
+        store.save(str(i), _started_arena())
+    now[0] = 100.0
+    assert store.sweep(limit=3) == 3
+    assert store.stats()["size"] == 2
+    assert store.load("4") is None
+
+
+def test_kv_store_against_local_stand_in(kv_server: tuple[str, int]) -> None:
+    host, port = kv_server
+    writer = KeyValueArenaStore(RespClient(host, port), ttl=60)
+    reader = make_arena_store(
+        "kv", f"redis://{host}:{port}/0", cache=ArenaCache(ttl=60, max_size=1)
+    )
+    _check_roundtrip(writer, reader)
+
+
+def test_unknown_store_kind_rejected() -> None:
+    with pytest.raises(ValueError):
+        make_arena_store("nope", "", cache=ArenaCache(ttl=1, max_size=1))
+
+
+def test_memory_store_parks_evicted_battles() -> None:
+    now = [0.0]
+    store = MemoryArenaStore(ArenaCache(ttl=60, max_size=2, clock=lambda: now[0]), parked_max=2)
+    arenas = {str(i): _started_arena() for i in range(5)}
+    for aid, arena in arenas.items():
+        store.save(aid, arena)
+    stats = store.stats()
+    assert (stats["size"], stats["parked"], stats["parked_evictions"]) == (2, 2, 1)
+    assert store.load("0") is None  # вытеснен и из таблицы
+
+    original = arenas["2"]
+    loaded = store.load("2")
+    assert loaded is not None and loaded is not original
+    assert (loaded.player, loaded.ai) == (original.player, original.ai)
+    assert (loaded.turn, loaded.cooldowns) == (original.turn, original.cooldowns)
+    assert loaded.rng_state == original.rng_state
+    assert loaded.ui_tail(8) == original.ui_tail(8)
+    assert store.load("2") is loaded  # снова в кэше
+    assert store.stats()["unparked"] == 1
+
+    now[0] = 100.0
+    assert store.sweep() == 4  # два в кэше и два в таблице
+    assert store.stats()["parked"] == 0
+
+
+def test_sqlite_workers_do_not_lose_turns(tmp_path: Path) -> None:
+    path = tmp_path / "arenas.sqlite3"
+    SqliteArenaStore(path, ttl=60).save("a1", _player_to_move())
+    conflicts: list[str] = []
+
+    def play(store: SqliteArenaStore) -> None:
+        for _ in range(4):
+            while True:
+                arena = store.load("a1")
+                assert arena is not None
+                _pass_round(arena)
+                try:
+                    store.save("a1", arena)
+                    break
+                except ArenaConflict as exc:
+                    conflicts.append(str(exc))
+
+    # два «воркера» на одном файле, по два потока в каждом
+    workers = [SqliteArenaStore(path, ttl=60) for _ in range(2)]
+    threads = [threading.Thread(target=play, args=(w,)) for w in workers for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    twin = _player_to_move()
+    for _ in range(16):
+        _pass_round(twin)
+    final = SqliteArenaStore(path, ttl=60).load("a1")
+    assert final is not None
+    assert (final.player, final.ai) == (twin.player, twin.ai)
+    assert final.rng_state == twin.rng_state
+    assert set(conflicts) <= {"a1"}
+
+
+def test_kv_store_rejects_a_stale_save(kv_server: tuple[str, int]) -> None:
+    host, port = kv_server
+    one = KeyValueArenaStore(RespClient(host, port), ttl=60)
+    two = KeyValueArenaStore(RespClient(host, port), ttl=60)
+    one.save("a1", _player_to_move())
+    first, second = one.load("a1"), two.load("a1")
+    assert first is not None and second is not None
+    _pass_round(first)
+    _pass_round(second)
+
+    two.save("a1", second)
+    with pytest.raises(ArenaConflict):
+        one.save("a1", first)  # ход второго воркера не перетирается
+    fresh = one.load("a1")
+    assert fresh is not None and fresh.rng_state == second.rng_state
+    _pass_round(fresh)
+    one.save("a1", fresh)
+
+
+def test_web_turns_on_sqlite_store_are_not_lost(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("ARENA_STORE", "sqlite")
+    monkeypatch.setenv("ARENA_STORE_URL", str(tmp_path / "web.sqlite3"))
+    app = create_app()
+    app.config.update(TESTING=True, SECRET_KEY="test")
+    try:
+        with app.test_client() as client:
+            client.get("/fight")
+            with client.session_transaction() as sess:
+                aid, token = sess["arena_id"], sess["_csrf_token"]
+        web._STORE.save(aid, _player_to_move())
+        statuses: list[int] = []
+
+        def play() -> None:
+            with app.test_client() as c:
+                with c.session_transaction() as sess:
+                    sess["arena_id"], sess["_csrf_token"] = aid, token
+                for _ in range(3):
+                    r = c.post(
+                        "/fight/pass-turn", headers={"X-CSRF-Token": token, "HX-Request": "true"}
+                    )
+                    statuses.append(r.status_code)
+
+        threads = [threading.Thread(target=play) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        twin = _player_to_move()
+        for _ in range(12):
+            _pass_round(twin)
+        final = web._STORE.load(aid)
+        assert statuses == [200] * 12
+        assert final is not None
+        assert (final.player, final.ai) == (twin.player, twin.ai)
+        assert final.rng_state == twin.rng_state
+    finally:
+        app.extensions["arena_reaper"].stop()
+        # остальные тесты ждут хранилище по умолчанию
+        web.init_arena_storage(ttl=1800, max_size=1000, sweep_interval=5.0, sweep_batch=256).stop()
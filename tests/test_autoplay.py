@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from flask.testing import FlaskClient
+
+from app import create_app
+from app.arena import Arena, ArenaConfig
+from app.autoplay import autoplay, player_move
+from app.classes import get_unit_class
+from app.equipment import get_shield, get_weapon, load_equipment_from_json
+from app.unit import create_ai, create_player
+
+EQUIPMENT = Path(__file__).resolve().parent.parent / "equipment.json"
+
+
+def _arena(seed: int = 4) -> Arena:
+    load_equipment_from_json(EQUIPMENT)
+    arena = Arena(ArenaConfig(rng_seed=seed, telemetry="off"))
+    arena.start(
+        create_player(
+            name="P",
+            unit_class=get_unit_class("interceptor"),
+            weapon=get_weapon("railgun_mk1"),
+            shield=get_shield("shield_heavy"),
+        ),
+        create_ai(
+            name="A",
+            unit_class=get_unit_class("destroyer"),
+            weapon=get_weapon("railgun_mk1"),
+            shield=get_shield("shield_light"),
+        ),
+        difficulty="hard",
+    )
+    return arena
+
+
+@pytest.fixture()
+def client() -> Iterator[FlaskClient]:
+    app = create_app()
+    app.config.update(TESTING=True, SECRET_KEY="test", AUTOPLAY_MAX_TURNS=50)
+    with app.test_client() as c:
+        yield c
+
+
+def _csrf(client: FlaskClient) -> dict[str, str]:
+    client.get("/fight")
+    with client.session_transaction() as s:
+        return {"X-CSRF-Token": str(s.get("_csrf_token") or ""), "HX-Request": "true"}
+
+
+def test_autoplay_finishes_and_replays_from_journal() -> None:
+    arena = _arena()
+    summary = autoplay(arena, policy="hard", max_turns=200)
+    assert arena.is_finished
+    assert [t.turn for t in summary] == list(range(1, len(summary) + 1))
+    assert summary[-1].p_hull == arena.player.hull
+    assert summary[-1].a_hull == arena.ai.hull
+    assert {t.action for t in summary} & {"emp", "overcharge"}  # зеркальный hard жмёт скиллы
+
+    journal = arena.journal
+    assert journal is not None
+    clone = Arena.replay(journal)
+    assert clone.player == arena.player and clone.ai == arena.ai
+
+
+def test_turn_cap_and_attack_policy() -> None:
+    arena = _arena()
+    summary = autoplay(arena, policy="attack", max_turns=3)
+    assert len(summary) == 3
+    assert not arena.is_finished and arena.turn == "player"
+    arena.player.energy = 0
+    assert player_move(arena, "attack") == "pass"
+
+
+def test_autoplay_endpoint(client: FlaskClient) -> None:
+    headers = _csrf(client)
+    r = client.post("/fight/autoplay", data={"turns": "2"}, headers=headers)
+    assert r.status_code == 200
+    assert "Автобой: 2 ход(ов)" in r.data.decode("utf-8")
+
+    r = client.post("/fight/autoplay", data={"policy": "hard", "turns": "999"}, headers=headers)
+    html = r.data.decode("utf-8")
+    assert r.status_code == 200
+    assert any(x in html for x in ("Победа", "Поражение", "Ничья"))
+
+    assert (
+        client.post("/fight/autoplay", data={"policy": "cheat"}, headers=headers).status_code == 400
+    )
+    for bad in ("-1", "²", "٣"):  # надстрочные и не-ASCII цифры — тоже 400, а не 500
+        r = client.post("/fight/autoplay", data={"turns": bad}, headers=headers)
+        assert r.status_code == 400
+    assert client.post("/fight/autoplay").status_code == 400  # без CSRF
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app import telemetry
+from app.arena import Arena, ArenaConfig
+from app.telemetry import BattleLog
+from app.unit import create_ai, create_player
+
+
+def _snap(i: int) -> telemetry.Record:
+    return (telemetry.SNAP, f"s{i}", "player", *range(12))
+
+
+def test_ring_is_bounded_and_tails_are_ordered() -> None:
+    log = BattleLog(capacity=4)
+    for i in range(10):
+        log.append(telemetry.text(f"line {i}"))
+        log.append(_snap(i))
+
+    assert len(log) == 4
+    assert log.tail(2) == (telemetry.text("line 9"), _snap(9))
+    assert log.visible_tail(3) == ("line 7", "line 8", "line 9")
+    assert log.visible_tail(0) == ()
+    assert log.visible_tail(100)[-1] == "line 9"
+
+
+def test_overflow_spills_to_file_in_order(tmp_path: Path) -> None:
+    path = tmp_path / "battle.log"
+    log = BattleLog(capacity=3, spill_path=path, spill_batch=2)
+    for i in range(8):
+        log.append(telemetry.text(f"line {i}"))
+
+    # вытеснено 5 строк, в файл ушли полные пачки по 2
+    assert path.read_text(encoding="utf-8").splitlines() == [f"line {i}" for i in range(4)]
+    log.flush()
+    assert path.read_text(encoding="utf-8").splitlines() == [f"line {i}" for i in range(5)]
+    assert log.spilled == 5
+    assert log.visible_tail(3) == ("line 5", "line 6", "line 7")
+
+
+def test_capacity_must_be_positive() -> None:
+    with pytest.raises(ValueError):
+        BattleLog(capacity=0)
+
+
+def test_long_battle_keeps_arena_log_bounded(tmp_path: Path) -> None:
+    class SmallLogArena(Arena):
+        log_capacity = 16
+
+    arena = SmallLogArena(ArenaConfig(rng_seed=2, ai_skill_chance=0.0))
+    arena.spill_log_to(tmp_path / "a.log")
+    arena.start(create_player(), create_ai())
+    for _ in range(20):
+        arena.pass_turn()
+
+    assert len(arena.log) == 16
+    assert arena.ui_tail(3) == arena.ui_log[-3:]
+    arena.flush_log()
+    spilled = (tmp_path / "a.log").read_text(encoding="utf-8").splitlines()
+    assert spilled[0] == "Бой начался. Ход игрока."
+    assert len(spilled) + len(arena.log) == 1 + 20 * 5  # пропуск: запись, 3 снимка, смена хода
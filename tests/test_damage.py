@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import math
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from app.classes import UnitClass
+from app.damage import damage_table
+from app.equipment import Shield, Weapon, get_weapon, load_equipment_from_json
+from app.unit import AttackContext
+
+_W = Weapon(
+    slug="t_rail",
+    name="R",
+    kind="railgun",
+    dmg_min=7,
+    dmg_max=19,
+    energy_cost=10,
+    shield_ignore=0.25,
+    accuracy=0.8,
+)
+_S = Shield(slug="t_shield", name="S", capacity=30, efficiency=0.7, regen=2)
+_ATT = UnitClass(name="A", hull_max=50, energy_max=30, shield_mod=1.0, attack_mod=1.2)
+_DEF = UnitClass(name="D", hull_max=50, energy_max=30, shield_mod=1.1, attack_mod=1.0)
+
+EQUIPMENT = Path(__file__).resolve().parent.parent / "equipment.json"
+
+
+def _reference(roll: int, ctx: AttackContext, shield_hp: int) -> tuple[int, int, int]:
+    """Прежняя арифметика _resolve_damage_on_hit, по шагам."""
+    modified = max(0, int(round(float(roll) * _ATT.attack_mod * ctx.damage_multiplier)))
+    eff_ignore = min(1.0, max(0.0, _W.shield_ignore + ctx.extra_shield_ignore))
+    eff_shield = min(1.0, max(0.0, _S.efficiency * _DEF.shield_mod * ctx.shield_efficiency_factor))
+    nonignored = int(round(modified * (1.0 - eff_ignore)))
+    absorbed = min(int(math.floor(nonignored * eff_shield + 0.5)), shield_hp)
+    return modified, absorbed, nonignored - absorbed + (modified - nonignored)
+
+
+@pytest.mark.parametrize(
+    "ctx",
+    [
+        AttackContext(),
+        AttackContext(damage_multiplier=1.5),
+        AttackContext(extra_shield_ignore=0.3, shield_efficiency_factor=0.5),
+        AttackContext(extra_shield_ignore=2.0, shield_efficiency_factor=3.0),
+    ],
+)
+def test_table_matches_formula(ctx: AttackContext) -> None:
+    table = damage_table(_ATT, _W, _DEF, _S, ctx)
+    for roll in range(_W.dmg_min - 2, _W.dmg_max + 3):  # вне диапазона — расчётом
+        for shield_hp in (0, 1, 5, 12, 30):
+            assert table.hit(roll, shield_hp) == _reference(roll, ctx, shield_hp)
+
+
+def test_tables_are_cached_and_dropped_on_catalog_reload() -> None:
+    ctx = AttackContext()
+    table = damage_table(_ATT, _W, _DEF, _S, ctx)
+    assert damage_table(_ATT, _W, _DEF, _S, AttackContext()) is table
+    # равный по значению, но другой предмет — своя таблица
+    assert damage_table(_ATT, replace(_W), _DEF, _S, ctx) is not table
+
+    load_equipment_from_json(EQUIPMENT)
+    assert damage_table(_ATT, _W, _DEF, _S, ctx) is not table
+    laser = get_weapon("laser_mk1")
+    assert damage_table(_ATT, laser, _DEF, _S, ctx).dmg_min == laser.dmg_min
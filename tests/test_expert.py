@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+from app import expert
+from app.arena import Arena, ArenaConfig
+from app.classes import UnitClass, get_unit_class
+from app.equipment import Shield, Weapon, get_shield, get_weapon, load_equipment_from_json
+from app.expert import ExpectimaxAI
+from app.unit import AIUnit, PlayerUnit, create_ai, create_player
+
+EQUIPMENT = Path(__file__).resolve().parent.parent / "equipment.json"
+
+_CLS = UnitClass(name="T", hull_max=40, energy_max=60, shield_mod=1.0, attack_mod=1.0)
+_GUN = Weapon(
+    slug="t_gun",
+    name="G",
+    kind="railgun",
+    dmg_min=10,
+    dmg_max=10,
+    energy_cost=10,
+    shield_ignore=0.0,
+    accuracy=1.0,
+)
+_SHIELD = Shield(slug="t_shield", name="S", capacity=20, efficiency=0.5, regen=0)
+
+
+def _units() -> tuple[PlayerUnit, AIUnit]:
+    return (
+        create_player(name="P", unit_class=_CLS, weapon=_GUN, shield=_SHIELD),
+        create_ai(name="A", unit_class=_CLS, weapon=_GUN, shield=_SHIELD),
+    )
+
+
+def _ai_to_move(player: PlayerUnit, ai: AIUnit) -> Arena:
+    arena = Arena(ArenaConfig(rng_seed=1, telemetry="off"))
+    arena.start(player, ai, difficulty="expert")
+    arena._swap_turn()
+    return arena
+
+
+def test_search_finds_the_killing_blow() -> None:
+    # обычный выстрел снимает 10, Overcharge — 15: добить можно только скиллом
+    player, ai = _units()
+    player.hull, player.shield_hp, ai.energy = 15, 0, 40
+    arena = _ai_to_move(player, ai)
+
+    result = ExpectimaxAI(player, ai, arena.config).search(
+        ExpectimaxAI.state_of(arena), deadline=1.0, max_depth=3
+    )
+    assert result.move == "overcharge"
+    assert result.value == 1.0
+    assert result.depth == 1  # исход решён — углубляться незачем
+
+    arena.expert_deadline = 1.0
+    arena._ai_take_turn()
+    assert not player.is_alive
+
+
+def test_missed_deadline_falls_back_to_hard_policy() -> None:
+    player, ai = _units()
+    player.shield_hp, ai.energy = 20, 40
+    arena = _ai_to_move(player, ai)
+    arena.expert_deadline = 0.0
+    before = expert.METRICS.snapshot()
+
+    result = expert.engine_for(arena).choose(arena, deadline=0.0, max_depth=8)
+    # hard жмёт EMP по щиту игрока
+    assert (result.move, result.depth) == ("emp", 0)
+    after = expert.METRICS.snapshot()
+    assert after["fallbacks"] == before["fallbacks"] + 1
+    assert after["moves"] == before["moves"] + 1
+
+
+def test_concurrent_searches_share_the_table_without_waiting() -> None:
+    player, ai = _units()
+    player.shield_hp, ai.energy = 20, 40
+    arena = _ai_to_move(player, ai)
+    engine = ExpectimaxAI(player, ai, arena.config)
+    alone = engine.search(ExpectimaxAI.state_of(arena), deadline=1.0, max_depth=4)
+    engine = ExpectimaxAI(player, ai, arena.config)
+
+    done: list[expert.SearchResult] = []
+    workers = [
+        threading.Thread(
+            target=lambda: done.append(engine.choose(arena, deadline=1.0, max_depth=4))
+        )
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=5.0)
+    # ни один поиск не ждёт соседа и не уходит в пороговую политику
+    assert len(done) == 4
+    assert all((r.move, r.depth, r.value) == (alone.move, 4, alone.value) for r in done)
+
+
+def test_search_respects_deadline_and_reuses_table() -> None:
+    player, ai = _units()
+    ai.energy = 40
+    arena = _ai_to_move(player, ai)
+    engine = ExpectimaxAI(player, ai, arena.config)
+    state = ExpectimaxAI.state_of(arena)
+
+    first = engine.search(state, deadline=0.002, max_depth=60)
+    assert first.elapsed < 0.05
+    assert 1 <= first.depth < 60
+    # тот же ход снова: узлы уже в таблице транспозиций, глубина не меньше
+    again = engine.search(state, deadline=0.002, max_depth=60)
+    assert again.depth >= first.depth
+    assert engine.cached_states > 0
+
+
+def test_expert_battle_replays_from_journal() -> None:
+    load_equipment_from_json(EQUIPMENT)
+    player = create_player(
+        name="P",
+        unit_class=get_unit_class("interceptor"),
+        weapon=get_weapon("laser_mk1"),
+        shield=get_shield("shield_basic"),
+    )
+    ai = create_ai(
+        name="A",
+        unit_class=get_unit_class("destroyer"),
+        weapon=get_weapon("railgun_mk1"),
+        shield=get_shield("shield_light"),
+    )
+    arena = Arena(ArenaConfig(rng_seed=9, telemetry="off"))
+    arena.start(player, ai, difficulty="expert")
+    for _ in range(30):
+        if arena.is_finished:
+            break
+        arena.attack()
+        arena.run_ai()
+
+    journal = arena.journal
+    assert journal is not None
+    assert any(event.kind == "ai_move" for event in journal)
+    clone = Arena.replay(journal)
+    assert clone.player == arena.player
+    assert clone.ai == arena.ai
+    assert clone.rng_state == arena.rng_state
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app import mcts  # noqa: E402
+from app.arena import Arena, ArenaConfig  # noqa: E402
+from app.classes import UnitClass, get_unit_class  # noqa: E402
+from app.equipment import (  # noqa: E402
+    Shield,
+    Weapon,
+    get_shield,
+    get_weapon,
+    load_equipment_from_json,
+)
+from app.unit import AIUnit, PlayerUnit, create_ai, create_player  # noqa: E402
+
+EQUIPMENT = Path(__file__).resolve().parent.parent / "equipment.json"
+
+_CLS = UnitClass(name="T", hull_max=40, energy_max=60, shield_mod=1.0, attack_mod=1.0)
+_GUN = Weapon(
+    slug="t_gun",
+    name="G",
+    kind="railgun",
+    dmg_min=10,
+    dmg_max=10,
+    energy_cost=10,
+    shield_ignore=0.0,
+    accuracy=1.0,
+)
+_SHIELD = Shield(slug="t_shield", name="S", capacity=20, efficiency=0.5, regen=0)
+
+
+def _units() -> tuple[PlayerUnit, AIUnit]:
+    return (
+        create_player(name="P", unit_class=_CLS, weapon=_GUN, shield=_SHIELD),
+        create_ai(name="A", unit_class=_CLS, weapon=_GUN, shield=_SHIELD),
+    )
+
+
+def _ai_to_move(player: PlayerUnit, ai: AIUnit, seed: int | None = 1) -> Arena:
+    arena = Arena(ArenaConfig(rng_seed=seed, telemetry="off"))
+    arena.start(player, ai, difficulty="mcts")
+    arena._swap_turn()
+    return arena
+
+
+def test_playouts_find_the_killing_blow() -> None:
+    # обычный выстрел снимает 10, Overcharge — 15: добить можно только скиллом,
+    # а ответный выстрел игрока добьёт ИИ
+    player, ai = _units()
+    player.hull, player.shield_hp, ai.energy = 15, 0, 40
+    ai.hull, ai.shield_hp = 5, 0
+    arena = _ai_to_move(player, ai)
+
+    result = mcts.search(arena, iterations=12, batch=16, time_budget=0.0, deterministic=True)
+    assert not result.fallback
+    assert result.move == "overcharge"
+    assert result.stats["overcharge"].mean == 1.0
+    assert result.playouts == 12 * 16
+
+    arena.mcts_deterministic = True
+    arena._ai_take_turn()
+    assert not player.is_alive
+
+
+def test_deterministic_mode_is_seeded_from_config() -> None:
+    def run(seed: int | None) -> mcts.MCTSResult:
+        player, ai = _units()
+        ai.energy = 40
+        return mcts.search(
+            _ai_to_move(player, ai, seed),
+            iterations=10,
+            batch=8,
+            time_budget=0.0,
+            deterministic=True,
+        )
+
+    first, again = run(3), run(3)
+    assert first.move == again.move
+    assert first.stats == again.stats
+    with pytest.raises(ValueError):
+        run(None)
+
+
+@pytest.mark.parametrize("n_workers", [8, 16, 32])
+def test_every_root_move_is_visited_on_many_cores(
+    monkeypatch: pytest.MonkeyPatch, n_workers: int
+) -> None:
+    monkeypatch.setattr(mcts, "workers", lambda: n_workers)
+    player, ai = _units()
+    ai.energy = 60
+    arena = _ai_to_move(player, ai)
+    assert len(mcts.legal_moves(arena)) == 4
+
+    result = mcts.search(arena, iterations=24, batch=4, time_budget=0.0, deterministic=True)
+    assert not result.fallback
+    assert set(result.stats) == {"attack", "emp", "overcharge", "pass"}
+    assert all(s.playouts > 0 for s in result.stats.values())
+    assert result.iterations == 24
+
+
+def test_deterministic_move_does_not_depend_on_core_count(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def run(n_workers: int) -> mcts.MCTSResult:
+        monkeypatch.setattr(mcts, "workers", lambda: n_workers)
+        player, ai = _units()
+        ai.energy = 60
+        return mcts.search(
+            _ai_to_move(player, ai), iterations=24, batch=4, time_budget=0.0, deterministic=True
+        )
+
+    one, many = run(1), run(8)
+    assert one.move == many.move
+    assert one.stats == many.stats
+
+
+def test_exhausted_budget_falls_back_to_hard_policy() -> None:
+    player, ai = _units()
+    player.shield_hp, ai.energy = 20, 40
+    arena = _ai_to_move(player, ai)
+    before = mcts.METRICS.snapshot()
+
+    result = mcts.search(arena, iterations=1000, batch=32, time_budget=0.0)
+    # hard жмёт EMP по щиту игрока
+    assert result.fallback
+    assert result.move == "emp"
+    after = mcts.METRICS.snapshot()
+    assert after["fallbacks"] == before["fallbacks"] + 1
+    assert after["moves"] == before["moves"] + 1
+
+
+def test_only_legal_moves_are_searched() -> None:
+    player, ai = _units()
+    ai.energy = 5  # не на что стрелять — остаётся только пасс
+    arena = _ai_to_move(player, ai)
+    assert mcts.legal_moves(arena) == ["pass"]
+    result = mcts.search(arena, iterations=8, batch=8, time_budget=1.0)
+    assert (result.move, result.playouts, result.fallback) == ("pass", 0, False)
+
+
+def test_skill_needs_only_its_own_energy_cost() -> None:
+    # как в expert: хватает на Overcharge (20), но не на EMP (25)
+    player, ai = _units()
+    ai.energy = 20
+    arena = _ai_to_move(player, ai)
+    assert mcts.legal_moves(arena) == ["attack", "overcharge", "pass"]
+
+
+def test_mcts_battle_replays_from_journal() -> None:
+    load_equipment_from_json(EQUIPMENT)
+    player = create_player(
+        name="P",
+        unit_class=get_unit_class("interceptor"),
+        weapon=get_weapon("laser_mk1"),
+        shield=get_shield("shield_basic"),
+    )
+    ai = create_ai(
+        name="A",
+        unit_class=get_unit_class("destroyer"),
+        weapon=get_weapon("railgun_mk1"),
+        shield=get_shield("shield_light"),
+    )
+    arena = Arena(ArenaConfig(rng_seed=9, telemetry="off"))
+    arena.mcts_iterations, arena.mcts_batch = 8, 8
+    arena.start(player, ai, difficulty="mcts")
+    for _ in range(30):
+        if arena.is_finished:
+            break
+        arena.attack()
+        arena.run_ai()
+
+    journal = arena.journal
+    assert journal is not None
+    assert any(event.kind == "ai_move" for event in journal)
+    clone = Arena.replay(journal)
+    assert clone.player == arena.player
+    assert clone.ai == arena.ai
+    assert clone.rng_state == arena.rng_state
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from dataclasses import replace
+
+import pytest
+
+from app.arena import Arena, ArenaConfig
+from app.classes import UnitClass
+from app.equipment import Shield, Weapon
+from app.odds import OddsSolver, arena_odds, solver_for
+from app.unit import AIUnit, PlayerUnit, create_ai, create_player
+
+_LASER = Weapon(
+    slug="t_laser",
+    name="L",
+    kind="laser",
+    dmg_min=6,
+    dmg_max=11,
+    energy_cost=8,
+    shield_ignore=0.15,
+    accuracy=0.8,
+)
+_SHIELD = Shield(slug="t_shield", name="S", capacity=20, efficiency=0.7, regen=2)
+
+
+def _player(weapon: Weapon = _LASER) -> PlayerUnit:
+    cls = UnitClass(name="P", hull_max=40, energy_max=30, shield_mod=1.1, attack_mod=1.0)
+    return create_player(name="P", unit_class=cls, weapon=weapon, shield=_SHIELD)
+
+
+def _ai(weapon: Weapon = _LASER) -> AIUnit:
+    cls = UnitClass(name="A", hull_max=50, energy_max=40, shield_mod=0.9, attack_mod=1.2)
+    return create_ai(name="A", unit_class=cls, weapon=weapon, shield=_SHIELD)
+
+
+def _arena(player: PlayerUnit, ai: AIUnit, difficulty: str = "normal") -> Arena:
+    arena = Arena(ArenaConfig(ai_skill_chance=0.3, telemetry="off"))
+    arena.start(player, ai, difficulty=difficulty)  # type: ignore[arg-type]
+    return arena
+
+
+def test_coin_flip_one_shot_is_exact() -> None:
+    # игрок убивает с одного попадания с шансом 1/2, ИИ не попадает никогда
+    cannon = replace(_LASER, dmg_min=500, dmg_max=500, accuracy=0.5, shield_ignore=1.0)
+    blank = replace(_LASER, accuracy=0.0)
+    player, ai = _player(cannon), _ai(blank)
+    solver = OddsSolver(player, ai, max_turns=10)
+    arena = _arena(player, ai)
+
+    odds = solver.odds(OddsSolver.state_of(arena))
+    assert odds.win == pytest.approx(1 - 0.5**5, abs=1e-15)  # 5 выстрелов игрока за 10 полуходов
+    assert odds.loss == 0.0
+    assert odds.draw == pytest.approx(0.5**5, abs=1e-15)
+
+
+@pytest.mark.parametrize("difficulty", ["easy", "hard"])
+def test_matches_batch_simulation(difficulty: str) -> None:
+    np = pytest.importorskip("numpy")
+    from app.sim import simulate
+
+    arena = _arena(_player(), _ai(), difficulty)
+    odds = arena_odds(arena)
+    n = 200_000
+    res = simulate(_player(), _ai(), n, difficulty=difficulty, config=arena.config, rng=5)
+    sigma = float(np.sqrt(odds.win * (1 - odds.win) / n))
+    assert res.player_wins / n == pytest.approx(odds.win, abs=4 * sigma)
+    assert odds.win + odds.loss == pytest.approx(1.0, abs=1e-9)
+
+
+def test_odds_follow_the_battle_and_reuse_cache() -> None:
+    arena = _arena(_player(), _ai(), "hard")
+    first = arena_odds(arena)
+    solver = solver_for(arena)
+    states = solver.cached_states
+    assert arena_odds(arena) is first
+    assert solver.cached_states == states
+
+    # бой продолжается — решатель тот же, часть переходов уже посчитана
+    while not arena.is_finished:
+        if arena.turn == "player":
+            arena.attack()
+        else:
+            arena._ai_take_turn()
+        odds = arena_odds(arena)
+        assert 0.0 <= odds.win <= 1.0
+        assert odds.win + odds.loss + odds.draw == pytest.approx(1.0)
+    assert solver_for(arena) is solver
+    assert arena_odds(arena).win == float(arena.player.is_alive)
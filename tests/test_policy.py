@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from dataclasses import replace
+
+import pytest
+
+from app.arena import Arena, ArenaConfig
+from app.classes import UnitClass
+from app.equipment import Shield, Weapon
+from app.odds import OddsSolver
+from app.policy import compile_policies
+from app.unit import AIUnit, PlayerUnit, create_ai, create_player
+
+_CLS = UnitClass(name="T", hull_max=40, energy_max=60, shield_mod=1.0, attack_mod=1.0)
+_LASER = Weapon(
+    slug="t_laser",
+    name="L",
+    kind="laser",
+    dmg_min=5,
+    dmg_max=5,
+    energy_cost=10,
+    shield_ignore=0.0,
+    accuracy=1.0,
+)
+_SHIELD = Shield(slug="t_shield", name="S", capacity=20, efficiency=0.6, regen=0)
+
+
+def _ai_turn(cfg: ArenaConfig, difficulty: str, *, hull: int, shield: int) -> Arena:
+    player = create_player(name="P", unit_class=_CLS, weapon=_LASER, shield=_SHIELD)
+    ai = create_ai(name="A", unit_class=_CLS, weapon=_LASER, shield=_SHIELD)
+    arena = Arena(replace(cfg, ai_skill_chance=0.0, telemetry="off"))
+    arena.start(player, ai, difficulty=difficulty)  # type: ignore[arg-type]
+    player.hull, player.shield_hp, ai.energy = hull, shield, 50
+    arena._swap_turn()
+    arena._ai_take_turn()
+    return arena
+
+
+def test_policies_compile_once_per_config() -> None:
+    cfg = ArenaConfig()
+    table = compile_policies(cfg)
+    assert compile_policies(replace(cfg)) is table
+    assert table["hard"].over_hull(40) == 18
+    assert table["easy"].emp_energy == 25
+
+    with pytest.raises(ValueError):
+        compile_policies(ArenaConfig(ai_emp_shield_threshold=(1, 2)))
+
+
+def test_hard_finishes_with_overcharge_by_its_own_threshold() -> None:
+    # 17/40 ≈ 42%: ниже порога hard (45%), выше normal (35%)
+    hard = _ai_turn(ArenaConfig(), "hard", hull=17, shield=0)
+    normal = _ai_turn(ArenaConfig(), "normal", hull=17, shield=0)
+    assert hard.cooldowns["ai"]["overcharge"] == 1
+    assert normal.cooldowns["ai"]["overcharge"] == 0
+
+
+def test_thresholds_come_from_config() -> None:
+    shy = ArenaConfig(ai_emp_shield_threshold=(99, 99, 99))
+    assert _ai_turn(ArenaConfig(), "hard", hull=40, shield=12).cooldowns["ai"]["emp"] == 1
+    assert _ai_turn(shy, "hard", hull=40, shield=12).cooldowns["ai"]["emp"] == 0
+
+    greedy = ArenaConfig(ai_emp_min_energy=60)  # энергии ИИ (50) не хватает на порог
+    assert _ai_turn(greedy, "hard", hull=40, shield=12).cooldowns["ai"]["emp"] == 0
+
+
+def test_solver_and_arena_share_the_policy() -> None:
+    cfg = ArenaConfig(ai_overcharge_hull_pct=(0.1, 0.2, 0.9))
+    player: PlayerUnit = create_player(name="P", unit_class=_CLS, weapon=_LASER, shield=_SHIELD)
+    ai: AIUnit = create_ai(name="A", unit_class=_CLS, weapon=_LASER, shield=_SHIELD)
+    arena = Arena(cfg)
+    arena.start(player, ai, difficulty="hard")
+    solver = OddsSolver(player, ai, difficulty="hard", config=cfg)
+    assert solver._policy is arena._policy() is compile_policies(cfg)["hard"]
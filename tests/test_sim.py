@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.arena import Arena, ArenaConfig  # noqa: E402
+from app.classes import UnitClass  # noqa: E402
+from app.equipment import Shield, Weapon  # noqa: E402
+from app.sim import simulate  # noqa: E402
+from app.unit import AIUnit, PlayerUnit, create_ai, create_player  # noqa: E402
+
+_LASER = Weapon(
+    slug="t_laser",
+    name="L",
+    kind="laser",
+    dmg_min=6,
+    dmg_max=11,
+    energy_cost=8,
+    shield_ignore=0.15,
+    accuracy=0.8,
+)
+_SHIELD = Shield(slug="t_shield", name="S", capacity=20, efficiency=0.7, regen=2)
+
+
+def _player() -> PlayerUnit:
+    cls = UnitClass(name="P", hull_max=40, energy_max=30, shield_mod=1.1, attack_mod=1.0)
+    return create_player(name="P", unit_class=cls, weapon=_LASER, shield=_SHIELD)
+
+
+def _ai() -> AIUnit:
+    cls = UnitClass(name="A", hull_max=50, energy_max=40, shield_mod=0.9, attack_mod=1.2)
+    return create_ai(name="A", unit_class=cls, weapon=_LASER, shield=_SHIELD)
+
+
+class _Script:
+    """Броски по номеру полухода: все random() внутри полухода дают одно число."""
+
+    def __init__(self, seed: int) -> None:
+        gen = np.random.default_rng(seed)
+        self.u = gen.random(2000)
+        self.pick = gen.integers(0, 2, 2000)
+        self.t = 0
+
+    # --- интерфейс RandomSource для Arena
+    def random(self, size: int | None = None) -> object:
+        if size is None:
+            return float(self.u[self.t])
+        return np.full(size, self.u[self.t])
+
+    def randint(self, a: int, b: int) -> int:
+        return b if self.pick[self.t] else a
+
+    # --- интерфейс BatchRandom для app.sim: integers — последний бросок полухода
+    def integers(self, low: int, high: int, size: int, *, endpoint: bool) -> object:
+        value = high if self.pick[self.t] else low
+        self.t += 1
+        return np.full(size, value, dtype=np.int64)
+
+
+def _arena_run(cfg: ArenaConfig, difficulty: str, seed: int, max_turns: int) -> tuple[int, ...]:
+    arena = Arena(cfg)
+    arena.start(_player(), _ai(), difficulty=difficulty)  # type: ignore[arg-type]
+    script = _Script(seed)
+    arena._rng = script
+    turns = 0
+    while not arena.is_finished and turns < max_turns:
+        if arena.turn == "player":
+            arena.attack()
+        else:
+            arena._ai_take_turn()
+        turns += 1
+        script.t = turns
+    return arena.player.hull, arena.ai.hull, turns
+
+
+@pytest.mark.parametrize("difficulty", ["easy", "normal", "hard"])
+@pytest.mark.parametrize("seed", range(6))
+def test_kernel_reproduces_arena_rules(difficulty: str, seed: int) -> None:
+    cfg = ArenaConfig(ai_skill_chance=0.3)
+    expected = _arena_run(cfg, difficulty, seed, max_turns=300)
+
+    res = simulate(
+        _player(),
+        _ai(),
+        1,
+        difficulty=difficulty,  # type: ignore[arg-type]
+        config=cfg,
+        rng=_Script(seed),
+        max_turns=300,
+    )
+    assert (int(res.player_hull[0]), int(res.ai_hull[0]), int(res.turns[0])) == expected
+
+
+def test_batch_is_seeded_and_summarised() -> None:
+    a = simulate(_player(), _ai(), 2000, rng=7)
+    b = simulate(_player(), _ai(), 2000, rng=7)
+    assert (a.player_hull == b.player_hull).all() and (a.turns == b.turns).all()
+
+    s = a.summary()
+    assert s["battles"] == 2000
+    assert s["player_wins"] + s["ai_wins"] + s["unfinished"] == 2000
+    assert 0.0 < s["player_winrate"] < 1.0
+
+
+def test_max_turns_caps_unfinished_battles() -> None:
+    res = simulate(_player(), _ai(), 10, rng=1, max_turns=3)
+    assert res.unfinished == 10
+    assert (res.turns == 3).all()
+
+
+@pytest.mark.parametrize("opening", ["attack", "emp", "overcharge", "pass"])
+@pytest.mark.parametrize("seed", range(3))
+def test_opening_move_matches_arena_ai_move(opening: str, seed: int) -> None:
+    cfg = ArenaConfig(ai_skill_chance=0.3)
+    arena = Arena(cfg)
+    arena.start(_player(), _ai(), difficulty="hard")
+    arena._swap_turn()
+    arena.cooldowns["ai"]["overcharge"] = 1
+    player, ai = _player(), _ai()  # стартовые юниты для simulate, пока арена не сыграла
+    script = _Script(seed)
+    arena._rng = script
+    arena._ai_move(opening)
+    turns = 1
+    script.t = turns
+    while not arena.is_finished and turns < 300:
+        if arena.turn == "player":
+            arena.attack()
+        else:
+            arena._ai_take_turn()
+        turns += 1
+        script.t = turns
+
+    res = simulate(
+        player,
+        ai,
+        1,
+        difficulty="hard",
+        config=cfg,
+        rng=_Script(seed),
+        max_turns=300,
+        ai_cooldowns={"overcharge": 1},
+        opening=opening,  # type: ignore[arg-type]
+    )
+    expected = (arena.player.hull, arena.ai.hull, turns)
+    assert (int(res.player_hull[0]), int(res.ai_hull[0]), int(res.turns[0])) == expected
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
-from app.skills import create_skill
+import pytest
+
+from app.arena import ArenaConfig
+from app.skills import compile_skills, create_skill, get_skill
+from app.unit import AttackContext
 
 
 @dataclass(slots=True)
@@ -49,3 +53,23 @@ def test_emp_can_use_and_execute() -> None:
     assert result.success is True
     assert result.energy_spent == skill.energy_cost
     assert "EMP" in result.description
+
+
+def test_skill_instances_are_shared() -> None:
+    assert get_skill("emp") is get_skill("emp")
+    assert isinstance(create_skill("emp"), type(get_skill("emp")))
+    with pytest.raises(KeyError):
+        get_skill("warp")
+
+
+def test_compiled_contexts_follow_config() -> None:
+    cfg = ArenaConfig(overcharge_damage_mult=2.0, emp_shield_eff_factor=0.25, emp_extra_ignore=0.1)
+    table = compile_skills(cfg)
+
+    assert compile_skills(replace(cfg)) is table  # равный конфиг — та же таблица
+    over, emp = table["overcharge"], table["emp"]
+    assert over.skill is get_skill("overcharge")
+    assert over.energy_cost == over.skill.energy_cost
+    assert over.context == AttackContext(damage_multiplier=2.0)
+    assert emp.context == AttackContext(extra_shield_ignore=0.1, shield_efficiency_factor=0.25)
+    assert compile_skills(ArenaConfig())["overcharge"].context.damage_multiplier == 1.5
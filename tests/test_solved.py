@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app import solved  # noqa: E402
+from app.arena import Arena, ArenaConfig  # noqa: E402
+from app.classes import UnitClass  # noqa: E402
+from app.equipment import Shield, Weapon  # noqa: E402
+from app.solved import PolicyTable, matchup_key, write_table  # noqa: E402
+from app.unit import AIUnit, PlayerUnit, create_ai, create_player  # noqa: E402
+
+_CLS = UnitClass(name="T", hull_max=20, energy_max=30, shield_mod=1.0, attack_mod=1.0)
+_GUN = Weapon(
+    slug="t_gun",
+    name="G",
+    kind="railgun",
+    dmg_min=10,
+    dmg_max=10,
+    energy_cost=10,
+    shield_ignore=0.0,
+    accuracy=1.0,
+)
+_SHIELD = Shield(slug="t_shield", name="S", capacity=10, efficiency=0.5, regen=0)
+
+
+def _units(gun: Weapon = _GUN) -> tuple[PlayerUnit, AIUnit]:
+    return (
+        create_player(name="P", unit_class=_CLS, weapon=_GUN, shield=_SHIELD),
+        create_ai(name="A", unit_class=_CLS, weapon=gun, shield=_SHIELD),
+    )
+
+
+@pytest.fixture
+def book() -> Iterator[solved.PolicyBook]:
+    yield solved.BOOK
+    solved.BOOK.clear()
+
+
+def test_solved_table_plays_the_killing_blow(tmp_path: Path) -> None:
+    player, ai = _units()
+    table = PolicyTable(write_table(tmp_path, player, ai, ArenaConfig()))
+    assert (table.hull_max, table.shield_cap, table.energy_max) == (20, 10, 30)
+
+    # обычный выстрел снимает 10, Overcharge — 15
+    assert table.move(15, 0, 30, 0, 0) == "overcharge"
+    assert table.move(10, 0, 30, 0, 0) == "attack"  # добивает и без скилла
+    assert table.move(15, 0, 30, 1, 0) == "attack"  # Overcharge на перезарядке
+    assert table.move(15, 0, 5, 0, 0) == "pass"  # стрелять нечем
+    assert table.move(99, 0, 30, 0, 0) is None  # вне таблицы
+    table.close()
+
+
+def test_target_out_of_reach_has_no_move(tmp_path: Path) -> None:
+    player, ai = _units(replace(_GUN, accuracy=0.0))
+    table = PolicyTable(write_table(tmp_path, player, ai, ArenaConfig()))
+    assert table.move(15, 0, 30, 0, 0) is None
+    table.close()
+
+
+def test_key_ignores_ai_thresholds_but_not_rules() -> None:
+    player, ai = _units()
+    cfg = ArenaConfig()
+    key = matchup_key(player, ai, cfg)
+    assert matchup_key(player, ai, replace(cfg, ai_emp_shield_threshold=(1, 2, 3))) == key
+    assert matchup_key(player, ai, replace(cfg, rng_seed=5)) == key
+    assert matchup_key(player, ai, replace(cfg, energy_regen_per_turn=1)) != key
+
+
+def test_broken_file_is_rejected(tmp_path: Path) -> None:
+    path = tmp_path / f"bad{solved.SUFFIX}"
+    path.write_bytes(b"SDPT" + bytes(60))
+    with pytest.raises(ValueError):
+        PolicyTable(path)
+
+
+def test_hard_ai_reads_loaded_table(tmp_path: Path, book: solved.PolicyBook) -> None:
+    player, ai = _units()
+    write_table(tmp_path, player, ai, ArenaConfig())
+    assert solved.load_tables(tmp_path) == 1
+
+    player.hull, player.shield_hp = 15, 0
+    arena = Arena(ArenaConfig(rng_seed=1, telemetry="off"))
+    arena.start(player, ai, difficulty="hard")
+    arena._swap_turn()
+    arena._ai_take_turn()
+
+    # пороговый hard добил бы Overcharge только при корпусе <= 45% (9 из 20)
+    assert not player.is_alive
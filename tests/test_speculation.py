@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from concurrent.futures import wait
+from dataclasses import replace
+
+import pytest
+
+from app.arena import Arena, ArenaConfig
+from app.classes import UnitClass
+from app.equipment import Shield, Weapon
+from app.speculation import PLAYER_ACTIONS, Speculator, guess, play
+from app.unit import create_ai, create_player
+
+_CLS = UnitClass(name="T", hull_max=40, energy_max=60, shield_mod=1.0, attack_mod=1.0)
+_GUN = Weapon(
+    slug="t_gun",
+    name="G",
+    kind="railgun",
+    dmg_min=4,
+    dmg_max=9,
+    energy_cost=10,
+    shield_ignore=0.0,
+    accuracy=0.7,
+)
+_SHIELD = Shield(slug="t_shield", name="S", capacity=20, efficiency=0.5, regen=2)
+
+
+@pytest.fixture
+def speculator() -> Iterator[Speculator]:
+    spec = Speculator(workers=1)
+    yield spec
+    spec.close()
+
+
+def _arena(difficulty: str = "expert", seed: int = 3) -> Arena:
+    arena = Arena(ArenaConfig(rng_seed=seed, telemetry="off"))
+    # предел глубины, а не дедлайн: ход поиска воспроизводим
+    arena.expert_deadline, arena.expert_max_depth = 10.0, 2
+    arena.start(
+        create_player(name="P", unit_class=_CLS, weapon=_GUN, shield=_SHIELD),
+        create_ai(name="A", unit_class=_CLS, weapon=_GUN, shield=_SHIELD),
+        difficulty=difficulty,  # type: ignore[arg-type]
+    )
+    return arena
+
+
+def test_fork_replays_the_same_draws() -> None:
+    arena = _arena()
+    fork = arena.fork()
+    assert fork.expert_max_depth == 2
+    fork.attack()
+    arena.attack()
+    assert fork.player == arena.player and fork.ai == arena.ai
+    assert fork.rng_state == arena.rng_state
+    assert fork.log == ()  # копия идёт без телеметрии
+
+
+@pytest.mark.parametrize("action", PLAYER_ACTIONS)
+def test_committed_guess_matches_a_normal_turn(speculator: Speculator, action: str) -> None:
+    arena, twin = _arena(), _arena()
+    arena.ai.energy = twin.ai.energy = 60
+    speculator.speculate("b1", arena)
+    wait(speculator._pending["b1"].values())  # игрок «подумал»
+
+    for a in (arena, twin):
+        play(a, action)  # type: ignore[arg-type]
+    assert speculator.commit("b1", arena, action)  # type: ignore[arg-type]
+    twin.run_ai()
+
+    assert arena.player == twin.player and arena.ai == twin.ai
+    assert arena.rng_state == twin.rng_state
+    assert arena.turn == "player"
+    assert speculator.metrics.snapshot()["hits"] == 1
+
+
+def test_diverged_battle_is_not_committed(speculator: Speculator) -> None:
+    arena = _arena()
+    speculator.speculate("b1", arena)
+    wait(speculator._pending["b1"].values())
+    arena.player.shield_hp = 0  # бой ушёл от снимка
+    arena.attack()
+    assert not speculator.commit("b1", arena, "attack")
+    assert speculator.metrics.snapshot()["mismatches"] == 1
+    arena.run_ai()
+    assert arena.turn == "player"
+
+
+def test_cheap_policies_are_not_speculated(speculator: Speculator) -> None:
+    arena = _arena("hard")
+    speculator.speculate("b1", arena)
+    arena.attack()
+    assert speculator.reply("b1", arena, "attack") is None
+    stats = speculator.metrics.snapshot()
+    assert (stats["speculated"], stats["misses"]) == (0, 1)
+
+
+def test_no_guess_when_the_ai_will_not_move() -> None:
+    arena = _arena()
+    arena.player.weapon = replace(_GUN, accuracy=1.0)
+    arena.ai.hull, arena.ai.shield_hp = 1, 0
+    assert guess(arena, "attack") is None  # выстрел добивает ИИ
+    assert arena.ai.hull == 1  # догадка играла на копии
+    assert guess(arena, "pass") is not None
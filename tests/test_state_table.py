@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import pytest
+
+from app.arena import DIFFICULTIES, Arena, ArenaConfig
+from app.classes import UnitClass
+from app.equipment import Shield, Weapon
+from app.rng import CompactRandom
+from app.state_table import BattleStateTable
+from app.unit import create_ai, create_player
+
+
+def _mk_arena(seed: int) -> Arena:
+    uclass = UnitClass(name="T", hull_max=60, energy_max=40, shield_mod=1.0, attack_mod=1.1)
+    weapon = Weapon(
+        slug="w",
+        name="W",
+        kind="laser",
+        dmg_min=6,
+        dmg_max=12,
+        energy_cost=8,
+        shield_ignore=0.1,
+        accuracy=0.8,
+    )
+    shield = Shield(slug="s", name="S", capacity=20, efficiency=0.6, regen=2)
+    arena = Arena(ArenaConfig(rng_seed=seed, ai_skill_chance=0.2))
+    arena.start(
+        player=create_player(name="P", unit_class=uclass, weapon=weapon, shield=shield),
+        ai=create_ai(name="E", unit_class=uclass, weapon=weapon, shield=shield),
+        difficulty="hard",
+    )
+    return arena
+
+
+def test_compact_random_is_reproducible() -> None:
+    r1, r2 = CompactRandom(42), CompactRandom(42)
+    assert [r1.random() for _ in range(5)] == [r2.random() for _ in range(5)]
+    r2.setstate(r1.getstate())
+    assert r1.randint(1, 6) == r2.randint(1, 6)
+    assert all(1 <= r1.randint(1, 6) <= 6 for _ in range(200))
+
+
+def test_store_load_roundtrip_continues_same_battle() -> None:
+    table = BattleStateTable()
+    arena = _mk_arena(seed=7)
+    arena.attack()
+    arena._ai_take_turn()
+    arena.attack_with_player_skill("emp")
+
+    slot = table.alloc()
+    table.store(slot, arena)
+    twin = table.load(slot)
+
+    assert twin.turn == arena.turn
+    assert twin.ai_difficulty == "hard"
+    assert twin.cooldowns == arena.cooldowns
+    assert twin.player.skill_used == arena.player.skill_used
+    assert twin.rng_state == arena.rng_state
+
+    for _ in range(6):
+        if arena.is_finished:
+            break
+        if arena.turn == "player":
+            out1, out2 = arena.attack(), twin.attack()
+            assert out1 == out2
+        else:
+            arena._ai_take_turn()
+            twin._ai_take_turn()
+        assert (twin.player.hull, twin.ai.hull) == (arena.player.hull, arena.ai.hull)
+        assert (twin.player.energy, twin.ai.energy) == (arena.player.energy, arena.ai.energy)
+
+
+def test_slots_are_reused_and_rows_are_compact() -> None:
+    table = BattleStateTable()
+    slots = [table.alloc() for _ in range(3)]
+    for s in slots:
+        table.store(s, _mk_arena(seed=s))
+    assert len(table) == 3
+
+    table.free(slots[1])
+    assert len(table) == 2
+    assert table.alloc() == slots[1]
+    assert table.capacity == 3
+
+    assert table.row(slots[0]).player_hull == 60
+    assert not table.row(slots[0]).is_finished
+    assert table.bytes_per_row <= 48
+
+    table.free(slots[0])
+    with pytest.raises(KeyError):
+        table.load(slots[0])
+
+
+def test_every_difficulty_survives_the_flags_column() -> None:
+    table = BattleStateTable()
+    arena = _mk_arena(seed=1)
+    for difficulty in DIFFICULTIES:
+        arena.ai_difficulty = difficulty
+        slot = table.alloc()
+        table.store(slot, arena)
+        assert table.load(slot).ai_difficulty == difficulty
+
+
+def test_names_are_released_with_the_row() -> None:
+    table = BattleStateTable()
+    arena = _mk_arena(seed=2)
+    for i in range(0x10000 + 1):  # больше, чем влезло бы в uint16-id
+        arena.player.name = f"pilot-{i}"
+        slot = table.alloc()
+        table.store(slot, arena)
+        table.free(slot)
+    slot = table.alloc()
+    table.store(slot, arena)
+    assert table.load(slot).player.name == "pilot-65536"
+
+
+def test_failed_store_leaves_the_row_intact() -> None:
+    table = BattleStateTable()
+    arena = _mk_arena(seed=2)
+    slot = table.alloc()
+    table.store(slot, arena)
+
+    arena.player.name = "other"
+    arena.player.energy = 1
+    arena.ai.hull = 40_000  # не влезает в int16
+    with pytest.raises(OverflowError):
+        table.store(slot, arena)
+    kept = table.load(slot)
+    assert (kept.player.name, kept.player.energy, kept.ai.hull) == ("P", 40, 60)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from typing import Any
+
+from app import telemetry
+from app.arena import Arena, ArenaConfig
+from app.classes import UnitClass
+from app.equipment import Shield, Weapon
+from app.unit import AttackContext, AttackOutcome, create_ai, create_player
+
+
+def _mk_pair() -> tuple[Any, Any]:
+    uclass = UnitClass(name="T", hull_max=40, energy_max=20, shield_mod=1.0, attack_mod=1.0)
+    weapon = Weapon(
+        slug="w",
+        name="W",
+        kind="laser",
+        dmg_min=5,
+        dmg_max=8,
+        energy_cost=3,
+        shield_ignore=0.2,
+        accuracy=1.0,
+    )
+    shield = Shield(slug="s", name="S", capacity=6, efficiency=0.5, regen=1)
+    return (
+        create_player(name="P", unit_class=uclass, weapon=weapon, shield=shield),
+        create_ai(name="E", unit_class=uclass, weapon=weapon, shield=shield),
+    )
+
+
+def test_arena_stores_records_and_renders_on_demand() -> None:
+    arena = Arena(ArenaConfig(rng_seed=5, ai_skill_chance=0.0))
+    arena.start(*_mk_pair())
+    arena.attack()
+
+    kinds = [r[0] for r in arena.records]
+    assert kinds.count(telemetry.SNAP) == 3
+    assert telemetry.SHOT in kinds
+    assert all(isinstance(r, tuple) for r in arena.records)
+
+    snap = next(r for r in arena.records if r[0] == telemetry.SNAP)
+    assert telemetry.render(snap).startswith("[SNAP:after-damage] turn=player | P(hull=")
+    assert not telemetry.is_visible(snap)
+
+    assert arena.log == tuple(telemetry.render(r) for r in arena.records)
+    assert not any(line.startswith("[SNAP:") for line in arena.ui_log)
+    assert arena.ui_log[-1] == "Теперь ход: ai"
+
+
+def test_regen_noise_is_filtered_from_text_records() -> None:
+    assert not telemetry.is_visible(telemetry.text("Реген щита +3"))
+    assert telemetry.is_visible(telemetry.text("Бой начался. Ход игрока."))
+
+
+def test_attack_notes_are_rendered_from_trace() -> None:
+    p, a = _mk_pair()
+
+    class Rng:
+        def random(self) -> float:
+            return 0.0
+
+        def randint(self, lo: int, hi: int) -> int:
+            return hi
+
+    ctx = AttackContext(damage_multiplier=1.5)
+    out = p.basic_attack(a, rng=Rng(), ctx=ctx)
+    assert out.hit
+    assert out.trace[:4] == (p.weapon.accuracy, 1.5, 0.0, 1.0)
+    assert out.notes == ()  # строки не собираются, пока их не попросят
+    notes = out.rendered_notes()
+    assert notes[0].startswith("accuracy: roll=0.000")
+    assert notes[1] == "ctx: dmgx=1.50, ignore+=0.00, shield_eff*=1.00"
+    assert notes[2].endswith(f"hull={out.hull_damage}")
+
+
+def test_attack_outcome_still_takes_notes() -> None:
+    given = AttackOutcome(True, 3, 0.5, "w", ("своя заметка",), 7, 7, 2, 5)
+    assert given.rendered_notes() == ("своя заметка",)
+    assert given.hull_damage == 5 and given.trace is None
+    traced = AttackOutcome(False, 3, 0.9, "w", trace=(0.8, 1.0, 0.0, 1.0))
+    assert traced.notes == ()
+    assert traced.rendered_notes() == ("accuracy: roll=0.900 vs acc=0.800",)
+    assert AttackOutcome(False, 0, 1.0, "w").rendered_notes() == ()
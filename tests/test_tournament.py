@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.equipment import load_equipment_from_json  # noqa: E402
+from app.tournament import (  # noqa: E402
+    CsvResultStore,
+    JsonlResultStore,
+    Matchup,
+    enumerate_matchups,
+    open_result_store,
+    run_tournament,
+)
+
+EQUIPMENT = Path(__file__).resolve().parent.parent / "equipment.json"
+
+
+@pytest.fixture
+def matchups() -> list[Matchup]:
+    load_equipment_from_json(EQUIPMENT)
+    return enumerate_matchups(
+        classes=["interceptor"],
+        weapons=["laser_mk1", "railgun_mk2"],
+        shields=["shield_basic"],
+        difficulties=["normal", "hard"],
+    )
+
+
+def _run(matchups: list[Matchup], store: JsonlResultStore | CsvResultStore, **kw: int) -> int:
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        return run_tournament(matchups, store, battles=50, base_seed=7, executor=pool, **kw)
+
+
+def _by_key(store: JsonlResultStore | CsvResultStore) -> dict[str, dict[str, object]]:
+    return {str(r["key"]): r for r in store.rows()}
+
+
+def test_enumeration_is_stable_and_complete(matchups: list[Matchup]) -> None:
+    assert len(matchups) == 2 * 2 * 2
+    assert len({m.key for m in matchups}) == len(matchups)
+    again = enumerate_matchups(
+        classes=["interceptor"],
+        weapons=["railgun_mk2", "laser_mk1"],
+        shields=["shield_basic"],
+        difficulties=["normal", "hard"],
+    )
+    assert again == matchups
+
+
+def test_results_do_not_depend_on_sharding(tmp_path: Path, matchups: list[Matchup]) -> None:
+    a = JsonlResultStore(tmp_path / "a.jsonl")
+    b = JsonlResultStore(tmp_path / "b.jsonl")
+    assert _run(matchups, a, shard_size=1) == len(matchups)
+    assert _run(list(reversed(matchups)), b, shard_size=3) == len(matchups)
+    assert _by_key(a) == _by_key(b)
+    row = next(iter(_by_key(a).values()))
+    assert row["battles"] == 50
+    assert row["player_wins"] + row["ai_wins"] + row["unfinished"] == 50  # type: ignore[operator]
+
+
+def test_resume_skips_done_and_drops_partial_line(tmp_path: Path, matchups: list[Matchup]) -> None:
+    full = JsonlResultStore(tmp_path / "full.jsonl")
+    _run(matchups, full)
+
+    part = JsonlResultStore(tmp_path / "part.jsonl")
+    _run(matchups[:3], part)
+    with part.path.open("a", encoding="utf-8") as fh:
+        fh.write('{"key": "interrupted')  # процесс убили посреди записи
+
+    assert _run(matchups, part) == len(matchups) - 3
+    assert _run(matchups, part) == 0
+    lines = part.path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == len(matchups)
+    assert all(json.loads(line) for line in lines)
+    assert _by_key(part) == _by_key(full)
+
+
+def test_csv_store_resumes(tmp_path: Path, matchups: list[Matchup]) -> None:
+    store = open_result_store(tmp_path / "sweep.csv")
+    assert isinstance(store, CsvResultStore)
+    _run(matchups[:2], store)
+    _run(matchups, store)
+    assert store.done_keys() == {m.key for m in matchups}
+    assert store.path.read_text(encoding="utf-8").count("key,") == 1  # заголовок один раз
+
+
+def test_process_pool_matches_threads(tmp_path: Path, matchups: list[Matchup]) -> None:
+    threads = JsonlResultStore(tmp_path / "t.jsonl")
+    procs = JsonlResultStore(tmp_path / "p.jsonl")
+    _run(matchups[:4], threads)
+    run_tournament(
+        matchups[:4],
+        procs,
+        battles=50,
+        base_seed=7,
+        workers=2,
+        shard_size=2,
+        equipment_path=EQUIPMENT,
+    )
+    assert _by_key(procs) == _by_key(threads)
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.arena import ArenaConfig, config_from_env, set_ai_tuning  # noqa: E402
+from app.equipment import load_equipment_from_json  # noqa: E402
+from app.tuning import (  # noqa: E402
+    Candidate,
+    Scored,
+    SearchSpace,
+    evaluate,
+    load_tuning,
+    read_tuning,
+    sample_pairs,
+    successive_halving,
+    write_tuning,
+)
+
+EQUIPMENT = Path(__file__).resolve().parent.parent / "equipment.json"
+
+
+@pytest.fixture(autouse=True)
+def _catalog() -> Iterator[None]:
+    load_equipment_from_json(EQUIPMENT)
+    yield
+    set_ai_tuning({})
+
+
+def test_space_sampling_is_seeded_and_distinct() -> None:
+    space = SearchSpace(emp_shield=(1, 8), over_hull_pct=(0.25,), skill_chance=(0.1,))
+    assert space.size == 2**3 * 3 * 3
+    first = space.sample(20, seed=4)
+    assert first == space.sample(20, seed=4)
+    assert len(set(first)) == 20
+    assert len(space.sample(1000, seed=4)) == space.size
+
+
+def test_evaluation_uses_common_random_numbers() -> None:
+    pairs = sample_pairs(2, seed=1)
+    assert pairs[0][0].key == "interceptor/railgun_mk1/shield_heavy"
+    cand = Candidate.of(ArenaConfig())
+    kw = {"battles": 40, "base_seed": 3, "rung": 0, "config": ArenaConfig(telemetry="off")}
+    rates = evaluate(cand, pairs, ["easy", "hard"], **kw)  # type: ignore[arg-type]
+    assert rates == evaluate(cand, pairs, ["easy", "hard"], **kw)  # type: ignore[arg-type]
+    assert all(0.0 <= r <= 1.0 for r in rates.values())
+
+
+def test_successive_halving_keeps_the_closest_candidate() -> None:
+    pairs = sample_pairs(2, seed=1)
+    candidates = SearchSpace().sample(9, seed=2)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        ranked = successive_halving(
+            candidates,
+            pairs,
+            {"easy": 0.9, "hard": 0.1},
+            min_battles=8,
+            max_battles=72,
+            eta=3,
+            executor=pool,
+        )
+    # 9 → 3 → 1 кандидат, боёв 8 → 24 → 72
+    assert len(ranked) == 1
+    assert ranked[0].battles == 72
+    assert ranked[0].candidate in candidates
+
+
+def test_tuning_file_becomes_the_default_config(tmp_path: Path) -> None:
+    cand = Candidate(
+        ai_emp_shield_threshold=(20, 10, 0),
+        ai_overcharge_hull_pct=(0.1, 0.2, 0.3),
+        ai_emp_min_energy=30,
+        ai_overcharge_min_energy=25,
+        ai_skill_chance=0.0,
+    )
+    path = tmp_path / "ai_tuning.json"
+    write_tuning(path, Scored(cand, {"hard": 0.4}, 0.0025, 100), {"hard": 0.35})
+    assert json.loads(path.read_text())["winrates"] == {"hard": 0.4}
+
+    load_tuning(path)
+    assert Candidate.of(config_from_env()) == cand
+
+
+def test_broken_tuning_file_is_rejected(tmp_path: Path) -> None:
+    path = tmp_path / "bad.json"
+    path.write_text(json.dumps({"tuning": {"energy_regen_per_turn": 9}}))
+    with pytest.raises(ValueError):
+        read_tuning(path)
+    path.write_text(json.dumps({"tuning": {"ai_emp_shield_threshold": [1, 2]}}))
+    with pytest.raises(ValueError):
+        read_tuning(path)
@@ -65,4 +65,4 @@ def test_cannot_fire_without_energy() -> None:
 
     assert out.hit is False
     assert out.energy_spent == 0
-    assert "Недостаточно энергии" in out.notes[0]
+    assert "Недостаточно энергии" in out.rendered_notes()[0]